@@ -0,0 +1,11 @@
+'''Benchmarks for the per-tick hot paths of malmoext. Each module is a script, run from the root of the repository:
+
+- suite.py - Times AgentState construction, entity queries, agent actions, and ScenarioBuilder.build, and writes
+  the results to a JSON file that can be compared across commits
+- decoder_benchmark.py - Compares the available decoders for Malmo observation text
+- parse_benchmark.py - Compares ways of resolving raw observation values to enum members
+- value_types_benchmark.py - Measures the time and memory used by the value types of malmoext
+- xml_build_benchmark.py - Measures the time taken to build the mission XML of worlds with up to 100k blocks
+
+Synthetic observations are produced by observations.generate_observation, whose block grid size, entity count,
+and inventory fill are parameterized.'''
@@ -0,0 +1,54 @@
+'''Compares the available decoders for Malmo observation text.
+
+Usage:
+    python benchmarks/decoder_benchmark.py [--observations FILE] [--iterations N]
+
+If no file of recorded observations (one JSON observation per line) is given, synthetic observations with an
+observable range of (20, 10, 20) are generated instead.'''
+
+from malmoext.block_grid import BlockGrid
+from malmoext.observation_decoder import ObservationDecoder
+from malmoext.types import Vector
+from observations import generate_observation, load_observations
+import argparse
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def time_decoder(decode, observations, distances, iterations):
+    '''Returns the mean time (in ms) taken to decode an observation and its block grid'''
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in observations:
+            data = decode(text)
+            BlockGrid.parse(data['blockgrid'], distances)
+    return (time.perf_counter() - start) * 1000 / (iterations * len(observations))
+
+
+parser = argparse.ArgumentParser(description='Compares the available decoders for Malmo observation text')
+parser.add_argument('--observations', help='(Optional) File of recorded observations, one per line')
+parser.add_argument('--distances', nargs=3, type=int, default=[20, 10, 20],
+        help='(Optional) Observable distances of the recorded observations. Defaults to 20 10 20.')
+parser.add_argument('--iterations', type=int, default=50, help='(Optional) Number of passes over the observations')
+args = parser.parse_args()
+
+distances = Vector(*args.distances)
+if args.observations is not None:
+    observations = load_observations(args.observations)
+else:
+    observations = [generate_observation(tuple(args.distances), seed=i) for i in range(5)]
+
+decoders = [('json', json.loads)]
+if orjson is not None:
+    decoders.append(('orjson', orjson.loads))
+decoders.append(('ObservationDecoder ({})'.format(ObservationDecoder.get_backend()), ObservationDecoder.decode))
+
+print('Observation size: {} bytes'.format(sum(len(o) for o in observations) // len(observations)))
+for name, decode in decoders:
+    print('{:<32} {:8.3f} ms'.format(name, time_decoder(decode, observations, distances, args.iterations)))
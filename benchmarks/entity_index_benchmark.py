@@ -0,0 +1,76 @@
+'''Compares finding the closest entities with an EntityIndex, including the time taken to build the index, against
+a linear scan over all nearby entities. An index is built once per observation, so its cost is spread over the
+searches made during one tick.
+
+Usage:
+    python benchmarks/entity_index_benchmark.py [--entities N [N ...]] [--queries N [N ...]] [--iterations N]'''
+
+from malmoext.entity_index import EntityIndex
+from malmoext.observation_decoder import ObservationDecoder
+from malmoext.types import ReflectiveEnum, Mob, Item, Vector, Entity
+from observations import generate_observation
+import argparse
+import time
+
+ENTITY_TYPES = ReflectiveEnum.resolver(Item, Mob)
+
+# Searches made in turn: the closest entity of a common type, of a rarer type, by name, and of any type
+SEARCHES = [Mob.cow, Item.apple, 'Zombie', None]
+
+
+def parse_entities(num_entities):
+    '''Returns the entities of a synthetic observation with the given number of entities'''
+
+    entities = []
+    for obj in ObservationDecoder.decode(generate_observation(num_entities=num_entities))['nearby_entities']:
+        resolved = ENTITY_TYPES.get(obj['name'])
+        eType = resolved[0] if resolved is not None else Mob.agent
+        entities.append(Entity(obj['id'], eType, obj['name'], Vector(obj['x'], obj['y'], obj['z']),
+                obj.get('quantity', 1)))
+    return entities
+
+
+def search_index(entities, position, num_queries):
+    '''Builds an index over the given entities, and finds the closest entity num_queries times'''
+
+    index = EntityIndex(entities)
+    for i in range(num_queries):
+        index.nearest(position, 1, SEARCHES[i % len(SEARCHES)])
+
+
+def search_linear(entities, position, num_queries):
+    '''Finds the closest entity num_queries times, each time scanning every entity'''
+
+    for i in range(num_queries):
+        search = SEARCHES[i % len(SEARCHES)]
+        closest = None
+        closest_distance = None
+        for entity in entities:
+            if search is not None and entity.type != search and entity.name != search:
+                continue
+            p = entity.position
+            distance = (p.x - position.x) ** 2 + (p.y - position.y) ** 2 + (p.z - position.z) ** 2
+            if closest is None or distance < closest_distance:
+                closest, closest_distance = entity, distance
+
+
+parser = argparse.ArgumentParser(description='Compares searching an EntityIndex against a linear scan')
+parser.add_argument('--entities', type=int, nargs='+', default=[20, 200, 2000],
+        help='(Optional) Numbers of entities per observation. Defaults to 20 200 2000.')
+parser.add_argument('--queries', type=int, nargs='+', default=[1, 5, 35],
+        help='(Optional) Numbers of searches per observation. Defaults to 1 5 35.')
+parser.add_argument('--iterations', type=int, default=100, help='(Optional) Number of observations searched')
+args = parser.parse_args()
+
+position = Vector(0.5, 4.0, 0.5)
+print('{:>8} {:>8} {:>16} {:>16}'.format('entities', 'queries', 'index (us)', 'linear (us)'))
+for num_entities in args.entities:
+    entities = parse_entities(num_entities)
+    for num_queries in args.queries:
+        times = []
+        for search in [search_index, search_linear]:
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                search(entities, position, num_queries)
+            times.append((time.perf_counter() - start) * 1000000 / args.iterations)
+        print('{:>8} {:>8} {:>16.1f} {:>16.1f}'.format(num_entities, num_queries, times[0], times[1]))
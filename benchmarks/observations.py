@@ -0,0 +1,84 @@
+'''Utilities for producing Malmo observation text to benchmark against, either synthetically or from a file
+of recorded observations.'''
+
+import json
+import random
+
+BLOCK_CHOICES = ['air'] * 6 + ['grass', 'dirt', 'stone', 'fence', 'water', 'lava']
+ENTITY_CHOICES = ['Villager', 'Zombie', 'Cow', 'Chicken', 'Pig', 'baked_potato', 'apple', 'diamond_sword']
+INVENTORY_CHOICES = ['baked_potato', 'apple', 'diamond_sword', 'stick', 'iron_ingot', 'bread']
+
+
+def generate_observation(distances=(10, 5, 10), num_entities=20, inventory_fill=0.25, seed=0):
+    '''Returns the JSON text of a synthetic observation in the same shape as those sent by Malmo. The block
+    grid covers the given observable distances in the x, y, and z directions, and the inventory has the
+    given fraction of its 40 slots filled.'''
+
+    rng = random.Random(seed)
+    dx, dy, dz = distances
+    grid_size = (dx * 2 + 1) * (dy * 2 + 1) * (dz * 2 + 1)
+
+    entities = [{'name': 'agent', 'id': 'agent-0', 'x': 0.5, 'y': 4.0, 'z': 0.5, 'yaw': 0.0, 'pitch': 0.0, 'life': 20.0}]
+    for i in range(num_entities):
+        name = rng.choice(ENTITY_CHOICES)
+        entity = {
+            'name': name,
+            'id': 'entity-{}'.format(i),
+            'x': rng.uniform(-25, 25),
+            'y': 4.0,
+            'z': rng.uniform(-25, 25),
+            'yaw': rng.uniform(0, 360),
+            'pitch': 0.0,
+            'motionX': 0.0,
+            'motionY': 0.0,
+            'motionZ': 0.0,
+            'life': 20.0
+        }
+        if name[0].islower():
+            entity['quantity'] = rng.randint(1, 4)
+        entities.append(entity)
+
+    inventory = []
+    for index in range(40):
+        if rng.random() < inventory_fill:
+            inventory.append({
+                'type': rng.choice(INVENTORY_CHOICES),
+                'index': index,
+                'quantity': rng.randint(1, 64),
+                'inventory': 'inventory'
+            })
+
+    observation = {
+        'DistanceTravelled': 0,
+        'TimeAlive': 100,
+        'MobsKilled': 0,
+        'PlayersKilled': 0,
+        'DamageTaken': 0,
+        'DamageDealt': 0,
+        'Life': 20.0,
+        'Score': 0,
+        'Food': 20,
+        'XP': 0,
+        'IsAlive': True,
+        'Air': 300,
+        'Name': 'agent',
+        'XPos': 0.5,
+        'YPos': 4.0,
+        'ZPos': 0.5,
+        'Pitch': 0.0,
+        'Yaw': 0.0,
+        'WorldTime': 6000,
+        'TotalTime': 100,
+        'inventory': inventory,
+        'currentItemIndex': 0,
+        'blockgrid': [rng.choice(BLOCK_CHOICES) for _ in range(grid_size)],
+        'nearby_entities': entities
+    }
+    return json.dumps(observation, separators=(',', ':'))
+
+
+def load_observations(path):
+    '''Loads recorded observation text from a file containing one observation per line'''
+
+    with open(path, 'r') as fd:
+        return [line.strip() for line in fd if line.strip()]
@@ -0,0 +1,65 @@
+'''Compares two ways of resolving the raw names and indices of decoded Malmo observations to enum members: testing
+each candidate enum type in turn with contains and a constructor call, and a single lookup in a table built by
+ReflectiveEnum.resolver.
+
+Usage:
+    python benchmarks/parse_benchmark.py [--entities N] [--iterations N]'''
+
+from malmoext.observation_decoder import ObservationDecoder
+from malmoext.types import ReflectiveEnum, Mob, Item, Inventory
+from observations import generate_observation
+import argparse
+import time
+
+
+def resolve_by_search(data):
+    '''Resolves entity types and inventory slots by testing each candidate enum type in turn'''
+
+    for obj in data['nearby_entities']:
+        if Item.contains(obj['name']):
+            eType = Item(obj['name'])
+        elif Mob.contains(obj['name']):
+            eType = Mob(obj['name'])
+        else:
+            eType = Mob.agent
+
+    for obj in data['inventory']:
+        iType = Item(obj['type'])
+        index = obj['index']
+        if Inventory.HotBar.contains(index):
+            slot = Inventory.HotBar(index)
+        elif Inventory.Main.contains(index):
+            slot = Inventory.Main(index)
+        elif Inventory.Armor.contains(index):
+            slot = Inventory.Armor(index)
+
+
+ENTITY_TYPES = ReflectiveEnum.resolver(Item, Mob)
+ITEM_TYPES = ReflectiveEnum.resolver(Item)
+INVENTORY_SLOTS = ReflectiveEnum.resolver(Inventory.HotBar, Inventory.Main, Inventory.Armor)
+
+def resolve_by_table(data):
+    '''Resolves entity types and inventory slots with one table lookup each'''
+
+    for obj in data['nearby_entities']:
+        resolved = ENTITY_TYPES.get(obj['name'])
+        eType = resolved[0] if resolved is not None else Mob.agent
+
+    for obj in data['inventory']:
+        iType = ITEM_TYPES[obj['type']][0]
+        slot = INVENTORY_SLOTS[obj['index']][0]
+
+
+parser = argparse.ArgumentParser(description='Compares ways of resolving raw observation values to enum members')
+parser.add_argument('--entities', type=int, default=200, help='(Optional) Number of entities per observation')
+parser.add_argument('--iterations', type=int, default=200, help='(Optional) Number of passes over the observation')
+args = parser.parse_args()
+
+data = ObservationDecoder.decode(generate_observation(num_entities=args.entities, inventory_fill=1.0))
+print('Resolving {} entities and {} inventory items:'.format(len(data['nearby_entities']), len(data['inventory'])))
+for name, resolve in [('contains + constructor', resolve_by_search), ('resolver table', resolve_by_table)]:
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        resolve(data)
+    elapsed = (time.perf_counter() - start) * 1000 / args.iterations
+    print('  {:<24} {:8.3f} ms'.format(name, elapsed))
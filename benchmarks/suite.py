@@ -0,0 +1,172 @@
+'''Times the hot paths that run on every tick: building an AgentState from an observation, entity queries, and agent
+actions, as well as populating the world and building the mission XML. Results are written to a JSON file, so that
+runs made on different commits can be compared.
+
+Usage:
+    python benchmarks/suite.py [--distances X Y Z] [--entities N] [--inventory-fill F] [--world-objects N]
+                               [--iterations N] [--output FILE] [--compare FILE]'''
+
+from malmoext.agent import Agent
+from malmoext.agent_state import AgentState
+from malmoext.recording import ReplayHost
+from malmoext.scenario_builder import ScenarioBuilder, AgentBuilder
+from malmoext.types import Block, Item, Mob, Inventory, Vector
+from observations import generate_observation
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+
+def measure(fn, iterations, setup=None):
+    '''Calls fn the given number of times, and returns statistics on the time (in microseconds) taken by each call.
+    If a setup function is given, its result is passed to fn, and the time it takes is not counted.'''
+
+    times = []
+    for _ in range(iterations):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg)
+        times.append((time.perf_counter() - start) * 1000000)
+
+    times.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': statistics.mean(times),
+        'median_us': statistics.median(times),
+        'min_us': times[0],
+        'p95_us': times[min(len(times) - 1, int(len(times) * 0.95))]
+    }
+
+
+def create_agent(distances):
+    '''Returns an agent connected to a host that serves no observations, with the given observable distances'''
+
+    builder = AgentBuilder('agent')
+    builder.set_observable_distances(Vector(*distances))
+    return Agent(builder, False, ReplayHost())
+
+
+def build_world(num_objects):
+    '''Returns a scenario builder with two agents and the given number of blocks, items, and mobs in the world'''
+
+    builder = ScenarioBuilder()
+    builder.set_description('Benchmark')
+    for name in ['agent1', 'agent2']:
+        builder.add_agent(name)
+        builder.agents[name].add_inventory_item(Item.diamond_sword, Inventory.HotBar._0)
+
+    for i in range(num_objects):
+        position = Vector(i % 50, 4 + (i // 2500), (i // 50) % 50)
+        if i % 10 == 0:
+            builder.world.add_mob(Mob.cow, position)
+        elif i % 10 == 1:
+            builder.world.add_item(Item.apple, position)
+        else:
+            builder.world.add_block(Block.stone, position)
+    return builder
+
+
+def git_commit():
+    '''Returns the hash of the commit currently checked out, or None if it cannot be determined'''
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    '''Runs every benchmark, and returns the results keyed by benchmark name'''
+
+    distances = tuple(args.distances)
+    observation = generate_observation(distances, args.entities, args.inventory_fill)
+    agent = create_agent(distances)
+    state = AgentState(agent, observation)
+    target = state.get_nearby_entity(Mob.cow)
+    if target is None:
+        raise Exception('Synthetic observation contains no cow to target. Increase the number of entities.')
+
+    def fresh_state():
+        return AgentState(agent, observation)
+
+    def set_state(_):
+        agent.state = state
+        agent._flush_commands()
+        agent.get_host().take_commands()
+
+    def build_full(_):
+        s = AgentState(agent, observation)
+        s.get_position()
+        s.get_nearby_entities(Mob.cow)
+        s.get_nearby_block_grid()
+        s.get_currently_equipped_slot()
+
+    builder = build_world(args.world_objects)
+    n = args.iterations
+    set_state(None)
+    return {
+        'agent_state': measure(lambda _: AgentState(agent, observation), n),
+        'agent_state_full': measure(build_full, n),
+        'agent_state_incremental': measure(lambda previous: AgentState(agent, observation, previous), n, fresh_state),
+        'get_nearby_entity': measure(lambda s: s.get_nearby_entity(Mob.cow), n, fresh_state),
+        'compute_angle_diffs': measure(lambda _: agent._Agent__compute_angle_diffs(target.position), n),
+        'look_at': measure(lambda _: agent.look_at(target), n, lambda: set_state(None)),
+        'move_to': measure(lambda _: agent.move_to(target), n, lambda: set_state(None)),
+        'scenario_build': measure(lambda _: builder.build(), max(1, n // 10)),
+        'scenario_populate_and_build': measure(lambda _: build_world(args.world_objects).build(), max(1, n // 10))
+    }
+
+
+def compare(results, parameters, path):
+    '''Prints the change in mean time of each benchmark relative to the results stored in the given file'''
+
+    with open(path, 'r') as fd:
+        baseline = json.load(fd)
+    print('Compared with {}:'.format(baseline.get('commit') or path))
+    if baseline.get('parameters') != parameters:
+        print('  (warning: the runs used different parameters)')
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        print('  {:<28} {:10.1f} us -> {:10.1f} us ({:+.1f}%)'.format(name, previous['mean_us'], result['mean_us'],
+                (result['mean_us'] / previous['mean_us'] - 1) * 100))
+
+
+parser = argparse.ArgumentParser(description='Times the per-tick hot paths of malmoext')
+parser.add_argument('--distances', type=int, nargs=3, default=[10, 5, 10], help='(Optional) Observable distances')
+parser.add_argument('--entities', type=int, default=20, help='(Optional) Number of entities per observation')
+parser.add_argument('--inventory-fill', type=float, default=0.25, help='(Optional) Fraction of inventory slots filled')
+parser.add_argument('--world-objects', type=int, default=1000, help='(Optional) Number of objects in the built world')
+parser.add_argument('--iterations', type=int, default=1000, help='(Optional) Number of calls per benchmark')
+parser.add_argument('--output', default='benchmark_results.json', help='(Optional) File to write results to')
+parser.add_argument('--compare', help='(Optional) Results file of a previous run to compare against')
+args = parser.parse_args()
+
+results = run_benchmarks(args)
+for name, result in results.items():
+    print('  {:<28} mean {:10.1f} us   median {:10.1f} us   p95 {:10.1f} us'.format(
+            name, result['mean_us'], result['median_us'], result['p95_us']))
+
+parameters = {
+    'distances': args.distances,
+    'entities': args.entities,
+    'inventory_fill': args.inventory_fill,
+    'world_objects': args.world_objects,
+    'iterations': args.iterations
+}
+with open(args.output, 'w') as fd:
+    json.dump({
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'parameters': parameters,
+        'results': results
+    }, fd, indent=2)
+print('Results written to {}'.format(args.output))
+
+if args.compare is not None:
+    compare(results, parameters, args.compare)
@@ -0,0 +1,158 @@
+'''Measures the time and memory used by the value types of malmoext (Vector, Rotation, Entity, InventoryItem),
+compared with the plain classes they replaced, both in isolation and as part of a full AgentState build.
+
+AgentState builds its values with constructors that take a tuple of all fields (such as _new_vector). To compare
+like with like, the plain classes used for the AgentState build take such a tuple as well.
+
+Usage:
+    python benchmarks/value_types_benchmark.py [--entities N] [--iterations N]'''
+
+from malmoext.agent_state import AgentState
+from malmoext.trade_zones import TradeZones
+from malmoext.types import Vector, Mob
+from malmoext.types import _new_vector, _new_rotation, _new_entity, _new_inventory_item
+from observations import generate_observation
+import malmoext.agent_state
+import argparse
+import time
+import tracemalloc
+
+
+class PlainVector:
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y and self.z == other.z
+
+
+class PlainFieldsVector(PlainVector):
+    def __init__(self, fields):
+        self.x, self.y, self.z = fields
+
+
+class PlainFieldsRotation:
+    def __init__(self, fields):
+        self.yaw, self.pitch = fields
+
+
+class PlainFieldsEntity:
+    def __init__(self, fields):
+        self.id, self.type, self.name, self.position, self.quantity = fields
+
+
+class PlainFieldsInventoryItem:
+    def __init__(self, fields):
+        self.type, self.quantity, self.slot = fields
+
+
+class StubAgent:
+    '''Provides the parts of an Agent that an AgentState reads during construction'''
+
+    def __init__(self, distances):
+        self.__distances = distances
+        self.__trade_zones = TradeZones(3, 70)
+
+    def get_observable_distances(self):
+        return self.__distances
+
+    def _get_trade_zones(self):
+        return self.__trade_zones
+
+
+def measure(fn, iterations, repeats=5):
+    '''Returns the best mean time (in ms) of a call to fn over several repeats, and the peak memory (in KB)
+    allocated by a single call'''
+
+    elapsed = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        mean = (time.perf_counter() - start) * 1000 / iterations
+        elapsed = mean if elapsed is None else min(elapsed, mean)
+
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def build_vectors(vector_type, count):
+    '''Builds a list of vectors'''
+    return [vector_type(i % 41, i % 7, i // 41) for i in range(count)]
+
+
+def build_vectors_from_fields(new_vector, count):
+    '''Builds a list of vectors with a constructor that takes a tuple of all fields'''
+    return [new_vector((i % 41, i % 7, i // 41)) for i in range(count)]
+
+
+def lookup_vectors(vectors, lookups):
+    '''Builds a dictionary keyed by vectors, and looks each of them up several times'''
+
+    table = {key: i for i, key in enumerate(vectors)}
+    for _ in range(lookups):
+        for key in vectors:
+            table[key]
+    return table
+
+
+def build_state(agent, observation):
+    '''Builds an AgentState and parses every section of it'''
+
+    state = AgentState(agent, observation)
+    state.get_position()
+    state.get_pov()
+    state.get_nearby_entities(Mob.villager)
+    state.get_currently_equipped_slot()
+    state.has_inventory_item(None)
+    return state
+
+
+def use_types(new_vector, new_rotation, new_entity, new_inventory_item):
+    '''Swaps the constructors of the value types used when parsing an AgentState'''
+
+    malmoext.agent_state._new_vector = new_vector
+    malmoext.agent_state._new_rotation = new_rotation
+    malmoext.agent_state._new_entity = new_entity
+    malmoext.agent_state._new_inventory_item = new_inventory_item
+
+
+parser = argparse.ArgumentParser(description='Measures the time and memory used by the value types of malmoext')
+parser.add_argument('--entities', type=int, default=500, help='(Optional) Number of entities per observation')
+parser.add_argument('--vectors', type=int, default=100000, help='(Optional) Number of vectors to construct')
+parser.add_argument('--lookups', type=int, default=10, help='(Optional) Number of dictionary lookups per vector')
+parser.add_argument('--iterations', type=int, default=20, help='(Optional) Number of repetitions')
+args = parser.parse_args()
+
+print('Constructing {} vectors:'.format(args.vectors))
+for name, build in [('plain', lambda: build_vectors(PlainVector, args.vectors)),
+        ('tuple', lambda: build_vectors(Vector, args.vectors)),
+        ('tuple (fields)', lambda: build_vectors_from_fields(_new_vector, args.vectors))]:
+    elapsed, peak = measure(build, 1)
+    print('  {:<16} {:9.3f} ms {:10.1f} KB'.format(name, elapsed, peak))
+
+print('Looking up {} vectors {} times each:'.format(args.vectors, args.lookups))
+for name, vector_type in [('plain', PlainVector), ('tuple', Vector)]:
+    vectors = build_vectors(vector_type, args.vectors)
+    elapsed, peak = measure(lambda: lookup_vectors(vectors, args.lookups), 1)
+    print('  {:<16} {:9.3f} ms'.format(name, elapsed))
+
+distances = Vector(10, 5, 10)
+agent = StubAgent(distances)
+observation = generate_observation((10, 5, 10), num_entities=args.entities, inventory_fill=1.0)
+print('Building AgentState with {} entities:'.format(args.entities))
+for name, types in [('plain', (PlainFieldsVector, PlainFieldsRotation, PlainFieldsEntity, PlainFieldsInventoryItem)),
+        ('tuple', (_new_vector, _new_rotation, _new_entity, _new_inventory_item))]:
+    use_types(*types)
+    elapsed, peak = measure(lambda: build_state(agent, observation), args.iterations)
+    print('  {:<16} {:9.3f} ms {:10.1f} KB'.format(name, elapsed, peak))
+use_types(_new_vector, _new_rotation, _new_entity, _new_inventory_item)
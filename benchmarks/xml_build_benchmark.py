@@ -0,0 +1,64 @@
+'''Measures the time taken to populate a world with many blocks and build the mission XML, and how it grows with
+the number of blocks. Optionally compares against appending the XML of each block to a string as it is added,
+which grows quadratically.
+
+Usage:
+    python benchmarks/xml_build_benchmark.py [--blocks N [N ...]] [--compare-concat]'''
+
+from malmoext.scenario_builder import ScenarioBuilder
+from malmoext.types import Block, Vector
+import argparse
+import time
+
+
+class ConcatWorld:
+    '''Stores the XML of each block by appending it to a string attribute'''
+
+    def __init__(self):
+        self.xml = ''
+
+    def add_block(self, block, p):
+        self.xml += '''<DrawBlock x="{}" y="{}" z="{}" type="{}"/>'''.format(p.x, p.y, p.z, block.value)
+
+
+def positions(count):
+    '''Returns the positions of a solid arena of blocks, 100 blocks wide and long'''
+    return [Vector(i % 100, 4 + i // 10000, (i // 100) % 100) for i in range(count)]
+
+
+def time_builder(points):
+    '''Returns the time (in seconds) taken to add the given blocks to a ScenarioBuilder, and to build its XML'''
+
+    builder = ScenarioBuilder()
+    builder.add_agent('agent')
+    start = time.perf_counter()
+    for p in points:
+        builder.world.add_block(Block.stone, p)
+    populated = time.perf_counter()
+    builder.build()
+    return populated - start, time.perf_counter() - populated
+
+
+def time_concat(points):
+    '''Returns the time (in seconds) taken to add the given blocks to a ConcatWorld'''
+
+    world = ConcatWorld()
+    start = time.perf_counter()
+    for p in points:
+        world.add_block(Block.stone, p)
+    return time.perf_counter() - start
+
+
+parser = argparse.ArgumentParser(description='Measures the time taken to build the mission XML of large worlds')
+parser.add_argument('--blocks', type=int, nargs='+', default=[1000, 10000, 100000], help='(Optional) World sizes')
+parser.add_argument('--compare-concat', action='store_true', help='(Optional) Also time string concatenation')
+args = parser.parse_args()
+
+for count in args.blocks:
+    points = positions(count)
+    populate, build = time_builder(points)
+    line = '{:>8} blocks: populate {:8.3f} s, build {:8.3f} s ({:.2f} us per block)'.format(count, populate, build,
+            (populate + build) * 1000000 / count)
+    if args.compare_concat:
+        line += ', concatenation {:8.3f} s'.format(time_concat(points))
+    print(line)
@@ -3,7 +3,13 @@
     2) provide a programming interface that streamlines the creation and execution of scenarios... and
     3) provide a set of higher-order agent actions for developers to choose from.'''
 
+from malmoext.backend import *
+from malmoext.batch import *
 from malmoext.malmo_bootstrap import *
+from malmoext.mission_cache import *
+from malmoext.recording import *
 from malmoext.scenario import *
+from malmoext.scheduler import *
+from malmoext.simulation import *
 from malmoext.types import *
 from malmoext.utils import *
\ No newline at end of file
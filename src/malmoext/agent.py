@@ -2,6 +2,9 @@ import malmo.MalmoPython as MalmoPython
 from typing import Union
 from malmoext.scenario_builder import AgentBuilder
 from malmoext.types import Mob, Item, Inventory, Entity, Vector, Rotation
+from malmoext.command_buffer import CommandBuffer
+from malmoext.trade_zones import TradeZones
+from malmoext.recording import RecordingWriter
 from malmoext.utils import Utils
 import math
 
@@ -23,15 +26,25 @@ class Agent:
     '''Distance (in number of blocks) from recent trade positions that items will be ignored'''
 
     TRADE_IGNORE_TIME = 70
-    '''Number of clock ticks an agent will ignore recently traded items for'''
+    '''Number of game ticks an agent will ignore recently traded items for. Game ticks are counted by the server,
+    so this does not depend on how fast the server or the scenario runs.'''
 
 
-    def __init__(self, builder: AgentBuilder):
-        '''Constructor'''
+    def __init__(self, builder: AgentBuilder, incremental_state: bool = False, host = None):
+        '''Constructor. If incremental state updates are enabled, each new state of this agent is built from its
+        previous state, reusing whatever has not changed and tracking what has. Optionally accepts the connection
+        to the Minecraft server to use in place of a Malmo AgentHost (see Backend).'''
         self.__name = builder.get_name()
         self.__observable_distances = builder.get_observable_distances()
-        self.__host = MalmoPython.AgentHost()
-        self.__recent_trade_positions = {}        # type: dict[Vector, int]
+        self.__incremental_state = incremental_state
+        self.__host = host if host is not None else MalmoPython.AgentHost()
+        self.__trade_zones = TradeZones(Agent.TRADE_IGNORE_DISTANCE, Agent.TRADE_IGNORE_TIME)
+        self.__world_state = None                 # type: MalmoPython.WorldState
+        self.__pending_observation = None         # type: str
+        self.__native_calls = {'peekWorldState': 0, 'getWorldState': 0, 'sendCommand': 0}
+        self.__commands = CommandBuffer(self.__send_native_command)
+        self.__recording = None                   # type: RecordingWriter
+        self.__recording_index = 0
         self.state = None                         # type: AgentState
 
 
@@ -45,22 +58,42 @@ class Agent:
         return self.__observable_distances
 
 
+    def is_incremental_state(self):
+        '''Returns true if incremental state updates are enabled for this agent. Returns false otherwise.'''
+        return self.__incremental_state
+
+
     def get_host(self):
-        '''Returns a reference to the Malmo AgentHost connection to the Minecraft server'''
+        '''Returns a reference to the Malmo AgentHost (or equivalent) connection to the Minecraft server'''
         return self.__host
 
 
     def is_mission_active(self) -> bool:
         '''Returns true if this agent's mission is still active. Returns false otherwise.'''
-        return self.__host.peekWorldState().is_mission_running
+        if self.__world_state is None:
+            self.__native_calls['peekWorldState'] += 1
+            return self.__host.peekWorldState().is_mission_running
+        return self.__world_state.is_mission_running
+
+
+    def get_native_call_counts(self):
+        '''Returns a dictionary containing the total number of calls this agent has made to each method of its
+        Malmo AgentHost connection'''
+        return dict(self.__native_calls)
+
+
+    def get_suppressed_command_count(self):
+        '''Returns the total number of redundant commands issued by this agent that were never sent to the Malmo
+        Minecraft server'''
+        return self.__commands.get_suppressed_count()
 
 
     def do_nothing(self):
         '''Halts all movement and ongoing actions for this agent.'''
-        self.__host.sendCommand('turn 0')
-        self.__host.sendCommand('pitch 0')
-        self.__host.sendCommand('strafe 0')
-        self.__host.sendCommand('move 0')
+        self.__send_command('turn 0')
+        self.__send_command('pitch 0')
+        self.__send_command('strafe 0')
+        self.__send_command('move 0')
 
 
     def equip(self, item_type: Item) -> bool:
@@ -83,11 +116,11 @@ class Agent:
             if target_slot is None:
                 target_slot = self.state.get_currently_equipped_slot()
             target_index = target_slot.value
-            self.__host.sendCommand('swapInventoryItems {} {}'.format(target_index, item_index))
+            self.__send_command('swapInventoryItems {} {}'.format(target_index, item_index))
 
         # Equip (Malmo keys are 1-indexed)
-        self.__host.sendCommand('hotbar.{} 1'.format(target_index + 1))
-        self.__host.sendCommand('hotbar.{} 0'.format(target_index + 1))
+        self.__send_command('hotbar.{} 1'.format(target_index + 1))
+        self.__send_command('hotbar.{} 0'.format(target_index + 1))
         return True
 
 
@@ -109,15 +142,15 @@ class Agent:
 
         # Modify yaw rate
         if Utils.equal_tol(turn_rates.yaw, 0, 0.001):
-            self.__host.sendCommand('turn 0')
+            self.__send_command('turn 0')
         else:
-            self.__host.sendCommand('turn {}'.format(turn_rates.yaw))
+            self.__send_command('turn {}'.format(turn_rates.yaw))
     
         # Modify pitch rate
         if Utils.equal_tol(turn_rates.pitch, 0, 0.001):
-            self.__host.sendCommand('pitch 0')
+            self.__send_command('pitch 0')
         else:
-            self.__host.sendCommand('pitch {}'.format(turn_rates.pitch))
+            self.__send_command('pitch {}'.format(turn_rates.pitch))
 
         # Use a slightly higher tolerance for reporting success
         return Utils.equal_tol(turn_rates.yaw, 0, 0.05) and Utils.equal_tol(turn_rates.pitch, 0, 0.05)
@@ -144,16 +177,16 @@ class Agent:
 
         # Modify left/right movement rate
         if Utils.equal_tol(move_rates.x, 0, 0.001):
-            self.__host.sendCommand('strafe 0')
+            self.__send_command('strafe 0')
         else:
-            self.__host.sendCommand('strafe {}'.format(move_rates.x))
+            self.__send_command('strafe {}'.format(move_rates.x))
             is_at = False
 
         # Modify forward/backward movement rate
         if Utils.equal_tol(move_rates.z, 0, 0.001):
-            self.__host.sendCommand('move 0')
+            self.__send_command('move 0')
         else:
-            self.__host.sendCommand('move {}'.format(move_rates.z))
+            self.__send_command('move {}'.format(move_rates.z))
             is_at = False
 
         return is_at
@@ -174,14 +207,14 @@ class Agent:
             return False
         
         # Ensure we are first looking and located at the entity
-        looking_at = self.look_at(entity)
-        located_at = self.move_to(entity, Agent.ATTACK_KEEP_DISTANCE)
+        looking_at = self.look_at(target)
+        located_at = self.move_to(target, Agent.ATTACK_KEEP_DISTANCE)
         if not looking_at or not located_at:
             return False
         
         # Perform the attack
-        self.__host.sendCommand('attack 1')
-        self.__host.sendCommand('attack 0')
+        self.__send_command('attack 1')
+        self.__send_command('attack 0')
         return True
         
 
@@ -199,8 +232,8 @@ class Agent:
             return False
         
         # Ensure we are first looking and located at the entity
-        looking_at = self.look_at(entity)
-        located_at = self.move_to(entity, Agent.GIVE_KEEP_DISTANCE)
+        looking_at = self.look_at(target)
+        located_at = self.move_to(target, Agent.GIVE_KEEP_DISTANCE)
         if not looking_at or not located_at:
             return False
 
@@ -208,35 +241,96 @@ class Agent:
         if not self.equip(item):
             return False
         
-        self.__recent_trade_positions[target.position] = Agent.TRADE_IGNORE_TIME
-        self.__host.sendCommand('discardCurrentItem')
+        self.__trade_zones.add(target.position)
+        self.__send_command('discardCurrentItem')
         return True
 
 
+    def _poll(self):
+        '''Takes a snapshot of the world state from the Malmo Minecraft server. This is the only call to the server made
+        for this agent on each tick. The snapshot is shared by is_mission_active, _has_observation, and _sync until the
+        next poll. Any new observation is held until it is consumed by _sync.
+        
+        This method is not intended to be called directly by users of this library.'''
+
+        self.__native_calls['getWorldState'] += 1
+        self.__world_state = self.__host.getWorldState()
+        if self.__world_state.number_of_observations_since_last_state > 0 and len(self.__world_state.observations) > 0:
+            self.__pending_observation = self.__world_state.observations[-1].text
+
+
+    def _has_observation(self):
+        '''Returns true if a new observation has been received that has not yet been loaded by _sync. Returns false
+        otherwise.
+        
+        This method is not intended to be called directly by users of this library.'''
+        return self.__pending_observation is not None
+
+
     def _sync(self):
         '''Syncs the data cached on this agent with the latest available data from the Malmo Minecraft server. Returns
         true if new data has been loaded. Returns false otherwise.
         
         This method is not intended to be called directly by users of this library.'''
 
-        # Decrement timers for recent trade positions
-        self.__recent_trade_positions = {key:(val - 1) for key, val in
-                self.__recent_trade_positions.items() if val > 1}
-
         # Update agent state
-        if self.__host.peekWorldState().number_of_observations_since_last_state > 0:
-            self.state = AgentState(self)
+        if self.__world_state is None:
+            self._poll()
+        if self.__pending_observation is not None:
+            if self.__recording is not None:
+                self.__recording.add_observation(self.__recording_index, self.__pending_observation)
+            self.state = AgentState(self, self.__pending_observation, self.state if self.__incremental_state else None)
+            self.__pending_observation = None
+
+            # Expire old trade zones, measuring time in game ticks where the observation allows
+            total_time = self.state.get_total_time()
+            if total_time is not None:
+                self.__trade_zones.advance_to(total_time)
+            else:
+                self.__trade_zones.advance()
             return True
 
         return False
     
 
-    def _get_recent_trade_positions(self):
-        '''Returns the set of positions where this agent has recently traded items.
+    def _flush_commands(self):
+        '''Sends all commands issued by this agent since the last flush to the Malmo Minecraft server. Redundant
+        movement and camera commands are dropped (see CommandBuffer).
+        
+        This method is not intended to be called directly by users of this library.'''
+        self.__commands.flush()
+
+
+    def _record(self, recording: RecordingWriter, index: int):
+        '''Records every observation loaded and every command sent by this agent to the given recording, under the
+        given agent index.
+        
+        This method is not intended to be called directly by users of this library.'''
+
+        self.__recording = recording
+        self.__recording_index = index
+        recording.add_agent(index, self.__name)
+
+
+    def _get_trade_zones(self):
+        '''Returns the zones around positions where this agent has recently traded items.
         
         This method is not intended to be called directly by users of this library.'''
 
-        return set(self.__recent_trade_positions.keys())
+        return self.__trade_zones
+
+
+    def __send_command(self, command: str):
+        '''Queues a command to be sent to the Malmo Minecraft server at the end of the current tick'''
+        self.__commands.add(command)
+
+
+    def __send_native_command(self, command: str):
+        '''Sends a command to the Malmo Minecraft server immediately'''
+        self.__native_calls['sendCommand'] += 1
+        self.__host.sendCommand(command)
+        if self.__recording is not None:
+            self.__recording.add_command(self.__recording_index, command)
 
 
     def __resolve_entity(self, entity: Union[str, Mob, Item, Entity]):
@@ -1,35 +1,79 @@
 from typing import Any, Union
-from malmoext.types import Block, Mob, Item, Inventory, Vector, Rotation, Entity, InventoryItem
+from malmoext.types import ReflectiveEnum, Category, Block, Mob, Item, Inventory, Vector, Rotation, Entity, InventoryItem
+from malmoext.types import _new_vector, _new_rotation, _new_entity, _new_inventory_item
 from malmoext.utils import Utils
+from malmoext.block_grid import BlockGrid
+from malmoext.entity_index import EntityIndex
+from malmoext.observation_decoder import ObservationDecoder
+from malmoext.state_changes import StateChanges
 from malmoext.agent import Agent
-import json
 
 class AgentState:
     '''An AgentState represents the observable world from the perspective of a single agent.
     It represents an alternative representation of the JSON data provided by Malmo.'''
 
-    def __init__(self, agent: Agent):
-        '''Constructor. Accepts the agent whose perspective this state represents.'''
-        
-        raw_state = agent.get_host().getWorldState()
-        raw_data = json.loads(raw_state.observations[-1].text)
+    __ENTITY_TYPES = ReflectiveEnum.resolver(Item, Mob)
+    '''Resolves the name of an entity to its type'''
+
+    __ITEM_TYPES = ReflectiveEnum.resolver(Item)
+    '''Resolves the name of an inventory item to its type'''
 
-        self.__position = self.__parse_position(raw_data)
-        self.__pov = self.__parse_pov_camera_angles(raw_data)
-        self.__grid = self.__parse_grid(raw_data, agent.get_observable_distances())
-        self.__nearby_entities = self.__parse_nearby_entities(raw_data)
-        self.__inventory = self.__parse_inventory(raw_data)
-        self.__equipped_slot = self.__parse_equipped_slot(raw_data)
-        self.__recent_trade_positions = agent._get_recent_trade_positions()
+    __INVENTORY_SLOTS = ReflectiveEnum.resolver(Inventory.HotBar, Inventory.Main, Inventory.Armor)
+    '''Resolves the index of an inventory slot to its slot'''
+
+    def __init__(self, agent: Agent, observation: str, previous: 'AgentState' = None):
+        '''Constructor. Accepts the agent whose perspective this state represents, and the JSON text of the
+        observation received for that agent.
+        
+        Optionally accepts the previous state of the same agent. If given, any sections of the observation that
+        have not changed since then are reused rather than parsed again, and the changes between the two
+        states can be retrieved using get_changes.'''
+        
+        self.__raw_data = ObservationDecoder.decode(observation)
+        self.__observable_distances = agent.get_observable_distances()
+        self.__trade_zones = agent._get_trade_zones()
+
+        # Each section of the observation is parsed on first access, and then cached for the life of this state
+        self.__position = None
+        self.__pov = None
+        self.__grid = None
+        self.__entity_index = None
+        self.__entities_by_id = None
+        self.__inventory = None
+        self.__equipped_slot = None
+
+        # Closest entities found by get_nearby_entity, mapped by the name or type searched for. Each is stored with
+        # the version of the agent's trade zones it was found with, since recently traded items are ignored.
+        self.__closest_entities = {}    # type: dict[Union[Mob, Item, str], tuple[int, Entity]]
+
+        # Sections parsed by earlier states that may be reused, mapped by key to their (raw data, parsed data)
+        self.__reusable = {}       # type: dict[str, tuple[Any, Any]]
+        self.__previous_data = None
+        self.__previous_grid = None
+        self.__changes = None
+        if previous is not None:
+            self.__reusable = previous.__get_reusable_sections()
+            self.__previous_data = previous.__raw_data
+            self.__previous_grid = previous.__grid
 
 
     def get_position(self):
         '''Returns the current position of this agent'''
+        if self.__position is None:
+            self.__position = self.__parse_position(self.__raw_data)
         return self.__position
     
 
+    def get_total_time(self):
+        '''Returns the number of game ticks that have elapsed on the server since the world was created, or None if
+        the observation does not include it'''
+        return self.__raw_data.get('TotalTime')
+
+
     def get_pov(self):
         '''Returns the current camera angles for this agent's point-of-view (POV)'''
+        if self.__pov is None:
+            self.__pov = self.__parse_pov_camera_angles(self.__raw_data)
         return self.__pov
 
 
@@ -37,91 +81,100 @@ class AgentState:
         '''Returns true if an entity with the given type exists within the agent's observable range.
         Returns false otherwise.'''
 
-        return self.__get_entity_by_type(aType) is not None
+        return self.get_nearby_entity(aType) is not None
+
+
+    def get_changes(self):
+        '''Returns a description of what has changed since the previous state of the agent. Returns None if this
+        state was not constructed from a previous state.'''
+
+        if self.__changes is None and self.__previous_data is not None:
+            self.__changes = StateChanges(self.__previous_data, self.__raw_data, self.__previous_grid,
+                    self.__get_grid, self.__observable_distances)
+            self.__previous_data = None
+            self.__previous_grid = None
+        return self.__changes
 
 
     def get_nearby_entities(self):
         '''Returns a dictionary containing all entities nearby the agent, organized by type.'''
         
-        return self.__nearby_entities
+        return self.__get_entity_index().get_types()
     
     
     def get_nearby_entities(self, aType: Union[Mob, Item]):
         '''Returns a list containing all nearby entities of the given type.'''
         
-        if aType not in self.__nearby_entities:
-            return []
-        
-        return self.__nearby_entities[aType]
+        return self.__get_entity_index().get_by_type(aType)
+
+
+    def get_nearby_entity_by_id(self, id: str):
+        '''Returns the nearby entity with the given unique id. Returns None if no such entity exists within the
+        agent's observable range.'''
+
+        self.__get_entity_index()
+        known = self.__entities_by_id.get(id)
+        return known[1] if known is not None else None
 
 
     def get_nearby_entity(self, aType: Union[Mob, Item, str]):
         '''Returns the closest entity to the agent, specified either by name or by type. Ignores any items that
         have been recently given to another entity. Returns None if no entity could be found using the information
-        provided.'''
+        provided.
+        
+        Results are cached for the life of this state, so repeated searches made during the same tick are free,
+        until the agent trades an item.'''
 
-        if isinstance(aType, str):
-            return self.__get_entity_by_name(aType)
-        else:
-            return self.__get_entity_by_type(aType)
+        version = self.__trade_zones.get_version()
+        cached = self.__closest_entities.get(aType)
+        if cached is not None and cached[0] == version:
+            return cached[1]
 
-    
-    def __get_entity_by_type(self, mob_type: Union[Mob, Item]):
-        '''Returns the closest entity to the agent containing the given type. Ignores any items that
-        have been recently given to another entity. Returns None if no entity with that
-        type exists within the agent's observable range.'''
+        closest = self.get_closest_entities(1, aType)
+        entity = closest[0] if len(closest) > 0 else None
+        self.__closest_entities[aType] = (version, entity)
+        return entity
 
-        if mob_type not in self.__nearby_entities:
-            return None
 
-        closest_sqrd_distance = None
-        closest_entity = None
-        for entity in self.__nearby_entities[mob_type]:
-            if self.__is_item_near_recent_trade(entity):
-                continue
+    def get_nearby_entities_by_category(self, category: int):
+        '''Returns a list containing all nearby entities whose type belongs to any of the categories in the given
+        bitmask (see Category).'''
 
-            sqrd_distance = Utils.squared_distance(self.__position, entity.position)
-            if (closest_entity is None) or (sqrd_distance < closest_sqrd_distance):
-                closest_sqrd_distance = sqrd_distance
-                closest_entity = entity
-        
-        return closest_entity
-    
+        return self.__get_entity_index().get_by_category(category)
 
-    def __get_entity_by_name(self, name: str):
-        '''Returns the closest entity to the agent containing the given name. Ignores any items that
-        have been recently given to another entity. Returns None if no entity with that name exists
-        within the agent's observable range.'''
-
-        closest_sqrd_distance = None
-        closest_entity = None
-        for eType in self.__nearby_entities:
-            for entity in self.__nearby_entities[eType]:
-                if self.__is_item_near_recent_trade(entity):
-                    continue
-
-                if entity.name == name:
-                    sqrd_distance = Utils.squared_distance(self.__position, entity.position)
-                    if (closest_entity is None) or (sqrd_distance < closest_sqrd_distance):
-                        closest_sqrd_distance = sqrd_distance
-                        closest_entity = entity
+
+    def get_closest_entities(self, k: int, aType: Union[Mob, Item, str] = None, category: int = None):
+        '''Returns up to k of the closest entities to the agent, ordered by distance. Optionally specify a name or
+        type, and/or a bitmask of categories (see Category), to restrict the search to. Ignores any items that have
+        been recently given to another entity.
+        
+        For example, the closest mob that is either hostile or drops food can be found using:
         
-        return closest_entity
+            get_closest_entities(1, category=Category.hostile | Category.drops_food)'''
+
+        return self.__get_entity_index().nearest(self.get_position(), k, aType, self.__is_not_recently_traded,
+                category)
+
+
+    def get_entities_in_radius(self, radius: float, aType: Union[Mob, Item, str] = None, category: int = None):
+        '''Returns all entities within the given distance (in number of blocks) of the agent, ordered by distance.
+        Optionally specify a name or type, and/or a bitmask of categories (see Category), to restrict the search
+        to. Ignores any items that have been recently given to another entity.'''
+
+        return self.__get_entity_index().within_radius(self.get_position(), radius, aType,
+                self.__is_not_recently_traded, category)
+
+
+    def __is_not_recently_traded(self, entity: Entity):
+        '''Predicate used to filter out items that have been recently given to another entity'''
+        return not self.__is_item_near_recent_trade(entity)
 
 
     def __is_item_near_recent_trade(self, entity: Entity):
         '''Returns true if the given entity is a drop item that exists nearby a position where the agent
         recently performed a trade. Returns false otherwise.'''
 
-        if not Item.contains(entity.type):
-            return False
-
-        for pos in self.__recent_trade_positions:
-            distance = Utils.distance(entity.position, pos)
-            if distance < Agent.TRADE_IGNORE_DISTANCE:
-                return True
-
-        return False
+        return Category.matches(entity.type, Category.item) and self.__trade_zones.contains(entity.position)
 
 
     def get_nearby_block(self, rel_pos: Vector):
@@ -136,13 +189,36 @@ class AgentState:
         An exception will be thrown if the caller attempts to access a block outside the obserable range
         of the agent.'''
 
-        return self.__grid[rel_pos]
+        return self.__get_grid().get_block(rel_pos)
+
+
+    def get_nearby_block_grid(self):
+        '''Returns the grid of blocks within the observable range of the agent. The grid supports vectorized
+        queries over all blocks at once.'''
+
+        return self.__get_grid()
+
+
+    def get_nearby_block_mask(self, block_type: Block):
+        '''Returns a boolean array, indexed in [x, y, z] order, that is true for every location within the
+        observable range of the agent containing the given block type. Index [0, 0, 0] corresponds to the
+        furthest observable location in the negative x, y, and z directions.'''
+
+        return self.__get_grid().get_mask(block_type)
+
+
+    def count_nearby_blocks(self, block_type: Block, p1: Vector = None, p2: Vector = None):
+        '''Returns the number of blocks of the given type within the observable range of the agent. Optionally
+        specify two locations (relative to the agent) on opposite corners of a region to restrict the count to
+        that region.'''
+
+        return self.__get_grid().count(block_type, p1, p2)
 
 
     def has_inventory_item(self, item_type: Item):
         '''Returns true if the given item exists in the agent's inventory. Returns false otherwise.'''
 
-        return item_type in self.__inventory
+        return item_type in self.__get_inventory()
 
 
     def get_inventory_item(self, item_type: Item):
@@ -150,10 +226,11 @@ class AgentState:
         main inventory, and armor slots, in that order and returns the first instance found. Returns None if the
         agent does not have that item.'''
 
-        if (not item_type in self.__inventory):
+        inventory = self.__get_inventory()
+        if (not item_type in inventory):
             return None
         
-        instances = self.__inventory[item_type]
+        instances = inventory[item_type]
         preferred_instance = None
         for instance in instances:
             if (preferred_instance == None) or (instance.slot.value < preferred_instance.slot.value):
@@ -164,6 +241,10 @@ class AgentState:
     def get_currently_equipped_slot(self):
         '''Returns the inventory hotbar slot currently equipped by the agent.'''
 
+        if self.__equipped_slot is None:
+            self.__equipped_slot = self.__reuse('currentItemIndex')
+            if self.__equipped_slot is None:
+                self.__equipped_slot = self.__parse_equipped_slot(self.__raw_data)
         return self.__equipped_slot
 
 
@@ -172,7 +253,7 @@ class AgentState:
         None if all hotbar slots are currently occupied.'''
         
         in_use = set()
-        for instances in self.__inventory.values():
+        for instances in self.__get_inventory().values():
             for invItem in instances:
                 in_use.add(invItem.slot)
         
@@ -183,10 +264,62 @@ class AgentState:
         return None
 
 
+    def __get_grid(self):
+        '''Returns the grid of blocks surrounding the agent, parsing it on first access.'''
+        if self.__grid is None:
+            self.__grid = self.__reuse('blockgrid')
+            if self.__grid is None:
+                self.__grid = self.__parse_grid(self.__raw_data, self.__observable_distances)
+        return self.__grid
+
+
+    def __get_entity_index(self):
+        '''Returns the index of entities nearby the agent, parsing them on first access.'''
+        if self.__entity_index is None:
+            self.__entity_index, self.__entities_by_id = self.__parse_nearby_entities(self.__raw_data)
+        return self.__entity_index
+
+
+    def __get_inventory(self):
+        '''Returns the inventory of the agent organized by type, parsing it on first access.'''
+        if self.__inventory is None:
+            self.__inventory = self.__reuse('inventory')
+            if self.__inventory is None:
+                self.__inventory = self.__parse_inventory(self.__raw_data)
+        return self.__inventory
+
+
+    def __reuse(self, key: str):
+        '''Returns the parsed data for a section of the observation if it was parsed by an earlier state, and has
+        not changed since. Returns None otherwise.'''
+
+        known = self.__reusable.get(key)
+        if known is not None and known[0] == self.__raw_data[key]:
+            return known[1]
+        return None
+
+
+    def __get_reusable_sections(self):
+        '''Returns all sections parsed by this state or by earlier states that may be reused by the next state,
+        mapped by key to their (raw data, parsed data).'''
+
+        sections = dict(self.__reusable)
+        parsed = [
+            ('blockgrid', self.__grid),
+            ('nearby_entities', None if self.__entity_index is None else (self.__entity_index, self.__entities_by_id)),
+            ('inventory', self.__inventory),
+            ('currentItemIndex', self.__equipped_slot)
+        ]
+        for key, value in parsed:
+            if value is not None:
+                sections[key] = (self.__raw_data[key], value)
+        return sections
+
+
     def __parse_position(self, raw_data):
         '''Parses a raw observation object to determine the current position of the agent.'''
         
-        return Vector(raw_data['XPos'], raw_data['YPos'], raw_data['ZPos'])
+        return _new_vector((raw_data['XPos'], raw_data['YPos'], raw_data['ZPos']))
     
 
     def __parse_pov_camera_angles(self, raw_data):
@@ -196,52 +329,51 @@ class AgentState:
         yaw = raw_data['Yaw']
         yaw = (yaw + 360) % 360
         
-        return Rotation(yaw, raw_data['Pitch'])
+        return _new_rotation((yaw, raw_data['Pitch']))
 
 
     def __parse_nearby_entities(self, raw_data):
         '''Parses a raw observation object to determine all entities near the agent. An entity is defined as a mob,
         a drop item, or another agent.
         
-        Returns a dictionary containing all nearby entities to the agent, organized by type.'''
+        Returns an index over all nearby entities to the agent, as well as a dictionary mapping the id of each
+        entity to its (raw data, parsed entity).'''
+
+        raw_entities = raw_data['nearby_entities']
+
+        # Reuse the entire index if no entity has changed. Otherwise, reuse each entity that has not changed.
+        known = self.__reusable.get('nearby_entities')
+        if known is not None and known[0] == raw_entities:
+            return known[1]
+        known_by_id = known[1][1] if known is not None else {}
         
-        entities = {}     # type: dict[Union[Mob, Item], list[Entity]]
-        for obj in raw_data['nearby_entities']:
-
-            if Item.contains(obj['name']):
-                eType = Item(obj['name'])
-            elif Mob.contains(obj['name']):
-                eType = Mob(obj['name'])
-            else:
-                # Assume entity is agent
-                eType = Mob.agent
-
-            ePos = Vector(obj['x'], obj['y'], obj['z'])
-            entity = Entity(obj['id'], eType, obj['name'], ePos, obj.get('quantity', 1))
-            Utils.add_or_append(entities, eType, entity)
+        entities = []     # type: list[Entity]
+        by_id = {}        # type: dict[str, tuple[Any, Entity]]
+        for obj in raw_entities:
+
+            known_entity = known_by_id.get(obj['id'])
+            if known_entity is not None and known_entity[0] == obj:
+                entities.append(known_entity[1])
+                by_id[obj['id']] = known_entity
+                continue
+
+            # Assume entity is agent if its name is not recognized
+            resolved = AgentState.__ENTITY_TYPES.get(obj['name'])
+            eType = resolved[0] if resolved is not None else Mob.agent
+
+            ePos = _new_vector((obj['x'], obj['y'], obj['z']))
+            entity = _new_entity((obj['id'], eType, obj['name'], ePos, obj.get('quantity', 1)))
+            entities.append(entity)
+            by_id[obj['id']] = (obj, entity)
         
-        return entities
+        return EntityIndex(entities), by_id
 
 
     def __parse_grid(self, raw_data: Any, observable_distances: Vector):
         '''Parses a raw observation object to determine the 3-dimensional grid of blocks surrounding the
         agent. The resulting grid is indexed using block locations relative to the agent.'''
         
-        raw_grid = raw_data['blockgrid']
-
-        expected_size = (observable_distances.x * 2 + 1) * (observable_distances.y * 2 + 1) * (observable_distances.z * 2 + 1)
-        actual_size = len(raw_grid)
-        if (expected_size != actual_size):
-            raise Exception('Block grid received from server did not match expected observation size')
-
-        idx = 0
-        grid = {}      # type: dict[Vector, Block]
-        for x in range(-observable_distances.x, observable_distances.x):
-            for z in range(-observable_distances.z, observable_distances.z):
-                for y in range(-observable_distances.y, observable_distances.y):
-                    grid[Vector(x, y, z)] = Block(raw_grid[idx])
-                    idx += 1
-        return grid
+        return BlockGrid.parse(raw_data['blockgrid'], observable_distances)
     
 
     def __parse_inventory(self, raw_data: Any):
@@ -253,18 +385,16 @@ class AgentState:
 
         inventory = {}     # type: dict[Item, list[InventoryItem]]
         for obj in raw_inventory:
-            iType = Item(obj['type'])
-            index = obj['index']
-
-            # Determine inventory slot
-            if Inventory.HotBar.contains(index):
-                slot = Inventory.HotBar(index)
-            elif Inventory.Main.contains(index):
-                slot = Inventory.Main(index)
-            elif Inventory.Armor.contains(index):
-                slot = Inventory.Armor(index)
-
-            inventoryItem = InventoryItem(iType, obj['quantity'], slot)
+            resolved = AgentState.__ITEM_TYPES.get(obj['type'])
+            iType = resolved[0] if resolved is not None else Item(obj['type'])
+
+            # Determine inventory slot. Skip any slot not described by Inventory (such as the off-hand slot).
+            resolved = AgentState.__INVENTORY_SLOTS.get(obj['index'])
+            if resolved is None:
+                continue
+            slot = resolved[0]
+
+            inventoryItem = _new_inventory_item((iType, obj['quantity'], slot))
             Utils.add_or_append(inventory, iType, inventoryItem)
 
         return inventory
@@ -275,11 +405,5 @@ class AgentState:
 
         index = raw_data['currentItemIndex']
 
-        if Inventory.HotBar.contains(index):
-            return Inventory.HotBar(index)
-        
-        elif Inventory.Main.contains(index):
-            return Inventory.Main(index)
-        
-        else:
-            return Inventory.Armor(index)
\ No newline at end of file
+        resolved = AgentState.__INVENTORY_SLOTS.get(index)
+        return resolved[0] if resolved is not None else Inventory.Armor(index)
\ No newline at end of file
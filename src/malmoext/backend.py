@@ -0,0 +1,221 @@
+import malmo.MalmoPython as MalmoPython
+from malmoext.malmo_bootstrap import MalmoBootstrap
+from malmoext.mission_cache import MissionCache
+from malmo.malmoutils import parse_command_line, get_default_recording_object
+from abc import abstractmethod
+import threading
+import time
+
+class InstanceError(Exception):
+    '''Raised when a mission could not be started or joined because of a problem with a Minecraft instance, such
+    as an instance that is not running or has stopped responding. Running the mission again on other instances
+    may succeed.'''
+    pass
+
+
+
+class Backend:
+    '''A Backend provides the connections through which agents communicate with a Minecraft server, and starts
+    missions on that server.
+
+    A connection (or host) must provide the same methods as a Malmo AgentHost that agents rely on: peekWorldState,
+    getWorldState, and sendCommand. The world states it returns must provide the is_mission_running,
+    has_mission_begun, number_of_observations_since_last_state, observations, and errors attributes of a Malmo
+    WorldState.'''
+
+    def init_env(self) -> None:
+        '''Prepares the environment before any connection is created. Does nothing by default.'''
+        pass
+
+
+    @abstractmethod
+    def create_host(self):
+        '''Returns a new connection for a single agent'''
+        pass
+
+
+    @abstractmethod
+    def start_mission(self, agents: 'list[Agent]', mission_xml: str, ports: 'list[int]') -> None:
+        '''Starts a mission for the given agents, described by the XML produced by ScenarioBuilder.build. The
+        order of the agents matches the order of their sections in the XML. Returns once the mission has been
+        requested for every agent. The mission may not have begun yet. Throws an InstanceError if the mission could
+        not be started because of a problem with the instances.'''
+        pass
+
+
+    def end_mission(self, agents: 'list[Agent]') -> None:
+        '''Called once a mission started by this backend has ended normally. Does nothing by default.'''
+        pass
+
+
+
+class MalmoBackend(Backend):
+    '''A Backend connecting agents to Malmo Minecraft instances through Malmo AgentHosts. This is the default
+    backend.
+
+    Mission specifications are taken from a MissionCache, so that a mission that has been started before is not
+    validated again. By default, the cache shared by the whole process is used (see MissionCache.get_default).'''
+
+    START_TIMEOUT = 30.0
+    '''Maximum time (in seconds) spent retrying the start of the mission for a single agent, not counting time
+    spent waiting for its server to warm up'''
+
+    MIN_RETRY_INTERVAL = 0.1
+    '''Initial time (in seconds) waited before retrying the start of a mission'''
+
+    MAX_RETRY_INTERVAL = 2.0
+    '''Maximum time (in seconds) waited before retrying the start of a mission'''
+
+    def __init__(self, cache: MissionCache = None, warm_up_timeout: float = None):
+        '''Constructor. Accepts the cache to take mission specifications from, and the maximum time (in seconds) to
+        wait for a server that is still warming up. By default, warming servers are waited for indefinitely.'''
+
+        self.__cache = cache if cache is not None else MissionCache.get_default()
+        self.__warm_up_timeout = warm_up_timeout
+
+
+    def init_env(self) -> None:
+        MalmoBootstrap.init_env()
+
+
+    def create_host(self):
+        return MalmoPython.AgentHost()
+
+
+    def start_mission(self, agents: 'list[Agent]', mission_xml: str, ports: 'list[int]') -> None:
+        '''Starts a mission for the given agents, on the Malmo Minecraft instances running on the given ports.
+        Agents are assigned to ports in order.
+
+        The agent with role 0 hosts the mission, so its mission is started first. The missions of all other agents
+        are then started concurrently, since each of them may need to wait for its own Minecraft instance.'''
+
+        if (len(ports) < len(agents)):
+            raise Exception('Number of agents must not exceed the number of Malmo Minecraft instances currently running.')
+
+        clientPool = MalmoPython.ClientPool()
+        for agentIdx in range(len(agents)):
+            clientPool.add(MalmoPython.ClientInfo('127.0.0.1', ports[agentIdx]))
+
+        # Load the scenario
+        agentZero = agents[0]
+        mission = self.__cache.get_spec(mission_xml)
+        print('Mission cache: {}'.format(self.__cache))
+        parse_command_line(agentZero.get_host())
+        recordings = [get_default_recording_object(agentZero.get_host(), "agent_{}_viewpoint_continuous".format(agentIdx + 1))
+                for agentIdx in range(len(agents))]
+
+        # Start the mission for role 0, then for every other role at once
+        errors = []
+        self.__start_host_mission(agentZero, mission, clientPool, recordings[0], 0, '', errors)
+        threads = []
+        if len(errors) == 0:
+            for agentIdx in range(1, len(agents)):
+                thread = threading.Thread(target=self.__start_host_mission, args=(agents[agentIdx], mission,
+                        clientPool, recordings[agentIdx], agentIdx, '', errors))
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if len(errors) > 0:
+            if all(retryable for _, retryable in errors):
+                raise InstanceError('\n'.join(message for message, _ in errors))
+            raise Exception('\n'.join(message for message, _ in errors))
+
+
+    def __start_host_mission(self, agent, mission, client_pool, recording, role, experimentId, errors) -> None:
+        '''Attempts to start a mission for an agent host. Will automatically retry on failure, backing off
+        exponentially between attempts. If the mission cannot be started, an error message is appended to the given
+        list, along with whether retrying on other instances may help.
+
+        Time spent waiting for the server to warm up is not limited by START_TIMEOUT, since a server can take
+        minutes to warm up.'''
+
+        start_time = time.perf_counter()
+        retry_time = 0.0
+        warm_up_time = 0.0
+        interval = MalmoBackend.MIN_RETRY_INTERVAL
+        print("Starting mission for agent", role)
+        while True:
+            attempt_start = time.perf_counter()
+            try:
+                agent.get_host().startMission(mission, client_pool, recording, role, experimentId)
+                break
+            except MalmoPython.MissionException as e:
+                errorCode = e.details.errorCode
+                warming_up = errorCode == MalmoPython.MissionErrorCode.MISSION_SERVER_WARMING_UP
+                if warming_up:
+                    reason = "Server not quite ready yet"
+                elif errorCode == MalmoPython.MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE:
+                    reason = "Not enough available Minecraft instances running"
+                elif errorCode == MalmoPython.MissionErrorCode.MISSION_SERVER_NOT_FOUND:
+                    reason = "Server not found - has the mission with role 0 been started yet?"
+                else:
+                    errors.append(("Agent {}: {}. Waiting will not help here.".format(role, e.message), False))
+                    return
+            except Exception as e:
+                errors.append(("Agent {}: {}: {}".format(role, type(e).__name__, e), False))
+                return
+
+            # Charge the failed attempt and the wait before the next one to the matching time budget
+            attempt_time = time.perf_counter() - attempt_start + interval
+            if warming_up:
+                if self.__warm_up_timeout is not None and warm_up_time + attempt_time > self.__warm_up_timeout:
+                    errors.append(("Agent {}: {}. Server did not warm up in time.".format(role, reason), True))
+                    return
+                warm_up_time += attempt_time
+            else:
+                if retry_time + attempt_time > MalmoBackend.START_TIMEOUT:
+                    errors.append(("Agent {}: {}. All chances used up.".format(role, reason), True))
+                    return
+                retry_time += attempt_time
+            time.sleep(interval)
+            interval = min(interval * 2, MalmoBackend.MAX_RETRY_INTERVAL)
+
+        print("startMission called okay for agent {} after {:.2f} s.".format(role, time.perf_counter() - start_time))
+
+
+
+class MalmoInstancePool(MalmoBackend):
+    '''A MalmoBackend that keeps its connections to Malmo Minecraft instances alive between missions, so that the
+    same pool can be given to many consecutive runs of a scenario. A connection is only handed out again once the
+    mission it was used for has ended on the server.
+
+    Together with ScenarioBuilder.set_reuse_world, which keeps the world loaded by each instance between missions,
+    this avoids most of the cost of starting each episode.'''
+
+    END_TIMEOUT = 10.0
+    '''Maximum time (in seconds) to wait for a mission to end on the server before its connections are discarded'''
+
+    def __init__(self, cache: MissionCache = None, warm_up_timeout: float = None):
+        MalmoBackend.__init__(self, cache, warm_up_timeout)
+        self.__idle_hosts = []
+        self.__env_ready = False
+
+
+    def init_env(self) -> None:
+        if not self.__env_ready:
+            MalmoBackend.init_env(self)
+            self.__env_ready = True
+
+
+    def create_host(self):
+        if len(self.__idle_hosts) > 0:
+            return self.__idle_hosts.pop(0)
+        return MalmoBackend.create_host(self)
+
+
+    def end_mission(self, agents: 'list[Agent]') -> None:
+        '''Returns the connections of the given agents to the pool, once their missions have ended on the server.
+        Connections whose mission does not end in time are discarded.'''
+
+        start_time = time.perf_counter()
+        interval = MalmoBackend.MIN_RETRY_INTERVAL
+        pending = list(agents)
+        while len(pending) > 0 and time.perf_counter() - start_time < MalmoInstancePool.END_TIMEOUT:
+            pending = [agent for agent in pending if agent.get_host().peekWorldState().is_mission_running]
+            if len(pending) > 0:
+                time.sleep(interval)
+                interval = min(interval * 2, MalmoBackend.MAX_RETRY_INTERVAL)
+
+        self.__idle_hosts.extend(agent.get_host() for agent in agents if agent not in pending)
@@ -0,0 +1,212 @@
+from malmoext.scenario import Scenario
+from malmoext.scenario_builder import ScenarioBuilder
+from malmoext.backend import InstanceError
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import time
+import traceback
+
+class EpisodeResult:
+    '''The outcome of a single episode (one run of a scenario) executed by a BatchRunner'''
+
+    def __init__(self, index: int, scenario_name: str, ports: 'list[int]', attempts: int, elapsed: float,
+            stats: 'TickStats' = None, error: str = None, instance_error: bool = False):
+        self.index = index
+        '''Index of the episode, in the order it was added to the runner'''
+
+        self.scenario_name = scenario_name
+        '''Name of the class of the scenario that was run'''
+
+        self.ports = ports
+        '''Ports of the Malmo Minecraft instances used by the last attempt'''
+
+        self.attempts = attempts
+        '''Number of times the episode was attempted'''
+
+        self.elapsed = elapsed
+        '''Time (in seconds) taken by the last attempt, including starting the mission'''
+
+        self.stats = stats
+        '''Timing statistics of the ticks executed, or None if the episode failed'''
+
+        self.error = error
+        '''Traceback of the error that caused the episode to fail, or None if it succeeded'''
+
+        self.instance_error = instance_error
+        '''Whether the episode failed because of a problem with a Minecraft instance (see InstanceError)'''
+
+    def is_success(self):
+        '''Returns true if the episode ran to completion. Returns false otherwise.'''
+        return self.error is None
+
+    def __str__(self):
+        outcome = 'ok' if self.error is None else 'failed ({})'.format(self.error.strip().splitlines()[-1])
+        return 'Episode {} ({}) on ports {}: {} after {} attempt(s), {:.2f} s'.format(self.index, self.scenario_name,
+                self.ports, outcome, self.attempts, self.elapsed)
+
+
+
+class BatchRunner:
+    '''A BatchRunner runs many episodes of one or more scenarios concurrently, each in its own worker process, over
+    a pool of Malmo Minecraft instances.
+
+    Whenever enough instances are free for the next queued episode (one per agent), they are assigned to it and
+    the episode is started. When an episode ends, its instances are returned to the pool. Episodes that fail
+    because of a problem with an instance (see InstanceError) are queued again, up to a maximum number of attempts.
+    The instances such an episode used are withheld from the pool for a cooldown, which doubles each time they fail
+    in a row, so that other instances are tried first and a restarting instance has time to recover. If a worker
+    process dies, the worker pool is replaced and every episode it was running is queued again. As it cannot be told
+    which of them killed the worker, from then on these episodes only run on their own, and only a worker dying while
+    running a single episode counts as a failed attempt of that episode. Every episode produces an EpisodeResult,
+    whether it succeeded or not.
+
+    Scenarios must be picklable, so that they can be sent to worker processes. Episodes run with the same keyword
+    arguments as Scenario.run.'''
+
+    MIN_COOLDOWN = 5.0
+    '''Time (in seconds) instances are withheld from the pool after their first failure'''
+
+    MAX_COOLDOWN = 60.0
+    '''Maximum time (in seconds) instances are withheld from the pool after failing'''
+
+    def __init__(self, ports: 'list[int]', max_attempts: int = 3):
+        '''Constructor. Accepts the ports of the Malmo Minecraft instances to run episodes on, and the maximum number
+        of times an episode is attempted.'''
+
+        self.__ports = list(ports)
+        self.__max_attempts = max_attempts
+        self.__episodes = []     # type: list[tuple[Scenario, int, dict]]
+
+
+    def add(self, scenario: Scenario, **run_args) -> int:
+        '''Queues an episode of the given scenario, to be run with the given keyword arguments of Scenario.run (other
+        than ports). Returns the index of the episode.'''
+
+        if 'ports' in run_args:
+            raise Exception('The ports of an episode are assigned by the batch runner')
+
+        builder = ScenarioBuilder()
+        scenario.build_scenario(builder)
+        self.__episodes.append((scenario, len(builder.agents), run_args))
+        return len(self.__episodes) - 1
+
+
+    def run(self, max_workers: int = None) -> 'list[EpisodeResult]':
+        '''Runs all queued episodes, with at most the given number of worker processes (by default, as many as the
+        pool of instances allows). Blocks until every episode has finished, and returns their results in the order
+        the episodes were added.'''
+
+        results = [None] * len(self.__episodes)     # type: list[EpisodeResult]
+        attempts = [0] * len(self.__episodes)
+        queue = []
+        for index, (scenario, num_agents, _) in enumerate(self.__episodes):
+            if num_agents > len(self.__ports):
+                results[index] = EpisodeResult(index, type(scenario).__name__, [], 0, 0.0,
+                        error='Episode needs {} instances, but only {} are available'.format(num_agents, len(self.__ports)))
+            else:
+                queue.append(index)
+
+        free_ports = list(self.__ports)
+        cooling = []    # type: list[tuple[float, list[int]]]
+        failures = {}   # type: dict[int, int]
+        running = {}    # type: dict[Future, tuple[int, list[int]]]
+        isolated = set()    # type: set[int]
+        executor = ProcessPoolExecutor(max_workers or len(self.__ports))
+        try:
+            while len(queue) > 0 or len(running) > 0:
+
+                # Return instances whose cooldown has ended to the pool
+                now = time.perf_counter()
+                for entry in [entry for entry in cooling if entry[0] <= now]:
+                    cooling.remove(entry)
+                    free_ports.extend(entry[1])
+
+                # Start every queued episode that fits in the free instances, in order
+                broken = False
+                for index in list(queue):
+                    scenario, num_agents, run_args = self.__episodes[index]
+                    if num_agents > len(free_ports) or (max_workers is not None and len(running) >= max_workers):
+                        continue
+                    # An episode that was running when a worker died runs on its own, so it can be told if it crashes
+                    if (index in isolated and len(running) > 0) or any(i in isolated for i, _ in running.values()):
+                        break
+                    ports = free_ports[:num_agents]
+                    try:
+                        future = executor.submit(_run_episode, scenario, ports, run_args)
+                    except BrokenProcessPool:
+                        broken = True
+                        break
+                    del free_ports[:num_agents]
+                    queue.remove(index)
+                    attempts[index] += 1
+                    running[future] = (index, ports)
+
+                # A worker process has died, so the pool accepts no more episodes. Replace it. The episodes it was
+                # running fail with BrokenProcessPool, and are collected below.
+                if broken:
+                    executor.shutdown(wait=True)
+                    executor = ProcessPoolExecutor(max_workers or len(self.__ports))
+                    continue
+
+                # Wait for an episode to finish, or for a cooldown to end
+                timeout = None if len(cooling) == 0 else max(min(entry[0] for entry in cooling) - now, 0)
+                if len(running) == 0:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(list(running), timeout, FIRST_COMPLETED)
+
+                # Collect finished episodes, and return their instances to the pool
+                shared = len(running) > 1
+                for future in done:
+                    index, ports = running.pop(future)
+                    scenario = self.__episodes[index][0]
+                    crashed = False
+                    try:
+                        elapsed, stats, error, instance_error = future.result()
+                    except BrokenProcessPool:
+                        crashed = True
+                        elapsed, stats, error, instance_error = 0.0, None, traceback.format_exc(), False
+                    except Exception:
+                        elapsed, stats, error, instance_error = 0.0, None, traceback.format_exc(), False
+
+                    if instance_error:
+                        count = max(failures.get(port, 0) for port in ports) + 1
+                        for port in ports:
+                            failures[port] = count
+                        cooldown = min(BatchRunner.MIN_COOLDOWN * 2 ** (count - 1), BatchRunner.MAX_COOLDOWN)
+                        cooling.append((time.perf_counter() + cooldown, ports))
+                        if attempts[index] < self.__max_attempts:
+                            queue.append(index)
+                            continue
+                    else:
+                        for port in ports:
+                            failures.pop(port, None)
+                        free_ports[:0] = ports
+                        if crashed and shared and index not in isolated:
+                            # The episode may not be the one that killed the worker, so this attempt is not counted
+                            isolated.add(index)
+                            attempts[index] -= 1
+                            queue.append(index)
+                            continue
+                        if crashed and attempts[index] < self.__max_attempts:
+                            queue.append(index)
+                            continue
+                    results[index] = EpisodeResult(index, type(scenario).__name__, ports, attempts[index], elapsed,
+                            stats, error, instance_error)
+        finally:
+            executor.shutdown(wait=True)
+
+        return results
+
+
+
+def _run_episode(scenario: Scenario, ports: 'list[int]', run_args: dict):
+    '''Runs a single episode in a worker process. Returns the time taken, the tick statistics, the traceback of any
+    error, and whether that error was caused by an instance.'''
+
+    start = time.perf_counter()
+    try:
+        stats = scenario.run(ports=ports, **run_args)
+        return time.perf_counter() - start, stats, None, False
+    except Exception as e:
+        return time.perf_counter() - start, None, traceback.format_exc(), isinstance(e, InstanceError)
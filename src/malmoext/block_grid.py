@@ -0,0 +1,293 @@
+from typing import Any
+from malmoext.types import Block, Vector
+import numpy
+
+BLOCK_PALETTE = list(Block)
+'''Palette mapping integer block codes (list indices) to block types'''
+
+BLOCK_CODES = {block.value: code for code, block in enumerate(BLOCK_PALETTE)}
+'''Mapping of raw Malmo block names to integer block codes'''
+
+BLOCK_CODE_DTYPE = numpy.uint16
+'''Integer type used to store block codes'''
+
+_IS_SEPARATOR = numpy.zeros(256, dtype=bool)
+_IS_SEPARATOR[[ord(c) for c in '", \t\r\n']] = True
+
+
+class BlockGrid:
+    '''A BlockGrid is a dense, 3-dimensional grid of blocks surrounding an agent. Blocks are stored as
+    integer codes that can be translated back into block types using BLOCK_PALETTE.
+
+    Positions used to index the grid are relative to the agent. Grid arrays returned by this class are
+    indexed in [x, y, z] order, where index [0, 0, 0] corresponds to the relative position
+    (-dx, -dy, -dz) for observable distances (dx, dy, dz).'''
+
+    def __init__(self, codes: numpy.ndarray, observable_distances: Vector):
+        '''Constructor. Accepts an array of block codes indexed in [x, y, z] order, as well as the observable
+        distances of the agent in the x, y, and z directions.'''
+
+        self.__codes = codes
+        self.__distances = observable_distances
+
+
+    @staticmethod
+    def parse(raw_grid: Any, observable_distances: Vector):
+        '''Constructs a BlockGrid from the raw list of block names sent by Malmo. Malmo orders this list by
+        x, then z, then y (i.e. the x coordinate varies the fastest).
+
+        The raw grid may also be given as the undecoded JSON text of the list (without brackets), as produced
+        by ObservationDecoder.decode. In that case, block names are converted to codes without first building
+        a list of strings.'''
+
+        dx, dy, dz = observable_distances.x, observable_distances.y, observable_distances.z
+        expected_size = (dx * 2 + 1) * (dy * 2 + 1) * (dz * 2 + 1)
+
+        if isinstance(raw_grid, str):
+            flat = _BlockTextDecoder.decode(raw_grid)
+            actual_size = len(flat)
+        else:
+            actual_size = len(raw_grid)
+            flat = None
+
+        if expected_size != actual_size:
+            raise Exception('Block grid received from server did not match expected observation size')
+
+        if flat is None:
+            try:
+                flat = numpy.fromiter(map(BLOCK_CODES.__getitem__, raw_grid), BLOCK_CODE_DTYPE, expected_size)
+            except KeyError as e:
+                raise Exception('Unrecognized block type received from server: {}'.format(e.args[0]))
+
+        return BlockGrid.from_flat_codes(flat, observable_distances)
+
+
+    @staticmethod
+    def from_flat_codes(flat_codes: numpy.ndarray, observable_distances: Vector):
+        '''Constructs a BlockGrid from a flat array of block codes, ordered in the same way as the raw
+        Malmo block grid.'''
+
+        dx, dy, dz = observable_distances.x, observable_distances.y, observable_distances.z
+        codes = flat_codes.reshape((dy * 2 + 1, dz * 2 + 1, dx * 2 + 1)).transpose(2, 0, 1)
+        return BlockGrid(codes, observable_distances)
+
+
+    def get_observable_distances(self):
+        '''Returns the observable distance of this grid in the x, y, and z directions'''
+        return self.__distances
+
+
+    def get_codes(self):
+        '''Returns the underlying array of block codes, indexed in [x, y, z] order. The returned array is a
+        read-only view and should not be modified.'''
+
+        view = self.__codes.view()
+        view.flags.writeable = False
+        return view
+
+
+    def get_block(self, rel_pos: Vector):
+        '''Returns the type of block present at a location, defined in coordinates relative to the agent. An
+        exception will be thrown if the location is outside of this grid.'''
+
+        return BLOCK_PALETTE[self.__codes[self.__to_index(rel_pos)]]
+
+
+    def __getitem__(self, rel_pos: Vector):
+        '''Index view equivalent to get_block'''
+        return self.get_block(rel_pos)
+
+
+    def get_mask(self, block: Block):
+        '''Returns a boolean array, indexed in [x, y, z] order, that is true for every location in this grid
+        containing the given block type.'''
+
+        return self.__codes == BLOCK_CODES[block.value]
+
+
+    def count(self, block: Block, p1: Vector = None, p2: Vector = None):
+        '''Returns the number of blocks of the given type present in this grid. Optionally specify two relative
+        positions on opposite corners of a region (inclusive) to restrict the count to that region.'''
+
+        code = BLOCK_CODES[block.value]
+        if p1 is None or p2 is None:
+            return int(numpy.count_nonzero(self.__codes == code))
+
+        i1 = self.__to_index(p1)
+        i2 = self.__to_index(p2)
+        region = self.__codes[
+            min(i1[0], i2[0]):max(i1[0], i2[0]) + 1,
+            min(i1[1], i2[1]):max(i1[1], i2[1]) + 1,
+            min(i1[2], i2[2]):max(i1[2], i2[2]) + 1]
+        return int(numpy.count_nonzero(region == code))
+
+
+    def find(self, block: Block):
+        '''Returns a list of all relative positions in this grid containing the given block type.'''
+
+        d = self.__distances
+        indices = numpy.argwhere(self.__codes == BLOCK_CODES[block.value])
+        return [Vector(int(i[0]) - d.x, int(i[1]) - d.y, int(i[2]) - d.z) for i in indices]
+
+
+    def __to_index(self, rel_pos: Vector):
+        '''Converts a position relative to the agent into an index into the array of block codes. Raises an
+        exception if the position lies outside the grid.'''
+
+        d = self.__distances
+        x, y, z = int(rel_pos.x), int(rel_pos.y), int(rel_pos.z)
+        if abs(x) > d.x or abs(y) > d.y or abs(z) > d.z:
+            raise Exception('Position ({}, {}, {}) is outside the observable range of the agent'.format(x, y, z))
+        return (x + d.x, y + d.y, z + d.z)
+
+
+
+class _BlockTextDecoder:
+    '''Converts the JSON text of a list of block names directly into an array of block codes.
+
+    Each quoted name in the text is reduced to a 64-bit key built from its first 4 bytes, last 4 bytes and length,
+    gathered from the raw bytes with vectorized operations. Keys are looked up in a small perfect hash table of
+    the keys of every known block name. Since unknown names may share a key with a known one, every byte of every
+    name is then compared against the name of the block it was resolved to.'''
+
+    TABLE_BITS = 14
+    '''Number of bits used to index the perfect hash table'''
+
+    __multiplier = None
+    __table_keys = None
+    __table_codes = None
+    __name_lengths = None
+    __middle_bytes = None
+    __middle_masks = None
+
+
+    @staticmethod
+    def decode(text: str):
+        '''Returns a flat array of block codes for the given text, which must be of the form "a","b",...'''
+
+        if len(text) == 0:
+            return numpy.zeros(0, dtype=BLOCK_CODE_DTYPE)
+
+        try:
+            buf = numpy.frombuffer(text.encode('ascii'), dtype=numpy.uint8)
+        except UnicodeEncodeError:
+            raise Exception('Block grid received from server contains unrecognized block types')
+
+        quotes = numpy.flatnonzero(buf == 34)
+        if len(quotes) == 0 or len(quotes) % 2 != 0:
+            raise Exception('Block grid received from server is malformed')
+
+        _BlockTextDecoder.__init_table()
+        starts = quotes[0::2] + 1
+        lengths = quotes[1::2] - starts
+        if lengths.min() < 3:
+            raise Exception('Block grid received from server contains unrecognized block types')
+        keys = _BlockTextDecoder.__compute_keys(buf, starts, quotes[1::2])
+        slots = _BlockTextDecoder.__compute_slots(keys)
+        if not numpy.array_equal(_BlockTextDecoder.__table_keys[slots], keys):
+            raise Exception('Block grid received from server contains unrecognized block types')
+        codes = _BlockTextDecoder.__table_codes[slots]
+        if not numpy.array_equal(_BlockTextDecoder.__name_lengths[codes], lengths):
+            raise Exception('Block grid received from server contains unrecognized block types')
+
+        # Keys only cover the first and last 4 bytes of each name, so compare the remaining bytes of longer names
+        # against the name of the block they resolved to, 8 bytes at a time
+        long_names = numpy.flatnonzero(lengths > 8)
+        if len(long_names) > 0:
+            long_codes = codes[long_names].astype(numpy.intp)
+            long_starts = starts[long_names]
+            middle_masks = _BlockTextDecoder.__middle_masks
+            middle_bytes = _BlockTextDecoder.__middle_bytes
+            padded = numpy.concatenate([buf, numpy.zeros(middle_masks.shape[1] * 8 + 4, dtype=numpy.uint8)])
+            windows = numpy.ndarray((len(padded) - 7,), dtype='<u8', buffer=padded.data, strides=(1,))
+            for i in range(middle_masks.shape[1]):
+                actual = windows[long_starts + (4 + i * 8)] & middle_masks[long_codes, i]
+                if not numpy.array_equal(actual, middle_bytes[long_codes, i]):
+                    raise Exception('Block grid received from server contains unrecognized block types')
+
+        # Names must be separated by single commas. Malmo sends compact JSON, so first check for names separated by
+        # only quotes and commas before allowing for any whitespace.
+        ends = quotes[1::2]
+        compact = quotes[0] == 0 and ends[-1] == len(buf) - 1 and bool((starts[1:] - ends[:-1] == 3).all()) and \
+                bool((buf[ends[:-1] + 1] == 44).all())
+        if not compact:
+            commas = numpy.cumsum(buf == 44)
+            if numpy.count_nonzero(~_IS_SEPARATOR[buf]) != int(lengths.sum()) or commas[quotes[0]] != 0 or \
+                    commas[-1] != commas[ends[-1]] or not (commas[starts[1:]] - commas[ends[:-1]] == 1).all():
+                raise Exception('Block grid received from server is malformed')
+
+        return codes
+
+
+    @staticmethod
+    def __compute_keys(buf: numpy.ndarray, starts: numpy.ndarray, ends: numpy.ndarray):
+        '''Computes the key of each name buf[starts[i]:ends[i]]. Names are assumed to be at least 3 bytes long,
+        and to be enclosed in quotes.'''
+
+        # Overlapping view of every 4-byte window of the buffer, so that both the leading and trailing bytes of
+        # each name can be gathered with a single lookup
+        padded = numpy.concatenate([buf, numpy.zeros(3, dtype=numpy.uint8)])
+        windows = numpy.ndarray((len(buf),), dtype='<u4', buffer=padded.data, strides=(1,))
+
+        keys = windows[starts].astype(numpy.uint64)
+        keys |= windows[ends - 4].astype(numpy.uint64) << numpy.uint64(32)
+        keys ^= (ends - starts).astype(numpy.uint64) << numpy.uint64(56)
+        return keys
+
+
+    @staticmethod
+    def __compute_slots(keys: numpy.ndarray):
+        '''Maps keys to slots in the perfect hash table using multiplicative hashing'''
+
+        with numpy.errstate(over='ignore'):
+            hashed = keys * _BlockTextDecoder.__multiplier
+        return (hashed >> numpy.uint64(64 - _BlockTextDecoder.TABLE_BITS)).astype(numpy.intp)
+
+
+    @staticmethod
+    def __init_table():
+        '''Builds the perfect hash table of all known block names, if it has not been built already.'''
+
+        if _BlockTextDecoder.__table_keys is not None:
+            return
+
+        names = list(BLOCK_CODES.keys())
+        text = ','.join('"' + name + '"' for name in names)
+        buf = numpy.frombuffer(text.encode('ascii'), dtype=numpy.uint8)
+        quotes = numpy.flatnonzero(buf == 34)
+        keys = _BlockTextDecoder.__compute_keys(buf, quotes[0::2] + 1, quotes[1::2])
+        if len(numpy.unique(keys)) != len(keys):
+            raise Exception('Block name keys are not unique')
+
+        # Search for a multiplier that maps every key to a distinct slot (deterministic sequence of odd numbers)
+        size = 1 << _BlockTextDecoder.TABLE_BITS
+        candidate = 0x9E3779B97F4A7C15
+        while True:
+            _BlockTextDecoder.__multiplier = numpy.uint64(candidate)
+            slots = _BlockTextDecoder.__compute_slots(keys)
+            if len(numpy.unique(slots)) == len(slots):
+                break
+            candidate = (candidate * 6364136223846793005 + 1442695040888963407) % (1 << 64) | 1
+
+        # Unused slots hold a key that can never be produced by a quoted name
+        table_keys = numpy.zeros(size, dtype=numpy.uint64)
+        table_codes = numpy.zeros(size, dtype=BLOCK_CODE_DTYPE)
+        table_keys[slots] = keys
+        table_codes[slots] = [BLOCK_CODES[name] for name in names]
+
+        # Bytes of every block name past its first 4, by code, in 8-byte words. Masks select the bytes of each word
+        # that lie within the name.
+        encoded = [block.value.encode('ascii') for block in BLOCK_PALETTE]
+        num_words = (max(len(name) for name in encoded) - 4 + 7) // 8
+        middle = numpy.zeros((len(encoded), num_words * 8), dtype=numpy.uint8)
+        inside = numpy.zeros((len(encoded), num_words * 8), dtype=numpy.uint8)
+        for code, name in enumerate(encoded):
+            rest = name[4:]
+            middle[code, :len(rest)] = numpy.frombuffer(rest, dtype=numpy.uint8)
+            inside[code, :len(rest)] = 0xFF
+
+        _BlockTextDecoder.__table_codes = table_codes
+        _BlockTextDecoder.__middle_bytes = middle.view('<u8')
+        _BlockTextDecoder.__middle_masks = inside.view('<u8')
+        _BlockTextDecoder.__name_lengths = numpy.array([len(name) for name in encoded], dtype=numpy.intp)
+        _BlockTextDecoder.__table_keys = table_keys
@@ -0,0 +1,83 @@
+from typing import Callable
+
+class CommandBuffer:
+    '''A CommandBuffer collects the commands issued by an agent over the course of a tick, and sends them to the
+    Malmo Minecraft server all at once when flushed.
+
+    Continuous movement commands (such as 'move' or 'turn') set a value that persists on the server until it is
+    changed. For each of these, only the last value issued during a tick is sent, and only if it differs from
+    the last value that was actually sent. All other commands are sent as-is, in the order they were issued.'''
+
+    CONTINUOUS_COMMANDS = frozenset(['move', 'strafe', 'turn', 'pitch'])
+    '''Names of continuous movement commands whose values persist on the server'''
+
+    def __init__(self, send: Callable[[str], None]):
+        '''Constructor. Accepts the function used to send a single command to the server.'''
+
+        self.__send = send
+        self.__queue = []          # type: list[tuple[str, str, float]]
+        self.__last_sent = {}      # type: dict[str, float]
+        self.__num_sent = 0
+        self.__num_suppressed = 0
+
+
+    def add(self, command: str):
+        '''Adds a command to be sent on the next flush'''
+
+        name, _, value = command.partition(' ')
+        if name in CommandBuffer.CONTINUOUS_COMMANDS:
+            self.__queue.append((command, name, CommandBuffer.__to_number(value)))
+        else:
+            self.__queue.append((command, None, None))
+
+
+    def flush(self):
+        '''Sends all buffered commands to the server, dropping redundant continuous movement commands'''
+
+        if len(self.__queue) == 0:
+            return
+
+        # Index of the last occurrence of each continuous command in this tick
+        last_index = {}
+        for idx, (_, name, _) in enumerate(self.__queue):
+            if name is not None:
+                last_index[name] = idx
+
+        for idx, (command, name, value) in enumerate(self.__queue):
+            if name is not None:
+                if last_index[name] != idx or self.__last_sent.get(name) == value:
+                    self.__num_suppressed += 1
+                    continue
+                self.__last_sent[name] = value
+            self.__send(command)
+            self.__num_sent += 1
+
+        self.__queue = []
+
+
+    def clear(self):
+        '''Discards all buffered commands, and forgets the last values sent for continuous movement commands'''
+
+        self.__queue = []
+        self.__last_sent = {}
+
+
+    def get_sent_count(self):
+        '''Returns the total number of commands that have been sent to the server'''
+        return self.__num_sent
+
+
+    def get_suppressed_count(self):
+        '''Returns the total number of commands that were dropped rather than sent to the server'''
+        return self.__num_suppressed
+
+
+    @staticmethod
+    def __to_number(value: str):
+        '''Converts the value of a continuous movement command to a number, so that equivalent values such as
+        '0' and '0.0' compare equal. Values that are not numbers are returned as-is.'''
+
+        try:
+            return float(value)
+        except ValueError:
+            return value
@@ -0,0 +1,367 @@
+from typing import Any, Callable, Union
+from malmoext.types import Mob, Item, Vector, Entity, Category
+import heapq
+import math
+
+class SpatialHash:
+    '''A SpatialHash is a uniform grid over the horizontal (x, z) plane, where each cell stores the values
+    positioned inside it. It supports nearest-neighbor and radius queries that only visit the cells near the
+    query position. Distances are always measured in all 3 dimensions.
+
+    Each value may be stored with a bitmask, which queries can filter on without inspecting the value itself.'''
+
+    def __init__(self, cell_size: float):
+        '''Constructor. Accepts the width of each (square) cell in number of blocks.'''
+
+        self.__cell_size = cell_size
+        self.__cells = {}      # type: dict[tuple[int, int], list[tuple[int, Vector, Any, int]]]
+        self.__size = 0
+        self.__min_cell = None
+        self.__max_cell = None
+        self.__bounds_valid = True
+
+
+    def __len__(self):
+        return self.__size
+
+
+    def insert(self, position: Vector, value: Any, mask: int = 0):
+        '''Adds a value to this hash at the given position. Optionally specify a bitmask to store with the value.'''
+
+        cell = self.__to_cell(position)
+        entry = (self.__size, position, value, mask)
+        entries = self.__cells.get(cell)
+        if entries is None:
+            self.__cells[cell] = [entry]
+            self.__bounds_valid = False
+        else:
+            entries.append(entry)
+        self.__size += 1
+
+
+    def nearest(self, position: Vector, k: int = 1, predicate: Callable[[Any], bool] = None, mask: int = None):
+        '''Returns up to k values closest to the given position, ordered by distance. Optionally specify a
+        predicate that values must satisfy in order to be returned, and/or a bitmask that must share at least one
+        bit with the bitmask of each value returned. Values at equal distances are ordered by insertion.'''
+
+        if self.__size == 0 or k <= 0:
+            return []
+
+        self.__update_bounds()
+
+        # Max-heap (via negated keys) of the k best candidates found so far
+        best = []      # type: list[tuple[float, int, Any]]
+        center = self.__to_cell(position)
+        max_ring = self.__max_ring(center)
+        for ring in range(max_ring + 1):
+
+            # Every point in this ring is at least (ring - 1) cells away from the query position
+            if len(best) == k:
+                min_ring_distance = (ring - 1) * self.__cell_size
+                if min_ring_distance * min_ring_distance > -best[0][0]:
+                    break
+
+            for entry in self.__ring_entries(center, ring):
+                order, entry_position, value, entry_mask = entry
+                if mask is not None and entry_mask & mask == 0:
+                    continue
+                if predicate is not None and not predicate(value):
+                    continue
+                key = (-SpatialHash.__squared_distance(position, entry_position), -order, value)
+                if len(best) < k:
+                    heapq.heappush(best, key)
+                elif key[:2] > best[0][:2]:
+                    heapq.heapreplace(best, key)
+
+        best.sort(key=lambda item: (-item[0], -item[1]))
+        return [item[2] for item in best]
+
+
+    def within(self, position: Vector, radius: float, predicate: Callable[[Any], bool] = None, mask: int = None):
+        '''Returns all values within the given radius of a position, ordered by distance. Optionally specify
+        a predicate that values must satisfy in order to be returned, and/or a bitmask that must share at least one
+        bit with the bitmask of each value returned.'''
+
+        if self.__size == 0:
+            return []
+
+        self.__update_bounds()
+        sqrd_radius = radius * radius
+        x1, z1 = self.__to_cell(Vector(position.x - radius, 0, position.z - radius))
+        x2, z2 = self.__to_cell(Vector(position.x + radius, 0, position.z + radius))
+        x1, z1 = max(x1, self.__min_cell[0]), max(z1, self.__min_cell[1])
+        x2, z2 = min(x2, self.__max_cell[0]), min(z2, self.__max_cell[1])
+
+        found = []
+        for x in range(x1, x2 + 1):
+            for z in range(z1, z2 + 1):
+                for order, entry_position, value, entry_mask in self.__cells.get((x, z), ()):
+                    if mask is not None and entry_mask & mask == 0:
+                        continue
+                    sqrd_distance = SpatialHash.__squared_distance(position, entry_position)
+                    if sqrd_distance <= sqrd_radius and (predicate is None or predicate(value)):
+                        found.append((sqrd_distance, order, value))
+
+        found.sort(key=lambda item: item[:2])
+        return [item[2] for item in found]
+
+
+    def __ring_entries(self, center: 'tuple[int, int]', ring: int):
+        '''Yields all entries stored in the square ring of cells at the given distance (in cells) from a center cell'''
+
+        cx, cz = center
+        if ring == 0:
+            for entry in self.__cells.get(center, ()):
+                yield entry
+            return
+
+        for x in range(cx - ring, cx + ring + 1):
+            for z in (cz - ring, cz + ring):
+                for entry in self.__cells.get((x, z), ()):
+                    yield entry
+        for z in range(cz - ring + 1, cz + ring):
+            for x in (cx - ring, cx + ring):
+                for entry in self.__cells.get((x, z), ()):
+                    yield entry
+
+
+    def __update_bounds(self):
+        '''Recomputes the bounds of the occupied cells, used to know when a search can stop expanding outward, if
+        cells have been occupied since they were last computed'''
+
+        if self.__bounds_valid:
+            return
+        xs = [cell[0] for cell in self.__cells]
+        zs = [cell[1] for cell in self.__cells]
+        self.__min_cell = (min(xs), min(zs))
+        self.__max_cell = (max(xs), max(zs))
+        self.__bounds_valid = True
+
+
+    def __max_ring(self, center: 'tuple[int, int]'):
+        '''Returns the largest ring around a center cell that can contain any occupied cell'''
+
+        return max(abs(center[0] - self.__min_cell[0]), abs(center[0] - self.__max_cell[0]),
+                abs(center[1] - self.__min_cell[1]), abs(center[1] - self.__max_cell[1]))
+
+
+    def __to_cell(self, position: Vector):
+        '''Returns the cell containing the given position'''
+        return (int(math.floor(position.x / self.__cell_size)), int(math.floor(position.z / self.__cell_size)))
+
+
+    @staticmethod
+    def __squared_distance(p1: Vector, p2: Vector):
+        dx = p2.x - p1.x
+        dy = p2.y - p1.y
+        dz = p2.z - p1.z
+        return dx * dx + dy * dy + dz * dz
+
+
+
+class EntityIndex:
+    '''An EntityIndex organizes the entities observed by an agent for fast lookup by type, name, and position.
+    It is built once per observation.
+
+    Searches by position visit either all entities, or the entities of one type or name. Each group of entities
+    is searched with a linear scan, until it has been searched often enough that building a spatial hash over it
+    costs less than scanning it again. Small groups are always scanned. This way, an index that is only searched a
+    few times (as most are, since an index is built for every observation) never pays for building hashes.
+
+    Entities can also be filtered by a bitmask of categories (see Category), in which case an entity matches if
+    its type belongs to any of the categories.'''
+
+    CELL_SIZE = 4
+    '''Width (in number of blocks) of each cell of the spatial hashes used by this index'''
+
+    MAX_SCAN_SIZE = 64
+    '''Largest number of entities that are always searched with a linear scan, rather than a spatial hash'''
+
+    SCANS_BEFORE_HASH = 4
+    '''Number of times a larger group of entities is scanned before a spatial hash is built over it. Building a
+    hash costs about as much as this many scans.'''
+
+    def __init__(self, entities: 'list[Entity]'):
+        '''Constructor. Accepts the list of entities to be indexed.'''
+
+        self.__entities = entities
+        self.__by_name = {}      # type: dict[str, list[Entity]]
+        self.__by_type = None    # type: dict[Union[Mob, Item], list[Entity]]
+        self.__categories = Category.none
+        self.__hashes = {}       # type: dict[int, SpatialHash]
+        self.__scans = {}        # type: dict[int, int]
+
+        # Entities are only grouped by name here. Names are cheaper to hash than types, and the entities of a type
+        # are grouped from these when first needed.
+        by_name = self.__by_name
+        for entity in entities:
+            entities_with_name = by_name.get(entity.name)
+            if entities_with_name is None:
+                by_name[entity.name] = [entity]
+            else:
+                entities_with_name.append(entity)
+
+
+    def get_types(self):
+        '''Returns a dictionary containing all indexed entities, organized by type'''
+        return self.__get_by_type()
+
+
+    def get_by_type(self, aType: Union[Mob, Item]):
+        '''Returns a list of all indexed entities with the given type'''
+        return self.__get_by_type().get(aType, [])
+
+
+    def get_by_name(self, name: str):
+        '''Returns a list of all indexed entities with the given name'''
+        return self.__by_name.get(name, [])
+
+
+    def get_by_category(self, category: int):
+        '''Returns a list of all indexed entities whose type belongs to any of the categories in the given bitmask'''
+
+        by_type = self.__get_by_type()
+        if self.__categories & category == 0:
+            return []
+        return [entity for entities in by_type.values() if Category.matches(entities[0].type, category)
+                for entity in entities]
+
+
+    def nearest(self, position: Vector, k: int = 1, aType: Union[Mob, Item, str] = None,
+            predicate: Callable[[Entity], bool] = None, category: int = None):
+        '''Returns up to k entities closest to a position, ordered by distance. Optionally restrict the search to
+        entities of a given type or name, entities belonging to a bitmask of categories, and/or entities satisfying
+        a predicate.'''
+
+        entities = self.__select(aType, category)
+        if entities is None or k <= 0:
+            return []
+        spatial_hash = self.__get_hash(entities)
+        if spatial_hash is not None:
+            return spatial_hash.nearest(position, k, predicate, category)
+
+        nearest = []
+        for _, _, entity in EntityIndex.__scan(entities, position, category):
+            if predicate is None or predicate(entity):
+                nearest.append(entity)
+                if len(nearest) == k:
+                    break
+        return nearest
+
+
+    def within_radius(self, position: Vector, radius: float, aType: Union[Mob, Item, str] = None,
+            predicate: Callable[[Entity], bool] = None, category: int = None):
+        '''Returns all entities within a radius of a position, ordered by distance. Optionally restrict the search to
+        entities of a given type or name, entities belonging to a bitmask of categories, and/or entities satisfying
+        a predicate.'''
+
+        entities = self.__select(aType, category)
+        if entities is None:
+            return []
+        spatial_hash = self.__get_hash(entities)
+        if spatial_hash is not None:
+            return spatial_hash.within(position, radius, predicate, category)
+
+        sqrd_radius = radius * radius
+        return [entity for sqrd_distance, _, entity in EntityIndex.__scan(entities, position, category)
+                if sqrd_distance <= sqrd_radius and (predicate is None or predicate(entity))]
+
+
+    def __select(self, aType: Union[Mob, Item, str, None], category: int = None):
+        '''Returns the list of entities to search for the given type or name. Returns None if no entity of that type
+        or name, or belonging to the given bitmask of categories, exists.'''
+
+        by_type = self.__get_by_type()
+        if category is not None and self.__categories & category == 0:
+            return None
+        if aType is None:
+            return self.__entities if len(self.__entities) > 0 else None
+        elif isinstance(aType, str):
+            return self.__by_name.get(aType)
+        else:
+            return by_type.get(aType)
+
+
+    def __get_by_type(self):
+        '''Returns a dictionary containing all indexed entities, organized by type, grouping them when first called.
+
+        All entities of a type usually have the same name (agents being the exception). The list of entities with
+        that name is then reused as the list of entities of that type, so that the same spatial hash serves
+        searches by either.'''
+
+        if self.__by_type is not None:
+            return self.__by_type
+
+        by_type = {}         # type: dict[Union[Mob, Item], list[Entity]]
+        shared_names = set() # type: set[str]
+        for name, entities_with_name in self.__by_name.items():
+            aType = entities_with_name[0].type
+            if any(entity.type is not aType for entity in entities_with_name):
+                by_type = None
+                break
+            if aType in by_type:
+                shared_names.add(name)
+                shared_names.add(by_type[aType][0].name)
+            else:
+                by_type[aType] = entities_with_name
+
+        if by_type is None:
+            # Entities with the same name have different types, so group every entity by type instead
+            by_type = {}
+            for entity in self.__entities:
+                entities_of_type = by_type.get(entity.type)
+                if entities_of_type is None:
+                    by_type[entity.type] = [entity]
+                else:
+                    entities_of_type.append(entity)
+        elif len(shared_names) > 0:
+            # Group the entities of types shared by several names again, to keep them in order
+            for name in shared_names:
+                by_type[self.__by_name[name][0].type] = []
+            for entity in self.__entities:
+                if entity.name in shared_names:
+                    by_type[entity.type].append(entity)
+
+        for aType in by_type:
+            self.__categories |= Category.of(aType)
+        self.__by_type = by_type
+        return by_type
+
+
+    def __get_hash(self, entities: 'list[Entity]'):
+        '''Returns the spatial hash of one of the lists of entities held by this index, building it if it is time to.
+        Returns None if the list should be scanned instead.'''
+
+        if len(entities) <= EntityIndex.MAX_SCAN_SIZE:
+            return None
+
+        spatial_hash = self.__hashes.get(id(entities))
+        if spatial_hash is None:
+            scans = self.__scans.get(id(entities), 0)
+            if scans < EntityIndex.SCANS_BEFORE_HASH:
+                self.__scans[id(entities)] = scans + 1
+                return None
+            spatial_hash = SpatialHash(EntityIndex.CELL_SIZE)
+            for entity in entities:
+                spatial_hash.insert(entity.position, entity, Category.of(entity.type))
+            self.__hashes[id(entities)] = spatial_hash
+        return spatial_hash
+
+
+    @staticmethod
+    def __scan(entities: 'list[Entity]', position: Vector, category: int = None):
+        '''Returns the squared distance to a position of each of the given entities belonging to a bitmask of
+        categories, together with the entity, ordered by distance. Entities at equal distances keep their order.'''
+
+        x, y, z = position
+        found = []
+        for order, entity in enumerate(entities):
+            if category is not None and Category.of(entity.type) & category == 0:
+                continue
+            ex, ey, ez = entity.position
+            dx = ex - x
+            dy = ey - y
+            dz = ez - z
+            found.append((dx * dx + dy * dy + dz * dz, order, entity))
+        found.sort()
+        return found
@@ -0,0 +1,125 @@
+import malmo.MalmoPython as MalmoPython
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+class MissionCache:
+    '''A MissionCache holds validated Malmo mission specifications, keyed by the SHA-256 digest of their XML, so
+    that each distinct mission is validated against the Malmo schema only once, however many times it is run.
+
+    Specifications are held in memory, up to a maximum number, discarding the least recently used first. If a
+    directory is given, the XML of every mission that passes validation is also written there, named after its
+    digest. Other processes (such as the workers of a BatchRunner) and later runs sharing that directory then
+    create the specification of the same mission without validating it again.
+
+    The number of lookups served from memory, from disk, and by validating the XML are counted, and can be
+    reported with str().'''
+
+    MAX_ENTRIES = 64
+    '''Default maximum number of specifications held in memory'''
+
+    DIRECTORY_VARIABLE = 'MALMO_MISSION_CACHE_DIR'
+    '''Environment variable naming the directory used by the default cache, if any'''
+
+    __default = None
+
+    def __init__(self, directory: str = None, max_entries: int = MAX_ENTRIES):
+        '''Constructor. Accepts the directory to store validated missions in (or None to only hold them in memory),
+        and the maximum number of specifications held in memory.'''
+
+        self.__directory = directory
+        self.__max_entries = max_entries
+        self.__specs = OrderedDict()    # type: OrderedDict[str, MalmoPython.MissionSpec]
+        self.__memory_hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+
+    @staticmethod
+    def get_default() -> 'MissionCache':
+        '''Returns the cache shared by every backend in this process that is not given its own. It is held in memory
+        only, unless the environment variable named by DIRECTORY_VARIABLE is set.'''
+
+        if MissionCache.__default is None:
+            MissionCache.__default = MissionCache(os.environ.get(MissionCache.DIRECTORY_VARIABLE))
+        return MissionCache.__default
+
+
+    @staticmethod
+    def get_digest(mission_xml: str) -> str:
+        '''Returns the key under which the mission described by the given XML is cached'''
+        return hashlib.sha256(mission_xml.encode('utf-8')).hexdigest()
+
+
+    def get_spec(self, mission_xml: str) -> MalmoPython.MissionSpec:
+        '''Returns a mission specification for the given XML, validating the XML only if it has not been validated
+        before. Throws an exception if the XML is not valid.'''
+
+        digest = MissionCache.get_digest(mission_xml)
+        spec = self.__specs.get(digest)
+        if spec is not None:
+            self.__specs.move_to_end(digest)
+            self.__memory_hits += 1
+            return spec
+
+        path = None if self.__directory is None else os.path.join(self.__directory, digest + '.xml')
+        if path is not None and os.path.exists(path):
+            spec = MalmoPython.MissionSpec(mission_xml, False)
+            self.__disk_hits += 1
+        else:
+            spec = MalmoPython.MissionSpec(mission_xml, True)
+            self.__misses += 1
+            if path is not None:
+                self.__write(path, mission_xml)
+
+        self.__specs[digest] = spec
+        if len(self.__specs) > self.__max_entries:
+            self.__specs.popitem(last=False)
+        return spec
+
+
+    def get_num_lookups(self) -> int:
+        '''Returns the number of specifications requested from this cache'''
+        return self.__memory_hits + self.__disk_hits + self.__misses
+
+
+    def get_memory_hits(self) -> int:
+        '''Returns the number of specifications found in memory'''
+        return self.__memory_hits
+
+
+    def get_disk_hits(self) -> int:
+        '''Returns the number of specifications created without validation because their XML was found on disk'''
+        return self.__disk_hits
+
+
+    def get_misses(self) -> int:
+        '''Returns the number of specifications whose XML had to be validated'''
+        return self.__misses
+
+
+    def get_hit_rate(self) -> float:
+        '''Returns the fraction of lookups that did not need validation, or 0 if there have been none'''
+
+        lookups = self.get_num_lookups()
+        if lookups == 0:
+            return 0.0
+        return (self.__memory_hits + self.__disk_hits) / lookups
+
+
+    def __write(self, path: str, mission_xml: str) -> None:
+        '''Writes validated XML to the given path. The file is written under a temporary name first, so that other
+        processes never see a partially written mission.'''
+
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.__directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(mission_xml)
+        os.replace(temp_path, path)
+
+
+    def __str__(self):
+        return '{} lookups, {} from memory, {} from disk, {} validated ({:.1f}% hit rate)'.format(
+                self.get_num_lookups(), self.__memory_hits, self.__disk_hits, self.__misses, self.get_hit_rate() * 100)
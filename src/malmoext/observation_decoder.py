@@ -0,0 +1,97 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ObservationDecoder:
+    '''Class containing purely static methods for decoding the JSON observation text sent by Malmo.
+
+    The fastest available JSON backend is used by default. If orjson is installed, it will be used. Otherwise,
+    decoding falls back to the json module of the standard library.'''
+
+    BACKENDS = ['orjson', 'json']
+    '''Names of the supported JSON backends, in order of preference'''
+
+    __loads = orjson.loads if orjson is not None else json.loads
+    __backend = 'orjson' if orjson is not None else 'json'
+
+
+    @staticmethod
+    def get_backend():
+        '''Returns the name of the JSON backend currently used to decode observations'''
+        return ObservationDecoder.__backend
+
+
+    @staticmethod
+    def set_backend(name: str):
+        '''Sets the JSON backend used to decode observations. An exception will be thrown if the backend is
+        not supported or not installed.'''
+
+        if name == 'orjson':
+            if orjson is None:
+                raise Exception('JSON backend is not installed: orjson')
+            ObservationDecoder.__loads = orjson.loads
+        elif name == 'json':
+            ObservationDecoder.__loads = json.loads
+        else:
+            raise Exception('Unsupported JSON backend: ' + name)
+        ObservationDecoder.__backend = name
+
+
+    @staticmethod
+    def loads(text: str):
+        '''Decodes a JSON string in full using the current backend'''
+        return ObservationDecoder.__loads(text)
+
+
+    @staticmethod
+    def decode(text: str, grid_name: str = 'blockgrid'):
+        '''Decodes the JSON text of a single Malmo observation.
+
+        The block grid of the observation is not decoded into a list of strings. Instead, the raw text of the
+        grid is sliced out of the observation and stored under the grid's key, for BlockGrid.parse to convert
+        directly into an array of block codes. If the grid cannot be located, the observation is decoded in
+        full.'''
+
+        bounds = ObservationDecoder.__find_array(text, grid_name)
+        if bounds is None:
+            return ObservationDecoder.__loads(text)
+
+        start, end = bounds
+        data = ObservationDecoder.__loads(text[:start] + 'null' + text[end:])
+        data[grid_name] = text[start + 1:end - 1]
+        return data
+
+
+    @staticmethod
+    def __find_array(text: str, key: str):
+        '''Locates the array value associated with a top-level key in JSON text containing only strings. Returns
+        the start and end (exclusive) indices of the array, including its brackets. Returns None if the array
+        could not be located, or may contain escaped characters.'''
+
+        quoted_key = '"' + key + '"'
+        key_idx = text.find(quoted_key)
+        if key_idx < 0:
+            return None
+
+        # Skip whitespace and the separating colon
+        idx = key_idx + len(quoted_key)
+        length = len(text)
+        while idx < length and text[idx] in ' \t\r\n':
+            idx += 1
+        if idx >= length or text[idx] != ':':
+            return None
+        idx += 1
+        while idx < length and text[idx] in ' \t\r\n':
+            idx += 1
+        if idx >= length or text[idx] != '[':
+            return None
+
+        end = text.find(']', idx)
+        if end < 0 or text.find('\\', idx, end) >= 0:
+            return None
+
+        return (idx, end + 1)
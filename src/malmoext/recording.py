@@ -0,0 +1,210 @@
+from malmoext.simulation import SimulatedWorldState, SimulatedObservation
+import mmap
+import struct
+import zlib
+
+class FrameKind:
+    '''Kinds of frames stored in a recording'''
+
+    agent = 0
+    '''Declares an agent. The text of the frame is the agent's name.'''
+
+    tick = 1
+    '''Marks the start of a tick. All following frames belong to this tick, until the next tick frame.'''
+
+    observation = 2
+    '''An observation received by an agent during a tick. The text of the frame is the raw JSON observation.'''
+
+    command = 3
+    '''A command sent to the server by an agent during a tick'''
+
+
+
+class RecordingWriter:
+    '''A RecordingWriter appends the observations received and the commands sent by each agent of a scenario to a
+    compressed log file.
+
+    The file starts with a short header, followed by a sequence of frames. Each frame is a 4-byte little-endian
+    length, followed by that many bytes of compressed data. All frames are compressed as a single zlib stream
+    that is flushed at the end of every frame, so that consecutive observations (which are often nearly
+    identical) compress well, and a file cut short by a crash is still readable up to its last complete frame.'''
+
+    MAGIC = b'MXREC\x01'
+    '''Bytes identifying the start of a recording file, including the format version'''
+
+    LENGTH = struct.Struct('<I')
+    '''Format of the length prefixing each frame'''
+
+    HEADER = struct.Struct('<BHI')
+    '''Format of the header of each (decompressed) frame: kind, agent index, and tick number'''
+
+    COMPRESSION_LEVEL = 1
+    '''zlib compression level. Higher levels make files only slightly smaller, at a much higher cost per tick.'''
+
+    def __init__(self, path: str):
+        '''Constructor. Accepts the path of the file to write. Any existing file at that path is replaced.'''
+
+        self.__file = open(path, 'wb')
+        self.__file.write(RecordingWriter.MAGIC)
+        self.__compressor = zlib.compressobj(RecordingWriter.COMPRESSION_LEVEL)
+        self.__tick = 0
+
+
+    def add_agent(self, index: int, name: str):
+        '''Declares an agent, identified by its index in all later frames'''
+        self.__write(FrameKind.agent, index, name)
+
+
+    def start_tick(self, tick: int):
+        '''Marks the start of a tick'''
+
+        self.__tick = tick
+        self.__write(FrameKind.tick, 0, '')
+
+
+    def add_observation(self, index: int, observation: str):
+        '''Records an observation received by an agent during the current tick'''
+        self.__write(FrameKind.observation, index, observation)
+
+
+    def add_command(self, index: int, command: str):
+        '''Records a command sent by an agent during the current tick'''
+        self.__write(FrameKind.command, index, command)
+
+
+    def close(self):
+        '''Writes any buffered frames, and closes the file'''
+        self.__file.close()
+
+
+    def __write(self, kind: int, index: int, text: str):
+        '''Compresses and appends a single frame'''
+
+        payload = RecordingWriter.HEADER.pack(kind, index, self.__tick) + text.encode('utf-8')
+        data = self.__compressor.compress(payload) + self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.__file.write(RecordingWriter.LENGTH.pack(len(data)))
+        self.__file.write(data)
+
+
+
+class RecordingReader:
+    '''A RecordingReader reads the frames of a file written by a RecordingWriter. The file is memory-mapped rather
+    than read into memory up front.'''
+
+    def __init__(self, path: str):
+        '''Constructor. Accepts the path of the file to read. An exception will be thrown if the file is not a
+        recording.'''
+
+        self.__path = path
+
+
+    def __iter__(self):
+        '''Yields each frame of the recording in order, as a tuple containing its kind, agent index, tick number,
+        and text. A truncated final frame is ignored.'''
+
+        with open(self.__path, 'rb') as fd:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic = RecordingWriter.MAGIC
+                if data[:len(magic)] != magic:
+                    raise Exception('Not a recording: ' + self.__path)
+
+                length_size = RecordingWriter.LENGTH.size
+                header_size = RecordingWriter.HEADER.size
+                decompressor = zlib.decompressobj()
+                offset = len(magic)
+                end = len(data)
+                while offset + length_size <= end:
+                    length = RecordingWriter.LENGTH.unpack_from(data, offset)[0]
+                    offset += length_size
+                    if offset + length > end:
+                        break
+                    payload = decompressor.decompress(data[offset:offset + length])
+                    offset += length
+                    kind, index, tick = RecordingWriter.HEADER.unpack_from(payload)
+                    yield (kind, index, tick, payload[header_size:].decode('utf-8'))
+
+
+    def ticks(self):
+        '''Yields each tick of the recording in order, as a tuple containing the tick number, a list of the
+        (agent name, observation) pairs received, and a list of the (agent name, command) pairs sent'''
+
+        names = {}           # type: dict[int, str]
+        tick = None
+        observations = []
+        commands = []
+        for kind, index, tick_number, text in self:
+            if kind == FrameKind.agent:
+                names[index] = text
+            elif kind == FrameKind.tick:
+                if tick is not None:
+                    yield (tick, observations, commands)
+                tick = tick_number
+                observations = []
+                commands = []
+            elif kind == FrameKind.observation:
+                observations.append((names[index], text))
+            elif kind == FrameKind.command:
+                commands.append((names[index], text))
+        if tick is not None:
+            yield (tick, observations, commands)
+
+
+
+class ReplayHost:
+    '''A connection that hands recorded observations to an agent, and collects the commands the agent sends,
+    providing the same methods as a Malmo AgentHost that agents rely on.'''
+
+    def __init__(self):
+        self.__observation = None
+        self.__commands = []
+
+
+    def queue_observation(self, observation: str):
+        '''Sets the observation returned by the next call to getWorldState'''
+        self.__observation = observation
+
+
+    def take_commands(self):
+        '''Returns all commands sent since the last call to this method'''
+
+        commands = self.__commands
+        self.__commands = []
+        return commands
+
+
+    def peekWorldState(self):
+        return SimulatedWorldState(True, True, [])
+
+
+    def getWorldState(self):
+        observations = []
+        if self.__observation is not None:
+            observations.append(SimulatedObservation(self.__observation))
+            self.__observation = None
+        return SimulatedWorldState(True, True, observations)
+
+
+    def sendCommand(self, command: str):
+        self.__commands.append(command)
+
+
+
+class ReplayStats:
+    '''Summary of a replayed recording'''
+
+    def __init__(self, num_ticks: int, elapsed: float, mismatched_ticks: int):
+        self.num_ticks = num_ticks
+        '''Number of ticks replayed'''
+
+        self.elapsed = elapsed
+        '''Time (in seconds) taken to replay all ticks'''
+
+        self.tick_rate = num_ticks / elapsed if elapsed > 0 else 0.0
+        '''Achieved tick rate (in Hz)'''
+
+        self.mismatched_ticks = mismatched_ticks
+        '''Number of ticks in which the commands sent differed from those recorded'''
+
+    def __str__(self):
+        return '{} ticks in {:.3f} s ({:.1f} Hz), {} ticks with mismatched commands'.format(
+                self.num_ticks, self.elapsed, self.tick_rate, self.mismatched_ticks)
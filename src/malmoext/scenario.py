@@ -1,8 +1,8 @@
-import malmo.MalmoPython as MalmoPython
-from malmoext.malmo_bootstrap import MalmoBootstrap
-from malmo.malmoutils import parse_command_line, get_default_recording_object
 from malmoext.scenario_builder import ScenarioBuilder
 from malmoext.agent import Agent
+from malmoext.backend import Backend, MalmoBackend, InstanceError
+from malmoext.scheduler import WaitPolicy, ObservationWaiter, OverrunPolicy, TickClock, TickStats, TickPhase, TickProfiler
+from malmoext.recording import RecordingWriter, RecordingReader, ReplayHost, ReplayStats
 from abc import abstractmethod
 import time
 
@@ -14,6 +14,12 @@ class Scenario:
     - build_scenario - Constructs the starting state of the simulation
     - on_tick - Performs one or more agent actions on each simulation tick'''
 
+    MIN_START_POLL_INTERVAL = 0.01
+    '''Initial time (in seconds) slept between checks for whether the mission has started'''
+
+    MAX_START_POLL_INTERVAL = 0.5
+    '''Maximum time (in seconds) slept between checks for whether the mission has started'''
+
     def __init__(self):
         self.__builder = ScenarioBuilder()
         self.__agents = {}    # type: dict[str, Agent]
@@ -68,144 +74,248 @@ class Scenario:
         pass
     
 
-    def run(self, ports=[10000]) -> None:
+    def run(self, ports=[10000], incremental_state=False, wait_policy=WaitPolicy.all, wait_deadline=0.1,
+            tick_rate=20.0, overrun_policy=OverrunPolicy.skip, backend: Backend = None, record: str = None,
+            profiler: TickProfiler = None) -> TickStats:
         '''Executes this scenario within the Malmo Minecraft instances running on the given ports. By default, a single
         Malmo Minecraft instance running on port 10000 is assumed.
+
+        If incremental_state is true, each agent state is built from the previous one, reusing any sections of the
+        observation that have not changed. The changes can then be inspected on each tick via state.get_changes().
+
+        The wait policy determines which agents must have received a new observation before each tick is executed
+        (see WaitPolicy). Agents that have not received a new observation keep their previous state for that tick.
+        For the deadline policy, wait_deadline is the maximum time (in seconds) to wait for all agents.
+
+        Ticks are paced at the given tick rate (in Hz), or as fast as observations arrive if the tick rate is None. A
+        tick that takes longer than its time budget is handled according to the overrun policy (see OverrunPolicy).
+        The achieved tick rate, jitter, and number of overruns are reported when the mission ends.
+
+        The tick rate and wait deadline are given in terms of real time. If the scenario runs the server faster than
+        real time (see ScenarioBuilder.set_ms_per_tick), both are scaled by the same factor, so that the number of
+        scenario ticks per game tick stays the same.
+
+        Commands issued by agents during a tick are sent to the server together at the end of the tick. Movement and
+        camera commands that would not change anything are dropped, and the number dropped is reported when the
+        mission ends.
+
+        By default, the scenario runs against Malmo Minecraft. A different backend can be given to run it elsewhere,
+        such as a SimulatedBackend to run it without Minecraft, or a MalmoInstancePool to keep connections alive
+        across many runs.
+
+        If a record path is given, every observation received and every command sent by each agent is written to a
+        compressed log at that path, which can later be replayed without Minecraft (see replay). The log is closed
+        even if the run fails, so that a failed run can be replayed up to the point of failure.
+
+        If a profiler is given, the time spent in each phase of each tick (see TickPhase) is recorded into it, and
+        a summary of the percentiles of each phase is reported when the mission ends. Without a profiler, phases
+        are not timed at all.
+
+        Returns the timing statistics of the ticks executed. Throws an InstanceError if the mission could not be
+        started on the given instances.
         
         Documentation on how to run one or more Malmo Minecraft instances on different ports can be found at
         https://github.com/NateRex/malmoext/blob/master/README.md#running-a-scenario
         '''
 
         # Initialize Malmo Platform environment
-        MalmoBootstrap.init_env()
+        if backend is None:
+            backend = MalmoBackend()
+        backend.init_env()
 
         # Construct scenario
+        self.__builder = ScenarioBuilder()
+        self.__agents = {}
         self.build_scenario(self.__builder)
 
         # Validate scenario
         numAgents = len(self.__builder.agents)
-        if (len(ports) < numAgents):
-            raise Exception('Number of agents must not exceed the number of Malmo Minecraft instances currently running.')
         if (numAgents == 0):
-            print('No agents present in scenario. Exiting.')
-            exit(0)
+            raise Exception('No agents present in scenario.')
 
         # Construct agents
-        clientPool = MalmoPython.ClientPool()
-        agentIdx = 0
-        agentZero = None
         for builder in self.__builder.agents.values():
-            agent = Agent(builder)
+            agent = Agent(builder, incremental_state, backend.create_host())
             self.__agents[agent.get_name()] = agent
-            clientPool.add(MalmoPython.ClientInfo('127.0.0.1', ports[agentIdx]))
-            if (agentZero is None):
-                agentZero = agent
-            agentIdx += 1
-
-        # Load the scenario
-        mission = MalmoPython.MissionSpec(self.__builder.build(), True)
-        parse_command_line(agentZero.get_host())
 
-        # Start the mission
-        agentIdx = 0
-        for agent in self.__agents.values():
-            recordingObject = get_default_recording_object(agentZero.get_host(), "agent_{}_viewpoint_continuous".format(agentIdx + 1))
-            self.__start_host_mission(agent, mission, clientPool, recordingObject, agentIdx, '')
-            agentIdx += 1
+        # Start recording
+        recording = None
+        if record is not None:
+            recording = RecordingWriter(record)
+            for agentIdx, agent in enumerate(self.__agents.values()):
+                agent._record(recording, agentIdx)
+
+        # Close the recording even if the run fails, so that everything up to the failure can be replayed
+        agents = list(self.__agents.values())
+        mission_started = False
+        try:
+            # Start the mission
+            start_time = time.perf_counter()
+            backend.start_mission(agents, self.__builder.build(), ports)
+            mission_started = True
         
-        # Wait for mission to start
-        self.__wait_for_mission_start()
-
-        # While mission is running, repeatedly synchronize the local state with the remote server state,
-        # and execute agent actions (assume the time limit is the same across all agents)
-        while (agentZero.is_mission_active()):
-
-            # Avoid handing off control while we are still waiting to receive observations for one or more agents
-            if not self.__all_agents_have_observations():
-                continue
+            # Wait for mission to start
+            self.__wait_for_mission_start(start_time)
+
+            # While mission is running, repeatedly synchronize the local state with the remote server state,
+            # and execute agent actions (assume the time limit is the same across all agents)
+            # Pacing is scaled to match the speed of the server
+            speedup = self.__builder.get_speedup()
+            waiter = ObservationWaiter(wait_policy, wait_deadline / speedup,
+                    ObservationWaiter.MAX_POLL_INTERVAL / speedup)
+            clock = TickClock(None if tick_rate is None else tick_rate * speedup, overrun_policy)
+            tick = 0
+            profiling = profiler is not None
+            while True:
+
+                # Avoid handing off control while we are still waiting to receive observations for one or more agents
+                if profiling:
+                    phase_start = time.perf_counter()
+                ready_agents = waiter.wait(agents)
+                if ready_agents is None:
+                    break
+                clock.tick()
+                if recording is not None:
+                    recording.start_tick(tick)
+                tick += 1
+                if profiling:
+                    profiler.record(TickPhase.wait, time.perf_counter() - phase_start)
+
+                # Sync agent states
+                for agent in ready_agents:
+                    if profiling:
+                        phase_start = time.perf_counter()
+                        agent._sync()
+                        profiler.record(TickPhase.sync, time.perf_counter() - phase_start, agent.get_name())
+                    else:
+                        agent._sync()
+
+                # Call handler to perform agent actions
+                if profiling:
+                    phase_start = time.perf_counter()
+                    self.on_tick(self.__agents)
+                    profiler.record(TickPhase.on_tick, time.perf_counter() - phase_start)
+                else:
+                    self.on_tick(self.__agents)
+
+                # Send the commands issued during this tick, once per agent
+                for agent in agents:
+                    if profiling:
+                        phase_start = time.perf_counter()
+                        agent._flush_commands()
+                        profiler.record(TickPhase.send, time.perf_counter() - phase_start, agent.get_name())
+                    else:
+                        agent._flush_commands()
+
+                if profiling:
+                    profiler.end_tick()
+                clock.wait()
+
+        finally:
+            if recording is not None:
+                recording.close()
+            if mission_started:
+                backend.end_mission(agents)
 
-            # Sync agent states
-            for agent in self.__agents.values():
+        print('Mission has ended.')
+        stats = clock.get_stats()
+        print('Tick timing: {}'.format(stats))
+        self.__report_native_calls(stats.num_ticks)
+        if profiling:
+            profiler.finish()
+            print('Tick phases: {}'.format(profiler))
+        return stats
+
+
+    def replay(self, path: str, incremental_state=False) -> ReplayStats:
+        '''Replays a recording made by run, without Minecraft. The recorded observations are loaded into each agent
+        state tick by tick, and on_tick is called after each, as fast as possible. Since agent states depend only on
+        the observations received, a scenario whose on_tick is deterministic will issue the same commands as it did
+        when recorded. The commands issued on each tick are compared against those recorded, and the number of ticks
+        in which they differ is reported along with the achieved tick rate.'''
+
+        # Construct scenario and agents, connected to the recording rather than a server
+        builder = ScenarioBuilder()
+        self.build_scenario(builder)
+        agents = {}      # type: dict[str, Agent]
+        hosts = {}       # type: dict[str, ReplayHost]
+        for agent_builder in builder.agents.values():
+            host = ReplayHost()
+            agent = Agent(agent_builder, incremental_state, host)
+            agents[agent.get_name()] = agent
+            hosts[agent.get_name()] = host
+
+        num_ticks = 0
+        mismatched_ticks = 0
+        start = time.perf_counter()
+        for _, observations, commands in RecordingReader(path).ticks():
+            ready_agents = []
+            for name, observation in observations:
+                if name not in agents:
+                    raise Exception('Recording contains an agent that is not present in this scenario: ' + name)
+                hosts[name].queue_observation(observation)
+                ready_agents.append(agents[name])
+
+            for agent in ready_agents:
+                agent._poll()
                 agent._sync()
 
-            # Call handler to perform agent actions
-            self.on_tick(self.__agents)
-
-            time.sleep(0.05)
+            self.on_tick(agents)
 
-        print('Mission has ended.')
+            sent = []
+            for name, agent in agents.items():
+                agent._flush_commands()
+                sent.extend((name, command) for command in hosts[name].take_commands())
+            if sent != commands:
+                mismatched_ticks += 1
+            num_ticks += 1
 
+        stats = ReplayStats(num_ticks, time.perf_counter() - start, mismatched_ticks)
+        print('Replay: {}'.format(stats))
+        return stats
 
-    def __start_host_mission(self, agent, mission, client_pool, recording, role, experimentId) -> None:
-        '''Attempts to start a mission for an agent host. Will automatically retry on failure. After multiple,
-        failures, an error will be reported and the program will exit.'''
 
-        used_attempts = 0
-        max_attempts = 5
-        print("Starting mission for agent ", role)
+    def __wait_for_mission_start(self, start_time: float) -> None:
+        '''This method will block execution until all given hosts have succesfully started their mission. If any host
+        fails to begin their mission, an InstanceError is thrown. The time taken for each
+        agent to start, measured from the given start time, is reported.
+
+        The timeout is measured from when this method is called, since starting the mission may have waited any
+        length of time for a server to warm up. Every host is checked at least once before timing out.'''
+        print("Waiting for the mission to start")
+        agents = list(self.__agents.values())
+        start_times = {}    # type: dict[str, float]
+        time_out = 120  # Allow two minutes for mission to start.
+        interval = Scenario.MIN_START_POLL_INTERVAL
+        wait_start = time.perf_counter()
         while True:
-            try:
-                agent.get_host().startMission(mission, client_pool, recording, role, experimentId)
+            for agent in agents:
+                if agent.get_name() in start_times:
+                    continue
+                state = agent.get_host().peekWorldState()
+                if len(state.errors) > 0:
+                    raise InstanceError("Errors waiting for mission start:\n" + '\n'.join(e.text for e in state.errors))
+                if state.has_mission_begun:
+                    start_times[agent.get_name()] = time.perf_counter() - start_time
+            if len(start_times) == len(agents):
                 break
-            except MalmoPython.MissionException as e:
-                errorCode = e.details.errorCode
-                if errorCode == MalmoPython.MissionErrorCode.MISSION_SERVER_WARMING_UP:
-                    print("Server not quite ready yet - waiting...")
-                    time.sleep(2)
-                elif errorCode == MalmoPython.MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE:
-                    print("Not enough available Minecraft instances running.")
-                    used_attempts += 1
-                    if used_attempts < max_attempts:
-                        print("Will wait in case they are starting up.", max_attempts - used_attempts, "attempts left.")
-                        time.sleep(2)
-                elif errorCode == MalmoPython.MissionErrorCode.MISSION_SERVER_NOT_FOUND:
-                    print("Server not found - has the mission with role 0 been started yet?")
-                    used_attempts += 1
-                    if used_attempts < max_attempts:
-                        print("Will wait and retry.", max_attempts - used_attempts, "attempts left.")
-                        time.sleep(2)
-                else:
-                    print("Other error:", e.message)
-                    print("Waiting will not help here - bailing immediately.")
-                    exit(1)
-            if used_attempts == max_attempts:
-                print("All chances used up - bailing now.")
-                exit(1)
-        print("startMission called okay.")
+            if time.perf_counter() - wait_start >= time_out:
+                raise InstanceError("Timed out waiting for mission to begin.")
+            time.sleep(interval)
+            interval = min(interval * 2, Scenario.MAX_START_POLL_INTERVAL)
+        print("Mission has started. Time to start: {}".format(
+                ', '.join('{}={:.2f} s'.format(name, elapsed) for name, elapsed in start_times.items())))
 
 
-    def __wait_for_mission_start(self) -> None:
-        '''This method will block execution until all given hosts have succesfully started their mission. If any host
-        fails to begin their mission, a timeout error will occur and the program will exit.'''
-        print("Waiting for the mission to start", end=' ')
-        agents = self.__agents.values()
-        start_flags = [False for a in agents]
-        start_time = time.time()
-        time_out = 120  # Allow two minutes for mission to start.
-        while not all(start_flags) and time.time() - start_time < time_out:
-            states = [a.get_host().peekWorldState() for a in agents]
-            start_flags = [w.has_mission_begun for w in states]
-            errors = [e for w in states for e in w.errors]
-            if len(errors) > 0:
-                print("Errors waiting for mission start:")
-                for e in errors:
-                    print(e.text)
-                print("Bailing now.")
-                exit(1)
-            time.sleep(0.1)
-            print(".", end=' ')
-        print()
-        if time.time() - start_time >= time_out:
-            print("Timed out waiting for mission to begin. Bailing.")
-            exit(1)
-        print("Mission has started.")
-
-
-    def __all_agents_have_observations(self):
-        '''Returns true if all agents have a received a new observation from the server. Returns false otherwise.'''
+    def __report_native_calls(self, num_ticks: int):
+        '''Prints the average number of calls made to the Malmo AgentHost of each agent per tick'''
+
+        if num_ticks == 0:
+            return
 
+        print('Native calls per tick:')
         for agent in self.__agents.values():
-            num_observations = agent.get_host().peekWorldState().number_of_observations_since_last_state
-            if num_observations == 0:
-                return False
-        return True
\ No newline at end of file
+            counts = agent.get_native_call_counts()
+            print('  {}: {} (suppressed commands={:.2f})'.format(agent.get_name(),
+                    ', '.join('{}={:.2f}'.format(name, count / num_ticks) for name, count in sorted(counts.items())),
+                    agent.get_suppressed_command_count() / num_ticks))
\ No newline at end of file
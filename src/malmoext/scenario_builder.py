@@ -1,5 +1,9 @@
-from typing import Union
+from typing import Any, Union
+import io
+import math
 from malmoext.types import Mob, Block, Item, Direction, Inventory, TimeOfDay, PEACEFUL_MOBS, HOSTILE_MOBS, Vector
+from malmoext.voxels import VoxelMerger
+from malmoext.block_grid import BLOCK_PALETTE
 
 class ScenarioBuilder:
     '''A ScenarioBuilder is the top-level builder used to define the agents and objects present in
@@ -9,12 +13,18 @@ class ScenarioBuilder:
     An empty ScenarioBuilder instance is provided to the 'init' method of each Scenario, which
     is where construction takes place.'''
 
+    DEFAULT_MS_PER_TICK = 50
+    '''Length (in milliseconds) of a game tick when the server runs in real time'''
+
     def __init__(self):
         '''Constructor'''
 
         self.__description = ''
         self.__time_limit = 3600.0
         self.__time_of_day = TimeOfDay.noon.value
+        self.__reuse_world = False
+        self.__clear_margin = 10
+        self.__ms_per_tick = None
         self.world = WorldBuilder()
         self.agents = {}   # type: dict[str, AgentBuilder]
 
@@ -25,7 +35,9 @@ class ScenarioBuilder:
         return self
 
     def set_time_limit(self, timeLimit: float):
-        '''Set the time limit for the scenario (in decimal seconds).'''
+        '''Set the time limit for the scenario (in decimal seconds). The limit is measured in game time, at 20 game
+        ticks per second, so it covers the same number of game ticks regardless of the speed of the server (see
+        set_ms_per_tick).'''
         
         self.__time_limit = timeLimit
         return self
@@ -39,6 +51,38 @@ class ScenarioBuilder:
             self.__time_of_day = timeOfDay.value
         return self
 
+    def set_ms_per_tick(self, ms_per_tick: int):
+        '''Sets the length (in milliseconds) of each game tick on the server. Minecraft runs in real time at 50 ms
+        per tick. Shorter ticks run the server faster than real time (for example, 10 ms runs it 5 times faster),
+        and Scenario.run speeds up its own ticks to match. The length must be a whole number of milliseconds.'''
+
+        if ms_per_tick != int(ms_per_tick):
+            raise Exception('The length of a game tick must be a whole number of milliseconds')
+        if ms_per_tick <= 0:
+            raise Exception('The length of a game tick must be positive')
+        self.__ms_per_tick = int(ms_per_tick)
+        return self
+
+    def get_speedup(self):
+        '''Returns how many times faster than real time the server runs'''
+
+        if self.__ms_per_tick is None:
+            return 1.0
+        return ScenarioBuilder.DEFAULT_MS_PER_TICK / self.__ms_per_tick
+
+    def set_reuse_world(self, reuse: bool = True, clear_margin: int = 10):
+        '''Sets whether the world left by the previous mission on each Minecraft instance should be reused, rather
+        than generated again. This makes starting a mission much faster when the same scenario is run repeatedly on
+        the same instances (see MalmoInstancePool).
+
+        When reusing the world, the region containing every object drawn in the world and every agent's starting
+        position, extended horizontally and upward by the given margin (in blocks), is cleared before the world is
+        drawn. Changes made during the previous mission outside of this region are not undone.'''
+
+        self.__reuse_world = reuse
+        self.__clear_margin = clear_margin
+        return self
+
     def add_agent(self, name):
         '''Adds a new agent to the scenario. The builder for this new agent can later be accessed via
         the 'agents' dictionary stored on the ScenarioBuilder.'''
@@ -61,13 +105,16 @@ class ScenarioBuilder:
         for mob in mobSpawnList:
             mobSpawnStr = mobSpawnStr + mob + " "
 
-        # Build xml data for world data
-        xml = '''
+        # Build xml data for world data. Sections are written to a single buffer, so that the (potentially large)
+        # world section is never copied.
+        out = io.StringIO()
+        out.write('''
         <?xml version="1.0" encoding="UTF-8" standalone="no" ?>
         <Mission xmlns="http://ProjectMalmo.microsoft.com" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
             <About>
                 <Summary>{}</Summary>
             </About>
+            {}
 
             <ServerSection>
                     <ServerInitialConditions>
@@ -79,20 +126,52 @@ class ScenarioBuilder:
                         <AllowSpawning>{}</AllowSpawning>
                         <AllowedMobs>{}</AllowedMobs>
                     </ServerInitialConditions>
-            
+
                 <ServerHandlers>
-                        {}
+                        '''.format(self.__description, self.__build_mod_settings(), self.__time_of_day, "false" if len(mobSpawnList) == 0 else "true", mobSpawnStr))
+        self.world.write(out, self.__get_clear_region())
+        out.write('''
                         <ServerQuitFromTimeUp timeLimitMs="{}" description="out_of_time"/>
                     <ServerQuitWhenAnyAgentFinishes/>
                 </ServerHandlers>
             </ServerSection>
-            '''.format(self.__description, self.__time_of_day, "false" if len(mobSpawnList) == 0 else "true", mobSpawnStr, self.world.build(), timeLimitMs)
-        
+            '''.format(timeLimitMs))
+
         # Add XML for each agent
         for agent in self.agents.values():
-            xml += agent.build()
+            out.write(agent.build())
+
+        out.write("</Mission>")
+        return out.getvalue()
+
+    def __build_mod_settings(self):
+        '''Returns the XML of the ModSettings section, which sets the length of a game tick when it differs from
+        real time'''
 
-        return xml + "</Mission>"
+        if self.__ms_per_tick is None:
+            return ''
+        return '<ModSettings><MsPerTick>{}</MsPerTick></ModSettings>'.format(self.__ms_per_tick)
+
+    def __get_clear_region(self):
+        '''Returns the opposite corners of the region that should be cleared before drawing the world, or None if
+        the world is not reused'''
+
+        if not self.__reuse_world:
+            return None
+
+        points = [agent.get_position() for agent in self.agents.values()]
+        bounds = self.world.get_bounds()
+        if bounds is not None:
+            points.extend(bounds)
+        if len(points) == 0:
+            return None
+
+        # DrawCuboid takes block coordinates, so round outwards to whole blocks
+        margin = self.__clear_margin
+        return (Vector(math.floor(min(p.x for p in points) - margin), WorldBuilder.GROUND_HEIGHT,
+                        math.floor(min(p.z for p in points) - margin)),
+                Vector(math.ceil(max(p.x for p in points) + margin), math.ceil(max(p.y for p in points) + margin),
+                        math.ceil(max(p.z for p in points) + margin)))
 
 class WorldBuilder:
     '''The WorldBuilder enables the placement of structures, mobs, and items within the Minecraft
@@ -100,12 +179,27 @@ class WorldBuilder:
     
     By default, natural mob spawning is disabled for all types of mobs.'''
 
+    GROUND_HEIGHT = 4
+    '''Height of the first layer of air above the ground of the generated world'''
+
+    # Templates of the XML elements drawn by the DrawingDecorator. Each object added to the world is stored as a
+    # template and the values to fill it with, and only converted to XML when the world is built.
+    __DRAW_BLOCK = '<DrawBlock x="{}" y="{}" z="{}" type="{}"/>'
+    __DRAW_BLOCK_VARIANT = '<DrawBlock x="{}" y="{}" z="{}" type="{}" variant="{}"/>'
+    __DRAW_CUBOID = '<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}"/>'
+    __DRAW_CUBOID_VARIANT = '<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}" variant="{}"/>'
+    __DRAW_SPHERE = '<DrawSphere x="{}" y="{}" z="{}" radius="{}" type="{}"/>'
+    __DRAW_SPHERE_VARIANT = '<DrawSphere x="{}" y="{}" z="{}" radius="{}" type="{}" variant="{}"/>'
+    __DRAW_ITEM = '<DrawItem x="{}" y="{}" z="{}" type="{}"/>'
+    __DRAW_ENTITY = '<DrawEntity x="{}" y="{}" z="{}" type="{}"/>'
+
     def __init__(self):
         '''Constructor'''
         
         self.__generator_string = '3;7,2*3,2;1;'
-        self.__decorators_xml = ""
+        self.__decorators = []            # type: list[tuple[str, tuple]]
         self.__allowed_to_spawn = set()   # type: set[Mob]
+        self.__bounds = None              # type: list[float]
 
     def get_mobs_allowed_to_spawn(self):
         '''Returns the set of mob names that are allowed to naturally spawn'''
@@ -139,14 +233,24 @@ class WorldBuilder:
             self.__allowed_to_spawn.discard(m)
         return self
 
+    def get_bounds(self):
+        '''Returns the opposite corners of the smallest box containing everything drawn in the world so far, or None
+        if nothing has been drawn'''
+
+        bounds = self.__bounds
+        if bounds is None:
+            return None
+        return (Vector(bounds[0], bounds[1], bounds[2]), Vector(bounds[3], bounds[4], bounds[5]))
+
     def add_block(self, block: Block, p: Vector, variant: Mob = None):
         '''Adds a single block to the world. If the block type is a mob spawner, an additional variant value must
         be provided describing the type of mob.'''
 
+        self.__extend_bounds(p, p)
         if (variant != None):
-            self.__decorators_xml += '''<DrawBlock x="{}" y="{}" z="{}" type="{}" variant="{}"/>'''.format(p.x, p.y, p.z, block.value, variant.value)
+            self.__decorators.append((WorldBuilder.__DRAW_BLOCK_VARIANT, (p.x, p.y, p.z, block.value, variant.value)))
         else:
-            self.__decorators_xml += '''<DrawBlock x="{}" y="{}" z="{}" type="{}"/>'''.format(p.x, p.y, p.z, block.value)
+            self.__decorators.append((WorldBuilder.__DRAW_BLOCK, (p.x, p.y, p.z, block.value)))
         return self
 
     def add_cube(self, block: Block, p1: Vector, p2: Vector,
@@ -155,10 +259,11 @@ class WorldBuilder:
         on opposite corners of the cube. If the block type is a mob spawner, an additional variant value must
         be provided describing the type of mob.'''
 
+        self.__extend_bounds(p1, p2)
         if (variant != None):
-            self.__decorators_xml += '''<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}" variant="{}"/>'''.format(p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value, variant.value)
+            self.__decorators.append((WorldBuilder.__DRAW_CUBOID_VARIANT, (p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value, variant.value)))
         else:
-            self.__decorators_xml += '''<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}"/>'''.format(p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value)
+            self.__decorators.append((WorldBuilder.__DRAW_CUBOID, (p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value)))
         return self
 
     def add_line(self, block: Block, p1: Vector, p2: Vector,
@@ -167,10 +272,11 @@ class WorldBuilder:
         two points. If the block type is a mob spawner, an additional variant value must be provided describing
         the type of mob.'''
 
+        self.__extend_bounds(p1, p2)
         if (variant != None):
-            self.__decorators_xml += '''<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}" variant="{}"/>'''.format(p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value, variant.value)
+            self.__decorators.append((WorldBuilder.__DRAW_CUBOID_VARIANT, (p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value, variant.value)))
         else:
-            self.__decorators_xml += '''<DrawCuboid x1="{}" y1="{}" z1="{}" x2="{}" y2="{}" z2="{}" type="{}"/>'''.format(p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value)
+            self.__decorators.append((WorldBuilder.__DRAW_CUBOID, (p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, block.value)))
         return self
 
     def add_sphere(self, block, center, radius, variant = None):
@@ -178,31 +284,91 @@ class WorldBuilder:
         If the block type specified is a mob spawner, an additional variant value must be provided describing the type of
         mob.'''
 
+        self.__extend_bounds(Vector(center.x - radius, center.y - radius, center.z - radius),
+                Vector(center.x + radius, center.y + radius, center.z + radius))
         if (variant != None):
-            self.__decorators_xml += '''<DrawSphere x="{}" y="{}" z="{}" radius="{}" type="{}" variant="{}"/>'''.format(center.x, center.y, center.z, radius, block.value, variant.value)
+            self.__decorators.append((WorldBuilder.__DRAW_SPHERE_VARIANT, (center.x, center.y, center.z, radius, block.value, variant.value)))
         else:
-            self.__decorators_xml += '''<DrawSphere x="{}" y="{}" z="{}" radius="{}" type="{}"/>'''.format(center.x, center.y, center.z, radius, block.value)
+            self.__decorators.append((WorldBuilder.__DRAW_SPHERE, (center.x, center.y, center.z, radius, block.value)))
+        return self
+
+    def add_voxels(self, voxels: Any, origin: Vector = Vector(0, 0, 0)):
+        '''Adds a volume of blocks to the world. Voxels may either be given as a 3-dimensional array (or nested
+        lists) of blocks indexed in [x, y, z] order, where index [0, 0, 0] is placed at the given origin, or as a
+        dictionary mapping positions relative to the origin (vectors or (x, y, z) tuples) to blocks. Voxels that
+        are None are left as they are.
+
+        Adjacent voxels of the same block are merged into cuboids (see VoxelMerger), so that large structures
+        are drawn with far fewer elements than one per block.'''
+
+        codes, offset = VoxelMerger.to_codes(voxels)
+        ox, oy, oz = origin.x + offset[0], origin.y + offset[1], origin.z + offset[2]
+        for code, (x1, y1, z1), (x2, y2, z2) in VoxelMerger.merge(codes):
+            block = BLOCK_PALETTE[code]
+            p1 = Vector(ox + x1, oy + y1, oz + z1)
+            if x1 == x2 and y1 == y2 and z1 == z2:
+                self.add_block(block, p1)
+            else:
+                self.add_cube(block, p1, Vector(ox + x2, oy + y2, oz + z2))
         return self
 
     def add_item(self, item: Item, p: Vector):
         '''Adds a drop-item to the world at a specific coordinate location.'''
 
-        self.__decorators_xml += '''<DrawItem x="{}" y="{}" z="{}" type="{}"/>'''.format(p.x, p.y, p.z, item.value)
+        self.__extend_bounds(p, p)
+        self.__decorators.append((WorldBuilder.__DRAW_ITEM, (p.x, p.y, p.z, item.value)))
         return self
 
     def add_mob(self, mob: Mob, p: Vector):
         '''Positions a mob at a specific coordinate location.'''
 
-        self.__decorators_xml += '''<DrawEntity x="{}" y="{}" z="{}" type="{}"/>'''.format(p.x, p.y, p.z, mob.value)
+        self.__extend_bounds(p, p)
+        self.__decorators.append((WorldBuilder.__DRAW_ENTITY, (p.x, p.y, p.z, mob.value)))
         return self
 
-    def build(self):
-        '''Builds an XML string representing the contents of this builder that can be read by the Malmo Platform'''
-
-        return '''
-        <FlatWorldGenerator forceReset="true" generatorString="{}"/>
-        {}
-        '''.format(self.__generator_string, "<DrawingDecorator>" + self.__decorators_xml + "</DrawingDecorator>" if len(self.__decorators_xml) > 0 else "")
+    def build(self, clear_region: 'tuple[Vector, Vector]' = None):
+        '''Builds an XML string representing the contents of this builder that can be read by the Malmo Platform.
+        If a region to clear is given, the world left by the previous mission is reused rather than generated again,
+        and the region is filled with air before anything else is drawn.'''
+
+        out = io.StringIO()
+        self.write(out, clear_region)
+        return out.getvalue()
+
+    def write(self, out: io.TextIOBase, clear_region: 'tuple[Vector, Vector]' = None):
+        '''Writes the XML built by build to the given stream. Each object in the world is converted to XML exactly
+        once, so the time taken grows linearly with the number of objects.'''
+
+        out.write('''
+        <FlatWorldGenerator forceReset="{}" generatorString="{}"/>
+        '''.format("false" if clear_region is not None else "true", self.__generator_string))
+
+        if clear_region is None and len(self.__decorators) == 0:
+            return
+
+        write = out.write
+        write('<DrawingDecorator>')
+        if clear_region is not None:
+            p1, p2 = clear_region
+            write(WorldBuilder.__DRAW_CUBOID.format(p1.x, p1.y, p1.z, p2.x, p2.y, p2.z, 'air'))
+        for template, values in self.__decorators:
+            write(template.format(*values))
+        write('</DrawingDecorator>')
+
+    def __extend_bounds(self, p1: Vector, p2: Vector):
+        '''Extends the bounds of everything drawn in the world to include the box with the given opposite corners'''
+
+        bounds = self.__bounds
+        if bounds is None:
+            self.__bounds = [min(p1.x, p2.x), min(p1.y, p2.y), min(p1.z, p2.z),
+                    max(p1.x, p2.x), max(p1.y, p2.y), max(p1.z, p2.z)]
+            return
+        bounds[0] = min(bounds[0], p1.x, p2.x)
+        bounds[1] = min(bounds[1], p1.y, p2.y)
+        bounds[2] = min(bounds[2], p1.z, p2.z)
+        bounds[3] = max(bounds[3], p1.x, p2.x)
+        bounds[4] = max(bounds[4], p1.y, p2.y)
+        bounds[5] = max(bounds[5], p1.z, p2.z)
 
 
 class AgentBuilder:
@@ -225,6 +391,10 @@ class AgentBuilder:
         '''Returns the observable distance of this agent in the x, y, and z directions'''
         return self.__observable_distances
 
+    def get_position(self):
+        '''Returns the starting location of this agent'''
+        return self.__pos
+
     def set_position(self, pos):
         '''Set the starting location for this agent'''
         self.__pos = pos
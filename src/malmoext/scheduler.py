@@ -0,0 +1,406 @@
+from malmoext.types import ReflectiveEnum
+from typing import Callable
+from collections import OrderedDict
+import math
+import time
+
+class WaitPolicy(ReflectiveEnum):
+    '''Enum type describing which agents must have received a new observation before a tick is executed'''
+
+    all = 'all'
+    '''Wait until every agent has received a new observation'''
+
+    any = 'any'
+    '''Wait until at least one agent has received a new observation'''
+
+    deadline = 'deadline'
+    '''Wait until every agent has received a new observation, or until a deadline has passed and at least one
+    agent has received a new observation'''
+
+
+
+class ObservationWaiter:
+    '''An ObservationWaiter blocks execution until agents have received new observations from the Malmo
+    Minecraft server, according to a WaitPolicy.
+
+    Malmo does not provide a way to block until an observation arrives, so waiting is performed by polling each
+    agent's world state. The interval between polls grows exponentially while nothing arrives, so that waiting
+    never spins a core at full speed. Regardless of policy, an agent that has not received any observation yet
+    is always waited on.'''
+
+    MIN_POLL_INTERVAL = 0.001
+    '''Initial time (in seconds) slept between polls of the server'''
+
+    MAX_POLL_INTERVAL = 0.02
+    '''Maximum time (in seconds) slept between polls of the server'''
+
+    def __init__(self, policy: WaitPolicy = WaitPolicy.all, deadline: float = 0.1,
+            max_poll_interval: float = MAX_POLL_INTERVAL):
+        '''Constructor. Accepts the policy used to decide when to stop waiting and, for the deadline policy, the
+        maximum time (in seconds) to wait for every agent. Optionally accepts the maximum time (in seconds) slept
+        between polls, which should be shorter than the time between observations.'''
+
+        self.__policy = policy
+        self.__deadline = deadline
+        self.__max_poll_interval = max_poll_interval
+
+
+    def get_policy(self):
+        '''Returns the policy used by this waiter'''
+        return self.__policy
+
+
+    def wait(self, agents: 'list[Agent]'):
+        '''Blocks until the given agents have received new observations, according to the policy of this waiter.
+        Assumes the mission of the first agent determines whether the mission is still active.
+
+        Returns the list of agents that have received a new observation, or None if the mission has ended.'''
+
+        start_time = time.perf_counter()
+        interval = min(ObservationWaiter.MIN_POLL_INTERVAL, self.__max_poll_interval)
+        while True:
+            for agent in agents:
+                agent._poll()
+            if not agents[0].is_mission_active():
+                return None
+
+            ready = [agent for agent in agents if agent._has_observation()]
+            if self.__is_satisfied(agents, ready, start_time):
+                return ready
+
+            time.sleep(interval)
+            interval = min(interval * 2, self.__max_poll_interval)
+
+
+    def __is_satisfied(self, agents: 'list[Agent]', ready: 'list[Agent]', start_time: float):
+        '''Returns true if the given set of ready agents satisfies the policy of this waiter'''
+
+        if len(ready) == len(agents):
+            return True
+        if len(ready) == 0:
+            return False
+
+        # Agents without any state cannot be skipped
+        for agent in agents:
+            if agent.state is None and not agent._has_observation():
+                return False
+
+        if self.__policy == WaitPolicy.any:
+            return True
+        elif self.__policy == WaitPolicy.deadline:
+            return time.perf_counter() - start_time >= self.__deadline
+        return False
+
+
+
+class OverrunPolicy(ReflectiveEnum):
+    '''Enum type describing how a TickClock responds when a tick takes longer than its time budget'''
+
+    skip = 'skip'
+    '''Drop any ticks that were missed, and wait for the next scheduled tick'''
+
+    catch_up = 'catch_up'
+    '''Run any ticks that were missed back-to-back, until the schedule has been restored'''
+
+    warn = 'warn'
+    '''Print a warning, and restart the schedule from the current time'''
+
+
+
+class TickStats:
+    '''Summary of the timing of ticks paced by a TickClock'''
+
+    def __init__(self, num_ticks: int, elapsed: float, mean_interval: float, jitter: float, overruns: int,
+            skipped_ticks: int, target_rate: float):
+        self.num_ticks = num_ticks
+        '''Number of ticks executed'''
+
+        self.achieved_rate = (num_ticks - 1) / elapsed if num_ticks > 1 and elapsed > 0 else 0.0
+        '''Achieved tick rate (in Hz)'''
+
+        self.mean_interval = mean_interval
+        '''Mean time (in seconds) between the start of consecutive ticks'''
+
+        self.jitter = jitter
+        '''Standard deviation (in seconds) of the time between the start of consecutive ticks'''
+
+        self.overruns = overruns
+        '''Number of ticks that exceeded their time budget'''
+
+        self.skipped_ticks = skipped_ticks
+        '''Number of scheduled ticks that were dropped due to overruns'''
+
+        self.target_rate = target_rate
+        '''Target tick rate (in Hz), or None if ticks were not paced'''
+
+    def __str__(self):
+        target = 'unpaced' if self.target_rate is None else 'target {:.2f} Hz'.format(self.target_rate)
+        return '{} ticks at {:.2f} Hz ({}), jitter {:.2f} ms, {} overruns, {} skipped ticks'.format(
+                self.num_ticks, self.achieved_rate, target, self.jitter * 1000, self.overruns, self.skipped_ticks)
+
+
+
+class TickClock:
+    '''A TickClock paces a loop at a fixed tick rate. Rather than sleeping for a fixed amount of time after each
+    tick, it sleeps only for whatever remains of the tick's time budget, so that the rate does not drift as the
+    amount of work per tick changes. Ticks that exceed their budget are handled according to an OverrunPolicy.'''
+
+    def __init__(self, tick_rate: float = 20.0, overrun_policy: OverrunPolicy = OverrunPolicy.skip):
+        '''Constructor. Accepts the target tick rate (in Hz) and the policy used to handle overruns. If the tick
+        rate is None, ticks are not paced at all.'''
+
+        self.__tick_rate = tick_rate
+        self.__period = None if tick_rate is None else 1.0 / tick_rate
+        self.__overrun_policy = overrun_policy
+        self.__next_tick = None
+        self.__first_tick = None
+        self.__last_tick = None
+        self.__num_ticks = 0
+        self.__mean_interval = 0.0
+        self.__sum_sqrd_diffs = 0.0
+        self.__overruns = 0
+        self.__skipped_ticks = 0
+
+
+    def get_tick_rate(self):
+        '''Returns the target tick rate (in Hz) of this clock, or None if ticks are not paced'''
+        return self.__tick_rate
+
+
+    def tick(self):
+        '''Marks the start of a tick. The first call starts the schedule of this clock.'''
+
+        now = time.perf_counter()
+        if self.__first_tick is None:
+            self.__first_tick = now
+            if self.__period is not None:
+                self.__next_tick = now + self.__period
+        else:
+            # Welford's online algorithm for the mean and variance of tick intervals
+            interval = now - self.__last_tick
+            count = self.__num_ticks
+            delta = interval - self.__mean_interval
+            self.__mean_interval += delta / count
+            self.__sum_sqrd_diffs += delta * (interval - self.__mean_interval)
+
+        self.__last_tick = now
+        self.__num_ticks += 1
+
+
+    def wait(self):
+        '''Blocks until the next tick is scheduled to start. Should be called at the end of each tick.'''
+
+        if self.__period is None or self.__next_tick is None:
+            return
+
+        now = time.perf_counter()
+        if now < self.__next_tick:
+            time.sleep(self.__next_tick - now)
+            self.__next_tick += self.__period
+            return
+
+        # This tick ran past the start of the next one
+        self.__overruns += 1
+        if self.__overrun_policy == OverrunPolicy.catch_up:
+            self.__next_tick += self.__period
+
+        elif self.__overrun_policy == OverrunPolicy.warn:
+            print('Warning: tick exceeded its time budget by {:.1f} ms'.format((now - self.__next_tick) * 1000))
+            self.__next_tick = now + self.__period
+
+        else:
+            missed = int((now - self.__next_tick) / self.__period) + 1
+            self.__skipped_ticks += missed
+            self.__next_tick += missed * self.__period
+            time.sleep(max(self.__next_tick - time.perf_counter(), 0))
+            self.__next_tick += self.__period
+
+
+    def get_stats(self):
+        '''Returns a summary of the timing of all ticks so far'''
+
+        elapsed = 0.0 if self.__first_tick is None else self.__last_tick - self.__first_tick
+        num_intervals = self.__num_ticks - 1
+        jitter = (self.__sum_sqrd_diffs / num_intervals) ** 0.5 if num_intervals > 0 else 0.0
+        return TickStats(self.__num_ticks, elapsed, self.__mean_interval, jitter, self.__overruns,
+                self.__skipped_ticks, self.__tick_rate)
+
+
+
+class Histogram:
+    '''A Histogram counts samples in logarithmically sized buckets, so that recording a sample is cheap and takes
+    constant memory, while percentiles can still be estimated to within a few percent of their true value. Each
+    power of two is split into SUB_BUCKETS equally sized buckets.'''
+
+    SUB_BUCKETS = 16
+    '''Number of buckets each power of two is split into. Percentiles are accurate to within 1/SUB_BUCKETS.'''
+
+    def __init__(self):
+        self.__buckets = {}     # type: dict[int, int]
+        self.__zeros = 0
+        self.__count = 0
+        self.__total = 0.0
+        self.__max = 0.0
+
+
+    def add(self, value: float):
+        '''Records a sample'''
+
+        self.__count += 1
+        self.__total += value
+        if value > self.__max:
+            self.__max = value
+        if value <= 0:
+            self.__zeros += 1
+            return
+
+        mantissa, exponent = math.frexp(value)
+        index = exponent * Histogram.SUB_BUCKETS + int((mantissa - 0.5) * 2 * Histogram.SUB_BUCKETS)
+        buckets = self.__buckets
+        buckets[index] = buckets.get(index, 0) + 1
+
+
+    def get_count(self):
+        '''Returns the number of samples recorded'''
+        return self.__count
+
+
+    def get_mean(self):
+        '''Returns the mean of all samples recorded, or 0 if there are none'''
+        return self.__total / self.__count if self.__count > 0 else 0.0
+
+
+    def get_max(self):
+        '''Returns the largest sample recorded, or 0 if there are none'''
+        return self.__max
+
+
+    def get_total(self):
+        '''Returns the sum of all samples recorded'''
+        return self.__total
+
+
+    def percentile(self, q: float):
+        '''Returns an estimate of the given percentile (between 0 and 100) of the samples recorded, or 0 if there
+        are none. The estimate is the upper bound of the bucket containing the percentile, and never exceeds the
+        largest sample.'''
+
+        rank = q / 100.0 * self.__count
+        seen = self.__zeros
+        if seen >= rank:
+            return 0.0
+
+        for index in sorted(self.__buckets):
+            seen += self.__buckets[index]
+            if seen >= rank:
+                exponent, sub_bucket = divmod(index, Histogram.SUB_BUCKETS)
+                upper = math.ldexp(0.5 + (sub_bucket + 1) / (2.0 * Histogram.SUB_BUCKETS), exponent)
+                return min(upper, self.__max)
+        return self.__max
+
+
+    def __str__(self):
+        return 'p50 {:.3f} ms, p95 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'.format(self.percentile(50) * 1000,
+                self.percentile(95) * 1000, self.percentile(99) * 1000, self.__max * 1000)
+
+
+
+class TickPhase(ReflectiveEnum):
+    '''Enum type describing the phases of a tick timed by a TickProfiler'''
+
+    wait = 'wait'
+    '''Waiting for agents to receive new observations'''
+
+    sync = 'sync'
+    '''Loading the new observation of an agent into its state. Since the sections of an observation are parsed
+    when first accessed, parsing done by on_tick is timed as part of on_tick.'''
+
+    on_tick = 'on_tick'
+    '''Executing Scenario.on_tick'''
+
+    send = 'send'
+    '''Sending the commands issued by an agent during the tick'''
+
+
+
+class TickProfiler:
+    '''A TickProfiler collects the time spent in each phase of each tick of a running scenario (see TickPhase)
+    into histograms. The sync and send phases are timed separately for each agent.
+
+    An optional callback is called with the profiler every given number of ticks, and once more when the mission
+    ends, so that summaries can be inspected while the scenario is running.'''
+
+    def __init__(self, callback: 'Callable[[TickProfiler], None]' = None, interval: int = 100):
+        '''Constructor. Accepts an optional callback, and the number of ticks between calls to it.'''
+
+        self.__callback = callback
+        self.__interval = interval
+        self.__histograms = {}  # type: dict[tuple[TickPhase, str], Histogram]
+        self.__num_ticks = 0
+        self.__last_callback = 0
+
+
+    def record(self, phase: TickPhase, elapsed: float, agent_name: str = None):
+        '''Records the time (in seconds) spent in a phase of the current tick, optionally for a single agent'''
+
+        key = (phase, agent_name)
+        histogram = self.__histograms.get(key)
+        if histogram is None:
+            histogram = self.__histograms[key] = Histogram()
+        histogram.add(elapsed)
+
+
+    def end_tick(self):
+        '''Marks the end of a tick, calling the callback if it is due'''
+
+        self.__num_ticks += 1
+        if self.__callback is not None and self.__num_ticks - self.__last_callback >= self.__interval:
+            self.__last_callback = self.__num_ticks
+            self.__callback(self)
+
+
+    def finish(self):
+        '''Marks the end of the mission, calling the callback if any ticks have ended since it was last called'''
+
+        if self.__callback is not None and self.__num_ticks > self.__last_callback:
+            self.__last_callback = self.__num_ticks
+            self.__callback(self)
+
+
+    def get_num_ticks(self):
+        '''Returns the number of ticks profiled so far'''
+        return self.__num_ticks
+
+
+    def get_histogram(self, phase: TickPhase, agent_name: str = None):
+        '''Returns the histogram of the time spent in the given phase, for the given agent if the phase is timed
+        per agent. Returns None if the phase has not been recorded.'''
+        return self.__histograms.get((phase, agent_name))
+
+
+    def get_summary(self):
+        '''Returns the percentiles of each recorded phase, as a dictionary mapping a phase name (followed by the
+        agent name in brackets, for per-agent phases) to a dictionary of p50, p95, p99, max, and mean times in
+        seconds'''
+
+        phases = list(TickPhase)
+        summary = OrderedDict()
+        for (phase, agent_name), histogram in sorted(self.__histograms.items(),
+                key=lambda item: (phases.index(item[0][0]), item[0][1] or '')):
+            name = phase.value if agent_name is None else '{}[{}]'.format(phase.value, agent_name)
+            summary[name] = {
+                'p50': histogram.percentile(50),
+                'p95': histogram.percentile(95),
+                'p99': histogram.percentile(99),
+                'max': histogram.get_max(),
+                'mean': histogram.get_mean()
+            }
+        return summary
+
+
+    def __str__(self):
+        lines = ['{} ticks profiled'.format(self.__num_ticks)]
+        for name, values in self.get_summary().items():
+            lines.append('  {:<24} p50 {:8.3f} ms   p95 {:8.3f} ms   p99 {:8.3f} ms   max {:8.3f} ms'.format(name,
+                    values['p50'] * 1000, values['p95'] * 1000, values['p99'] * 1000, values['max'] * 1000))
+        return '\n'.join(lines)
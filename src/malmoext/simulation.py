@@ -0,0 +1,555 @@
+from malmoext.backend import Backend
+from malmoext.types import Inventory
+import json
+import math
+import xml.etree.ElementTree as ElementTree
+
+class SimulatedBackend(Backend):
+    '''A Backend that runs missions inside a pure-Python SimulatedWorld, rather than inside Malmo Minecraft. No
+    Minecraft instance needs to be running, and the ports passed to Scenario.run are ignored.
+
+    The simulated world advances one game tick each time an agent asks for new observations after having
+    received the latest one, so that it runs in lockstep with the scenario. Scenarios can therefore run as fast
+    as the simulation allows by passing tick_rate=None to Scenario.run.'''
+
+    def __init__(self):
+        self.__world = None    # type: SimulatedWorld
+
+
+    def get_world(self):
+        '''Returns the world of the most recently started mission, or None if no mission has been started'''
+        return self.__world
+
+
+    def create_host(self):
+        return SimulatedAgentHost()
+
+
+    def start_mission(self, agents: 'list[Agent]', mission_xml: str, ports: 'list[int]') -> None:
+        self.__world = SimulatedWorld(mission_xml)
+        names = self.__world.get_agent_names()
+        if len(names) != len(agents):
+            raise Exception('Mission describes {} agents, but {} were given'.format(len(names), len(agents)))
+        for name, agent in zip(names, agents):
+            agent.get_host()._attach(self.__world, name)
+
+
+
+class SimulatedAgentHost:
+    '''A connection to a single agent inside a SimulatedWorld, providing the same methods as a Malmo AgentHost
+    that agents rely on.'''
+
+    def __init__(self):
+        self.__world = None    # type: SimulatedWorld
+        self.__name = None
+        self.__last_tick = -1
+
+
+    def _attach(self, world: 'SimulatedWorld', name: str):
+        '''Connects this host to the agent with the given name inside a world'''
+        self.__world = world
+        self.__name = name
+
+
+    def peekWorldState(self):
+        '''Returns the current state of the world without consuming any observation'''
+
+        world = self.__world
+        if world is None:
+            return SimulatedWorldState(False, False, [])
+        observations = []
+        if world.is_running() and world.get_tick() > self.__last_tick:
+            observations.append(SimulatedObservation(world.get_observation(self.__name)))
+        return SimulatedWorldState(True, world.is_running(), observations)
+
+
+    def getWorldState(self):
+        '''Returns the current state of the world, consuming any new observation. If the latest observation has
+        already been consumed, the world first advances by one tick.'''
+
+        world = self.__world
+        if world is None:
+            return SimulatedWorldState(False, False, [])
+        if world.is_running() and world.get_tick() <= self.__last_tick:
+            world.step()
+        if not world.is_running():
+            return SimulatedWorldState(True, False, [])
+
+        self.__last_tick = world.get_tick()
+        return SimulatedWorldState(True, True, [SimulatedObservation(world.get_observation(self.__name))])
+
+
+    def sendCommand(self, command: str):
+        '''Sends a command to be carried out by this agent on the next tick'''
+
+        if self.__world is not None:
+            self.__world.send_command(self.__name, command)
+
+
+
+class SimulatedWorldState:
+    '''The state of a SimulatedWorld, in the same shape as a Malmo WorldState'''
+
+    def __init__(self, has_mission_begun: bool, is_mission_running: bool, observations: 'list[SimulatedObservation]'):
+        self.has_mission_begun = has_mission_begun
+        self.is_mission_running = is_mission_running
+        self.number_of_observations_since_last_state = len(observations)
+        self.observations = observations
+        self.errors = []
+
+
+
+class SimulatedObservation:
+    '''A single observation of a SimulatedWorld, in the same shape as a Malmo TimestampedString'''
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+
+class SimulatedWorld:
+    '''A pure-Python approximation of a Malmo Minecraft world, built from the mission XML produced by
+    ScenarioBuilder.build. Observations are produced in the same JSON shape as those sent by Malmo.
+
+    Only a small part of Minecraft is modelled: flat terrain and drawn blocks, agent movement and turning (blocked
+    by solid blocks, but without gravity or jumping), stationary mobs, items that fall to the ground when placed
+    or discarded, item pickup, and the hotbar,
+    swapInventoryItems, and discardCurrentItem inventory commands. Any other command is ignored.'''
+
+    MS_PER_TICK = 50
+    '''Length of a game tick (in milliseconds)'''
+
+    WALK_SPEED = 4.317 / 20
+    '''Distance (in number of blocks) moved per tick at full speed'''
+
+    TURN_SPEED = 180.0 / 20
+    '''Angle (in degrees) turned per tick at full speed'''
+
+    PICKUP_DISTANCE = 1.0
+    '''Horizontal and vertical distance (in number of blocks) within which agents pick up items'''
+
+    PICKUP_DELAY = 40
+    '''Number of ticks before a discarded item can be picked up'''
+
+    DISCARD_DISTANCE = 1.5
+    '''Distance (in number of blocks) in front of an agent at which discarded items land'''
+
+    MAX_STACK_SIZE = 64
+    '''Maximum quantity of items held in a single inventory slot'''
+
+    GRID_CACHE_SIZE = 256
+    '''Maximum number of observable block grids cached, per block position an agent has stood in'''
+
+    BLOCK_IDS = {0: 'air', 1: 'stone', 2: 'grass', 3: 'dirt', 4: 'cobblestone', 7: 'bedrock', 8: 'flowing_water',
+            9: 'water', 10: 'flowing_lava', 11: 'lava', 12: 'sand', 13: 'gravel', 24: 'sandstone', 80: 'snow'}
+    '''Names of blocks that may appear in the layers of a flat world generator string'''
+
+    PASSABLE_BLOCKS = frozenset(['air', 'water', 'flowing_water', 'lava', 'flowing_lava', 'tallgrass', 'double_plant',
+            'red_flower', 'yellow_flower', 'deadbush', 'torch', 'snow_layer', 'carpet', 'rail', 'web', 'vine'])
+    '''Blocks that agents can move through'''
+
+    __NAMESPACE = '{http://ProjectMalmo.microsoft.com}'
+
+    # Continuous movement commands, mapped to the agent attribute holding their current value
+    __RATE_COMMANDS = {'move': 'move', 'strafe': 'strafe', 'turn': 'turn', 'pitch': 'pitch_rate'}
+
+    def __init__(self, mission_xml: str):
+        '''Constructor. Accepts the XML describing the mission to simulate.'''
+
+        self.__tick = 0
+        self.__running = True
+        self.__time_limit = None
+        self.__world_time = 6000
+        self.__layers = []          # type: list[str]
+        self.__blocks = {}          # type: dict[tuple[int, int, int], str]
+        self.__agents = {}          # type: dict[str, _SimulatedAgent]
+        self.__entities = []        # type: list[_SimulatedEntity]
+        self.__num_entities = 0
+        self.__grid_cache = {}      # type: dict[tuple[str, int, int, int], str]
+        self.__load(mission_xml)
+
+
+    def get_agent_names(self):
+        '''Returns the names of all agents in this world, in the order they are described in the mission'''
+        return list(self.__agents.keys())
+
+
+    def get_tick(self):
+        '''Returns the number of ticks that have elapsed'''
+        return self.__tick
+
+
+    def is_running(self):
+        '''Returns true if the mission is still running. Returns false otherwise.'''
+        return self.__running
+
+
+    def get_block(self, x: int, y: int, z: int):
+        '''Returns the name of the block at the given location'''
+
+        block = self.__blocks.get((x, y, z))
+        if block is not None:
+            return block
+        if 0 <= y < len(self.__layers):
+            return self.__layers[y]
+        return 'air'
+
+
+    def get_entities(self):
+        '''Returns all mobs and items in this world (excluding agents)'''
+        return list(self.__entities)
+
+
+    def send_command(self, name: str, command: str):
+        '''Carries out a command for the agent with the given name. Continuous movement commands take effect on
+        the next tick.'''
+
+        agent = self.__agents[name]
+        verb, _, value = command.partition(' ')
+        if verb in SimulatedWorld.__RATE_COMMANDS:
+            setattr(agent, SimulatedWorld.__RATE_COMMANDS[verb], max(-1.0, min(1.0, float(value))))
+        elif verb.startswith('hotbar.'):
+            if value == '1':
+                agent.current_slot = int(verb[len('hotbar.'):]) - 1
+        elif verb == 'swapInventoryItems':
+            a, b = (int(arg.split(':')[-1]) for arg in value.split())
+            agent.inventory[a], agent.inventory[b] = agent.inventory.get(b), agent.inventory.get(a)
+            for slot in (a, b):
+                if agent.inventory[slot] is None:
+                    del agent.inventory[slot]
+        elif verb == 'discardCurrentItem':
+            self.__discard(agent)
+        elif verb == 'quit':
+            self.__running = False
+
+
+    def step(self):
+        '''Advances this world by one tick'''
+
+        if not self.__running:
+            return
+
+        self.__tick += 1
+        for agent in self.__agents.values():
+            self.__move(agent)
+        for entity in self.__entities:
+            if entity.pickup_delay > 0:
+                entity.pickup_delay -= 1
+        for agent in self.__agents.values():
+            self.__pick_up_items(agent)
+
+        if self.__time_limit is not None and self.__tick * SimulatedWorld.MS_PER_TICK >= self.__time_limit:
+            self.__running = False
+
+
+    def get_observation(self, name: str):
+        '''Returns the JSON text of the current observation of the agent with the given name'''
+
+        agent = self.__agents[name]
+        entities = []
+        for other in self.__agents.values():
+            if agent.in_range(other.x, other.y, other.z):
+                entities.append({'yaw': other.yaw, 'x': other.x, 'y': other.y, 'z': other.z, 'pitch': other.pitch,
+                        'id': other.id, 'motionX': 0.0, 'motionY': 0.0, 'motionZ': 0.0, 'life': 20.0,
+                        'name': other.name})
+        for entity in self.__entities:
+            if agent.in_range(entity.x, entity.y, entity.z):
+                obj = {'yaw': 0.0, 'x': entity.x, 'y': entity.y, 'z': entity.z, 'pitch': 0.0, 'id': entity.id,
+                        'motionX': 0.0, 'motionY': 0.0, 'motionZ': 0.0, 'life': 20.0, 'name': entity.name}
+                if entity.is_item:
+                    obj['quantity'] = entity.quantity
+                entities.append(obj)
+
+        inventory = [{'type': item_type, 'index': slot, 'quantity': quantity, 'inventory': 'inventory'}
+                for slot, (item_type, quantity) in sorted(agent.inventory.items())]
+
+        observation = {
+            'DistanceTravelled': int(agent.distance_travelled * 100),
+            'TimeAlive': self.__tick,
+            'MobsKilled': 0,
+            'PlayersKilled': 0,
+            'DamageTaken': 0,
+            'DamageDealt': 0,
+            'Life': 20.0,
+            'Score': 0,
+            'Food': 20,
+            'XP': 0,
+            'IsAlive': True,
+            'Air': 300,
+            'Name': agent.name,
+            'XPos': agent.x,
+            'YPos': agent.y,
+            'ZPos': agent.z,
+            'Pitch': agent.pitch,
+            'Yaw': agent.yaw,
+            'WorldTime': self.__world_time,
+            'TotalTime': self.__tick,
+            'inventory': inventory,
+            'currentItemIndex': agent.current_slot,
+            'nearby_entities': entities
+        }
+
+        # The grid is the largest part of the observation, and only depends on the block the agent is standing in
+        text = json.dumps(observation, separators=(',', ':'))
+        if agent.grid_name is None:
+            return text
+        return text[:-1] + ',"{}":[{}]}}'.format(agent.grid_name, self.__get_grid_text(agent))
+
+
+    def __get_grid_text(self, agent: '_SimulatedAgent'):
+        '''Returns the comma-separated, quoted block names observable by an agent'''
+
+        bx, by, bz = int(math.floor(agent.x)), int(math.floor(agent.y)), int(math.floor(agent.z))
+        key = (agent.name, bx, by, bz)
+        text = self.__grid_cache.get(key)
+        if text is None:
+            (x1, y1, z1), (x2, y2, z2) = agent.grid_min, agent.grid_max
+            text = ','.join('"' + self.get_block(bx + x, by + y, bz + z) + '"'
+                    for y in range(y1, y2 + 1) for z in range(z1, z2 + 1) for x in range(x1, x2 + 1))
+            if len(self.__grid_cache) >= SimulatedWorld.GRID_CACHE_SIZE:
+                self.__grid_cache.clear()
+            self.__grid_cache[key] = text
+        return text
+
+
+    def __move(self, agent: '_SimulatedAgent'):
+        '''Applies the continuous movement commands of an agent for one tick'''
+
+        agent.yaw += agent.turn * SimulatedWorld.TURN_SPEED
+        agent.yaw = (agent.yaw + 180) % 360 - 180
+        agent.pitch = max(-90.0, min(90.0, agent.pitch + agent.pitch_rate * SimulatedWorld.TURN_SPEED))
+        if agent.move == 0 and agent.strafe == 0:
+            return
+
+        yaw = math.radians(agent.yaw)
+        speed = SimulatedWorld.WALK_SPEED
+        dx = (-math.sin(yaw) * agent.move - math.cos(yaw) * agent.strafe) * speed
+        dz = (math.cos(yaw) * agent.move - math.sin(yaw) * agent.strafe) * speed
+
+        # Move along each axis separately, so that agents slide along walls
+        x, z = agent.x, agent.z
+        if self.__is_passable(x + dx, agent.y, z):
+            x += dx
+        if self.__is_passable(x, agent.y, z + dz):
+            z += dz
+        agent.distance_travelled += math.sqrt((x - agent.x) ** 2 + (z - agent.z) ** 2)
+        agent.x, agent.z = x, z
+
+
+    def __is_passable(self, x: float, y: float, z: float):
+        '''Returns true if an agent can stand at the given position. Returns false otherwise.'''
+
+        bx, by, bz = int(math.floor(x)), int(math.floor(y)), int(math.floor(z))
+        return (self.get_block(bx, by, bz) in SimulatedWorld.PASSABLE_BLOCKS
+                and self.get_block(bx, by + 1, bz) in SimulatedWorld.PASSABLE_BLOCKS)
+
+
+    def __pick_up_items(self, agent: '_SimulatedAgent'):
+        '''Moves any items close enough to an agent into its inventory'''
+
+        remaining = []
+        for entity in self.__entities:
+            if (entity.is_item and entity.pickup_delay == 0
+                    and abs(entity.x - agent.x) <= SimulatedWorld.PICKUP_DISTANCE
+                    and abs(entity.z - agent.z) <= SimulatedWorld.PICKUP_DISTANCE
+                    and abs(entity.y - agent.y) <= SimulatedWorld.PICKUP_DISTANCE):
+                entity.quantity = agent.add_item(entity.name, entity.quantity)
+                if entity.quantity == 0:
+                    continue
+            remaining.append(entity)
+        self.__entities = remaining
+
+
+    def __discard(self, agent: '_SimulatedAgent'):
+        '''Drops the stack of items in an agent's currently equipped slot in front of the agent'''
+
+        held = agent.inventory.pop(agent.current_slot, None)
+        if held is None:
+            return
+        yaw = math.radians(agent.yaw)
+        distance = SimulatedWorld.DISCARD_DISTANCE
+        entity = self.__add_entity(held[0], agent.x - math.sin(yaw) * distance, agent.y,
+                agent.z + math.cos(yaw) * distance, True, held[1])
+        entity.pickup_delay = SimulatedWorld.PICKUP_DELAY
+
+
+    def __add_entity(self, name: str, x: float, y: float, z: float, is_item: bool, quantity: int = 1):
+        '''Adds a mob or item to this world. Items fall until they land on a solid block.'''
+
+        if is_item:
+            bx, by, bz = int(math.floor(x)), int(math.floor(y)), int(math.floor(z))
+            while by > 0 and self.get_block(bx, by - 1, bz) in SimulatedWorld.PASSABLE_BLOCKS:
+                by -= 1
+            y = min(y, float(by))
+
+        entity = _SimulatedEntity(self.__next_id(), name, x, y, z, is_item, quantity)
+        self.__entities.append(entity)
+        return entity
+
+
+    def __next_id(self):
+        '''Returns a new unique id for an entity'''
+
+        self.__num_entities += 1
+        return '00000000-0000-0000-0000-{:012x}'.format(self.__num_entities)
+
+
+    def __load(self, mission_xml: str):
+        '''Builds the contents of this world from mission XML'''
+
+        ns = SimulatedWorld.__NAMESPACE
+        root = ElementTree.fromstring(mission_xml.strip())
+
+        for element in root.iter(ns + 'ServerQuitFromTimeUp'):
+            self.__time_limit = float(element.get('timeLimitMs'))
+        for element in root.iter(ns + 'StartTime'):
+            self.__world_time = int(element.text)
+        for element in root.iter(ns + 'FlatWorldGenerator'):
+            self.__layers = SimulatedWorld.__parse_layers(element.get('generatorString', ''))
+
+        for decorator in root.iter(ns + 'DrawingDecorator'):
+            for element in decorator:
+                self.__draw(element.tag[len(ns):], element)
+
+        for section in root.iter(ns + 'AgentSection'):
+            agent = _SimulatedAgent(self.__next_id(), section.find(ns + 'Name').text.strip())
+            placement = section.find(ns + 'AgentStart/' + ns + 'Placement')
+            if placement is not None:
+                agent.x = float(placement.get('x', 0))
+                agent.y = float(placement.get('y', 0))
+                agent.z = float(placement.get('z', 0))
+                agent.yaw = float(placement.get('yaw', 0))
+                agent.pitch = float(placement.get('pitch', 0))
+            for item in section.iter(ns + 'InventoryItem'):
+                agent.inventory[int(item.get('slot'))] = (item.get('type'), int(item.get('quantity', 1)))
+            grid = section.find('.//' + ns + 'Grid')
+            if grid is not None:
+                agent.grid_name = grid.get('name')
+                agent.grid_min = SimulatedWorld.__parse_point(grid.find(ns + 'min'))
+                agent.grid_max = SimulatedWorld.__parse_point(grid.find(ns + 'max'))
+            entity_range = section.find('.//' + ns + 'Range')
+            if entity_range is not None:
+                agent.range = (float(entity_range.get('xrange')), float(entity_range.get('yrange')),
+                        float(entity_range.get('zrange')))
+            self.__agents[agent.name] = agent
+
+
+    def __draw(self, tag: str, element: ElementTree.Element):
+        '''Applies a single drawing decorator to this world'''
+
+        def attr(name):
+            return float(element.get(name))
+
+        block = element.get('type')
+        if tag == 'DrawBlock':
+            self.__blocks[(int(attr('x')), int(attr('y')), int(attr('z')))] = block
+        elif tag in ('DrawCuboid', 'DrawLine'):
+            x1, x2 = sorted((int(attr('x1')), int(attr('x2'))))
+            y1, y2 = sorted((int(attr('y1')), int(attr('y2'))))
+            z1, z2 = sorted((int(attr('z1')), int(attr('z2'))))
+            for x in range(x1, x2 + 1):
+                for y in range(y1, y2 + 1):
+                    for z in range(z1, z2 + 1):
+                        self.__blocks[(x, y, z)] = block
+        elif tag == 'DrawSphere':
+            cx, cy, cz, radius = int(attr('x')), int(attr('y')), int(attr('z')), int(attr('radius'))
+            for x in range(-radius, radius + 1):
+                for y in range(-radius, radius + 1):
+                    for z in range(-radius, radius + 1):
+                        if x * x + y * y + z * z <= radius * radius:
+                            self.__blocks[(cx + x, cy + y, cz + z)] = block
+        elif tag == 'DrawItem':
+            self.__add_entity(block, math.floor(attr('x')) + 0.5, attr('y'), math.floor(attr('z')) + 0.5, True)
+        elif tag == 'DrawEntity':
+            self.__add_entity(block, attr('x'), attr('y'), attr('z'), False)
+
+
+    @staticmethod
+    def __parse_layers(generator_string: str):
+        '''Returns the block name of each layer described by a flat world generator string, from the bottom up'''
+
+        parts = generator_string.split(';')
+        if len(parts) < 2 or parts[1] == '':
+            return []
+        layers = []
+        for layer in parts[1].split(','):
+            count, _, block_id = layer.rpartition('*')
+            block = SimulatedWorld.BLOCK_IDS.get(int(block_id.split(':')[0]), 'stone')
+            layers.extend([block] * (int(count) if count else 1))
+        return layers
+
+
+    @staticmethod
+    def __parse_point(element: ElementTree.Element):
+        return (int(element.get('x')), int(element.get('y')), int(element.get('z')))
+
+
+
+class _SimulatedAgent:
+    '''The state of an agent inside a SimulatedWorld'''
+
+    def __init__(self, id: str, name: str):
+        self.id = id
+        self.name = name
+        self.x = 0.0
+        self.y = 0.0
+        self.z = 0.0
+        self.yaw = 0.0
+        self.pitch = 0.0
+        self.move = 0.0
+        self.strafe = 0.0
+        self.turn = 0.0
+        self.pitch_rate = 0.0
+        self.distance_travelled = 0.0
+        self.current_slot = 0
+        self.inventory = {}          # type: dict[int, tuple[str, int]]
+        self.grid_name = None
+        self.grid_min = (0, 0, 0)
+        self.grid_max = (0, 0, 0)
+        self.range = (0.0, 0.0, 0.0)
+
+
+    def in_range(self, x: float, y: float, z: float):
+        '''Returns true if the given position is within the range of entities this agent can observe'''
+
+        xrange, yrange, zrange = self.range
+        return abs(x - self.x) <= xrange and abs(y - self.y) <= yrange and abs(z - self.z) <= zrange
+
+
+    def add_item(self, item_type: str, quantity: int):
+        '''Adds items to this agent's inventory, filling existing stacks of the same type first, and then empty
+        slots (hotbar first). Returns the quantity that did not fit.'''
+
+        max_stack = SimulatedWorld.MAX_STACK_SIZE
+        slots = [slot.value for slot in Inventory.HotBar] + [slot.value for slot in Inventory.Main]
+        for slot in slots:
+            held = self.inventory.get(slot)
+            if held is not None and held[0] == item_type and held[1] < max_stack:
+                added = min(quantity, max_stack - held[1])
+                self.inventory[slot] = (item_type, held[1] + added)
+                quantity -= added
+                if quantity == 0:
+                    return 0
+        for slot in slots:
+            if slot not in self.inventory:
+                added = min(quantity, max_stack)
+                self.inventory[slot] = (item_type, added)
+                quantity -= added
+                if quantity == 0:
+                    return 0
+        return quantity
+
+
+
+class _SimulatedEntity:
+    '''A mob or item inside a SimulatedWorld'''
+
+    def __init__(self, id: str, name: str, x: float, y: float, z: float, is_item: bool, quantity: int):
+        self.id = id
+        self.name = name
+        self.x = x
+        self.y = y
+        self.z = z
+        self.is_item = is_item
+        self.quantity = quantity
+        self.pickup_delay = 0
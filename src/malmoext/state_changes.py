@@ -0,0 +1,87 @@
+from typing import Any, Callable
+from malmoext.block_grid import BlockGrid
+from malmoext.types import Vector
+import numpy
+
+class StateChanges:
+    '''A StateChanges object describes what has changed between two consecutive observations received by
+    an agent. Entities are identified by their unique ids.'''
+
+    def __init__(self, previous_data: Any, current_data: Any, previous_grid: BlockGrid,
+            get_current_grid: 'Callable[[], BlockGrid]', observable_distances: Vector):
+        '''Constructor. Accepts the previous and current raw observation objects, the previous grid of blocks (or
+        None if it was never parsed), a function returning the current grid of blocks, and the observable
+        distances of the agent.'''
+
+        self.position_changed = StateChanges.__differs(previous_data, current_data, 'XPos', 'YPos', 'ZPos')
+        '''True if the position of the agent has changed'''
+
+        self.pov_changed = StateChanges.__differs(previous_data, current_data, 'Yaw', 'Pitch')
+        '''True if the camera angles of the agent have changed'''
+
+        self.grid_changed = StateChanges.__differs(previous_data, current_data, 'blockgrid')
+        '''True if any block within the observable range of the agent has changed'''
+
+        self.inventory_changed = StateChanges.__differs(previous_data, current_data, 'inventory')
+        '''True if the inventory of the agent has changed'''
+
+        self.equipped_slot_changed = StateChanges.__differs(previous_data, current_data, 'currentItemIndex')
+        '''True if the inventory slot equipped by the agent has changed'''
+
+        previous_entities = {obj['id']: obj for obj in previous_data.get('nearby_entities', [])}
+        current_entities = {obj['id']: obj for obj in current_data.get('nearby_entities', [])}
+
+        self.added_entity_ids = current_entities.keys() - previous_entities.keys()
+        '''Ids of entities that have come into the observable range of the agent'''
+
+        self.removed_entity_ids = previous_entities.keys() - current_entities.keys()
+        '''Ids of entities that are no longer within the observable range of the agent'''
+
+        self.changed_entity_ids = set(eId for eId, obj in current_entities.items()
+                if eId in previous_entities and previous_entities[eId] != obj)
+        '''Ids of entities that have moved or otherwise changed'''
+
+        self.__previous_grid = previous_grid
+        self.__previous_raw_grid = previous_data.get('blockgrid')
+        self.__get_current_grid = get_current_grid
+        self.__distances = observable_distances
+        self.__changed_blocks = None
+
+
+    def has_changes(self):
+        '''Returns true if anything has changed between the two observations. Returns false otherwise.'''
+
+        return (self.position_changed or self.pov_changed or self.grid_changed or self.inventory_changed
+                or self.equipped_slot_changed or len(self.added_entity_ids) > 0 or len(self.removed_entity_ids) > 0
+                or len(self.changed_entity_ids) > 0)
+
+
+    def get_changed_blocks(self):
+        '''Returns a list of all locations (relative to the agent) whose block type has changed. Note that, since
+        locations are relative, any movement of the agent may cause many blocks to change.'''
+
+        if self.__changed_blocks is not None:
+            return self.__changed_blocks
+
+        if not self.grid_changed:
+            self.__changed_blocks = []
+            return self.__changed_blocks
+
+        previous_grid = self.__previous_grid
+        if previous_grid is None:
+            previous_grid = BlockGrid.parse(self.__previous_raw_grid, self.__distances)
+
+        d = self.__distances
+        diff = numpy.argwhere(previous_grid.get_codes() != self.__get_current_grid().get_codes())
+        self.__changed_blocks = [Vector(int(i[0]) - d.x, int(i[1]) - d.y, int(i[2]) - d.z) for i in diff]
+        return self.__changed_blocks
+
+
+    @staticmethod
+    def __differs(previous_data: Any, current_data: Any, *keys: str):
+        '''Returns true if the value of any of the given keys differs between two raw observation objects'''
+
+        for key in keys:
+            if previous_data.get(key) != current_data.get(key):
+                return True
+        return False
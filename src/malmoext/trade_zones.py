@@ -0,0 +1,104 @@
+from collections import deque
+from malmoext.types import Vector
+import math
+
+class TradeZones:
+    '''TradeZones tracks the spherical zones around positions where an agent has recently traded items, so that
+    the traded items can be ignored by the agent for a while.
+
+    Zones are bucketed into cubic cells as wide as the zone radius, so checking whether a position lies inside
+    any zone only visits the 27 cells around that position. Rather than counting down a timer on each zone every
+    tick, each zone records the tick at which it expires, and expired zones are discarded in the order they were
+    added.'''
+
+    def __init__(self, radius: float, lifetime: int):
+        '''Constructor. Accepts the radius of each zone (in number of blocks), and the number of ticks each zone
+        lasts for.'''
+
+        self.__radius = radius
+        self.__sqrd_radius = radius * radius
+        self.__lifetime = lifetime
+        self.__tick = 0
+        self.__version = 0
+        self.__cells = {}          # type: dict[tuple[int, int, int], dict[Vector, int]]
+        self.__expiries = deque()  # type: deque[tuple[int, tuple[int, int, int], Vector]]
+
+
+    def get_tick(self):
+        '''Returns the current tick number'''
+        return self.__tick
+
+
+    def get_version(self):
+        '''Returns a number that changes whenever a zone is added or discarded, so that results depending on the
+        zones can be cached until they change'''
+        return self.__version
+
+
+    def advance(self):
+        '''Advances to the next tick, discarding any zones that have expired'''
+        self.advance_to(self.__tick + 1)
+
+
+    def advance_to(self, tick: int):
+        '''Advances to the given tick, discarding any zones that have expired. Does nothing if the given tick is not
+        after the current tick.'''
+
+        if tick <= self.__tick:
+            return
+        self.__tick = tick
+        expiries = self.__expiries
+        while len(expiries) > 0 and expiries[0][0] <= self.__tick:
+            expiry, cell, position = expiries.popleft()
+
+            # The zone may have been renewed since this entry was added
+            zones = self.__cells[cell]
+            if zones.get(position) == expiry:
+                del zones[position]
+                self.__version += 1
+                if len(zones) == 0:
+                    del self.__cells[cell]
+
+
+    def add(self, position: Vector):
+        '''Adds a zone centered at the given position, lasting from the current tick. Adding a zone at a position
+        that already has one renews it.'''
+
+        expiry = self.__tick + self.__lifetime
+        cell = self.__to_cell(position)
+        if cell in self.__cells:
+            self.__cells[cell][position] = expiry
+        else:
+            self.__cells[cell] = {position: expiry}
+        self.__expiries.append((expiry, cell, position))
+        self.__version += 1
+
+
+    def contains(self, position: Vector):
+        '''Returns true if the given position is strictly inside any zone. Returns false otherwise.'''
+
+        if len(self.__cells) == 0:
+            return False
+
+        cx, cy, cz = self.__to_cell(position)
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                for z in (cz - 1, cz, cz + 1):
+                    zones = self.__cells.get((x, y, z))
+                    if zones is None:
+                        continue
+                    for center in zones:
+                        dx = center.x - position.x
+                        dy = center.y - position.y
+                        dz = center.z - position.z
+                        if dx * dx + dy * dy + dz * dz < self.__sqrd_radius:
+                            return True
+        return False
+
+
+    def __to_cell(self, position: Vector):
+        '''Returns the cell containing the given position'''
+
+        size = self.__radius
+        return (int(math.floor(position.x / size)), int(math.floor(position.y / size)),
+                int(math.floor(position.z / size)))
@@ -1,5 +1,7 @@
 from typing import Union
 from enum import Enum
+from collections import namedtuple
+from functools import partial
 
 class ReflectiveEnum(Enum):
     '''An enumerated type that provides additional utility methods for checking
@@ -13,6 +15,82 @@ class ReflectiveEnum(Enum):
         else:
             return toCheck.value in cls._value2member_map_
 
+    @staticmethod
+    def resolver(*enum_types: 'type'):
+        '''Returns a dictionary mapping every raw value (string or int) of the given enum types to a tuple containing
+        the corresponding member and the enum type it belongs to. This allows a raw value to be resolved against
+        several enum types with a single lookup. If a value belongs to more than one of the types, the type given
+        first takes precedence.
+
+        Tables are built once for each combination of types, and cached. They should not be modified.'''
+
+        table = _RESOLVERS.get(enum_types)
+        if table is None:
+            table = {}
+            for enum_type in reversed(enum_types):
+                for value, member in enum_type._value2member_map_.items():
+                    table[value] = (member, enum_type)
+            _RESOLVERS[enum_types] = table
+        return table
+
+    @property
+    def category(self):
+        '''Returns the category bitmask of this member (see Category). Members of enum types that are not
+        categorized have a bitmask of Category.none.'''
+        return _CATEGORIES.get(self, Category.none)
+
+
+# Cache of tables built by ReflectiveEnum.resolver, mapped by the tuple of enum types they resolve
+_RESOLVERS = {}     # type: dict[tuple[type, ...], dict[Union[str, int], tuple[ReflectiveEnum, type]]]
+
+
+
+class Category:
+    '''Bit flags describing categories of mobs, items, and blocks. Flags can be combined using bitwise or, in which
+    case a value matches if it belongs to any of the combined categories. For example:
+
+        Category.hostile | Category.drops_food
+
+    describes all mobs that are either hostile or drop food.'''
+
+    none = 0
+    '''No category'''
+
+    mob = 1 << 0
+    '''Any mob, including agents'''
+
+    item = 1 << 1
+    '''Any item'''
+
+    block = 1 << 2
+    '''Any block'''
+
+    hostile = 1 << 3
+    '''Mobs that are hostile towards agents'''
+
+    peaceful = 1 << 4
+    '''Mobs that are peaceful towards agents'''
+
+    drops_food = 1 << 5
+    '''Mobs that drop food when killed'''
+
+    food = 1 << 6
+    '''Items that can be eaten'''
+
+    liquid = 1 << 7
+    '''Blocks that are liquid'''
+
+    @staticmethod
+    def of(value):
+        '''Returns the category bitmask of a Mob, Item, or Block. Returns Category.none for any other value.'''
+        return _CATEGORIES.get(value, Category.none)
+
+    @staticmethod
+    def matches(value, mask: int):
+        '''Returns true if a Mob, Item, or Block belongs to any of the categories in the given bitmask. Returns
+        false otherwise.'''
+        return _CATEGORIES.get(value, Category.none) & mask != 0
+
 
 
 class TimeOfDay(ReflectiveEnum):
@@ -145,15 +223,15 @@ class Mob(ReflectiveEnum):
 
     @classmethod
     def is_hostile(cls, to_check):
-        return to_check in HOSTILE_MOBS
+        return Category.matches(to_check, Category.hostile)
     
     @classmethod
     def is_peaceful(cls, to_check):
-        return to_check in PEACEFUL_MOBS
+        return Category.matches(to_check, Category.peaceful)
     
     @classmethod
     def drops_food(cls, to_check):
-        return to_check in FOOD_MOBS
+        return Category.matches(to_check, Category.drops_food)
 
 HOSTILE_MOBS = set([
     Mob.blaze,
@@ -432,7 +510,7 @@ class Item(ReflectiveEnum):
 
     @classmethod
     def is_food(cls, to_check):
-        return to_check in FOOD_ITEMS
+        return Category.matches(to_check, Category.food)
 
 FOOD_ITEMS = set([
     Item.apple,
@@ -706,45 +784,60 @@ class Block(ReflectiveEnum):
     yellow_flower = "yellow_flower"
     yellow_shulker_box = "yellow_shulker_box"
 
+LIQUID_BLOCKS = set([
+    Block.flowing_lava,
+    Block.flowing_water,
+    Block.lava,
+    Block.water
+])
 
-class Vector:
-    '''A 3-dimensional vector'''
 
-    def __init__(self, x: float, y: float, z: float):
-        self.x = x
-        self.y = y
-        self.z = z
 
-    def __hash__(self):
-        return hash((self.x, self.y, self.z))
-    
-    def __eq__(self, other):
-        return self.x == other.x and self.y == other.y and self.z == other.z
+def _build_categories():
+    '''Returns a dictionary mapping every Mob, Item, and Block to its category bitmask'''
+
+    categories = {}
+    for enum_type, mask in [(Mob, Category.mob), (Item, Category.item), (Block, Category.block)]:
+        for member in enum_type:
+            categories[member] = mask
+    for members, mask in [(HOSTILE_MOBS, Category.hostile), (PEACEFUL_MOBS, Category.peaceful),
+            (FOOD_MOBS, Category.drops_food), (FOOD_ITEMS, Category.food), (LIQUID_BLOCKS, Category.liquid)]:
+        for member in members:
+            categories[member] |= mask
+    return categories
+
+# Category bitmask of every Mob, Item, and Block
+_CATEGORIES = _build_categories()     # type: dict[ReflectiveEnum, int]
+
+
+class Vector(namedtuple('Vector', ('x', 'y', 'z'))):
+    '''A 3-dimensional vector. Vectors are immutable tuples, so hashing and equality run in C, and they are cheap to
+    use as dictionary keys.'''
+
+    __slots__ = ()
+
+
+class Rotation(namedtuple('Rotation', ('yaw', 'pitch'))):
+    '''A rotation in yaw and pitch directions. Rotations are immutable.'''
 
+    __slots__ = ()
 
-class Rotation:
-    '''A rotation in yaw and pitch directions.'''
 
-    def __init__(self, yaw: float, pitch: float):
-        self.yaw = yaw
-        self.pitch = pitch
+class Entity(namedtuple('Entity', ('id', 'type', 'name', 'position', 'quantity'))):
+    '''Metadata describing a mob, drop item, or an agent. Entities are immutable.'''
 
+    __slots__ = ()
 
-class Entity:
-    '''Metadata describing a mob, drop item, or an agent.'''
 
-    def __init__(self, id: str, eType: Union[Mob, Item], name: str, position: Vector, quantity: int):
-        self.id = id
-        self.type = eType
-        self.name = name
-        self.position = position
-        self.quantity = quantity
+class InventoryItem(namedtuple('InventoryItem', ('type', 'quantity', 'slot'))):
+    '''Representation of an item inside an agent's inventory. Inventory items are immutable.'''
 
+    __slots__ = ()
 
-class InventoryItem:
-    '''Representation of an item inside an agent's inventory'''
 
-    def __init__(self, iType: Item, quantity: int, slot: Union[Inventory.HotBar, Inventory.Main, Inventory.Armor]):
-        self.type = iType
-        self.quantity = quantity
-        self.slot = slot
+# Constructors of the types above that accept a tuple of all fields. They are implemented in C, and so are faster
+# than calling the types themselves, which matters when values are built by the thousand to parse observations.
+_new_vector = partial(tuple.__new__, Vector)
+_new_rotation = partial(tuple.__new__, Rotation)
+_new_entity = partial(tuple.__new__, Entity)
+_new_inventory_item = partial(tuple.__new__, InventoryItem)
@@ -0,0 +1,106 @@
+from typing import Any
+from malmoext.types import Block, Vector
+from malmoext.block_grid import BLOCK_PALETTE, BLOCK_CODES, BLOCK_CODE_DTYPE
+import numpy
+
+EMPTY_CODE = len(BLOCK_PALETTE)
+'''Block code marking a voxel that should be left as it is'''
+
+
+class VoxelMerger:
+    '''Class containing static methods for converting volumes of voxels into as few cuboids as practical.
+
+    Merging is greedy: voxels are visited layer by layer (y), row by row (z), then along each row (x). From each
+    voxel not yet covered, a run of identical blocks is grown along x, then extended along z while every voxel of
+    the next row matches, and then along y while every voxel of the next layer matches. This does not always find
+    the smallest possible set of cuboids, but it is fast, and reduces large uniform regions to a handful.'''
+
+    @staticmethod
+    def to_codes(voxels: Any):
+        '''Converts voxels to an array of block codes indexed in [x, y, z] order, along with the offset of index
+        [0, 0, 0]. Voxels may either be given as a 3-dimensional array (or nested lists) of blocks indexed in
+        [x, y, z] order, or as a dictionary mapping positions (vectors or (x, y, z) tuples) to blocks. Voxels that
+        are None are left as they are, and are given the code EMPTY_CODE.'''
+
+        if isinstance(voxels, dict):
+            if len(voxels) == 0:
+                return numpy.zeros((0, 0, 0), BLOCK_CODE_DTYPE), (0, 0, 0)
+            points = [VoxelMerger.__to_tuple(p) for p in voxels.keys()]
+            low = tuple(min(p[axis] for p in points) for axis in range(3))
+            high = tuple(max(p[axis] for p in points) for axis in range(3))
+            codes = numpy.full((high[0] - low[0] + 1, high[1] - low[1] + 1, high[2] - low[2] + 1), EMPTY_CODE,
+                    BLOCK_CODE_DTYPE)
+            for (x, y, z), block in zip(points, voxels.values()):
+                codes[x - low[0], y - low[1], z - low[2]] = VoxelMerger.__to_code(block)
+            return codes, low
+
+        array = numpy.asarray(voxels, dtype=object)
+        if array.ndim != 3:
+            raise Exception('Voxels must be given as a 3-dimensional array or a dictionary of positions')
+        to_code = numpy.frompyfunc(VoxelMerger.__to_code, 1, 1)
+        return to_code(array).astype(BLOCK_CODE_DTYPE), (0, 0, 0)
+
+
+    @staticmethod
+    def merge(codes: numpy.ndarray):
+        '''Merges an array of block codes indexed in [x, y, z] order into cuboids of identical blocks. Returns a
+        list of (block code, (x1, y1, z1), (x2, y2, z2)) tuples, where both corners are inclusive indices. Voxels
+        with the code EMPTY_CODE are not covered.'''
+
+        size_x, size_y, size_z = codes.shape
+        done = codes == EMPTY_CODE
+        cuboids = []
+        for y in range(size_y):
+            for z in range(size_z):
+
+                # Cuboids started earlier in this row only cover voxels already passed, so the row can be read once
+                row_codes = codes[:, y, z].tolist()
+                row_done = done[:, y, z].tolist()
+                x = 0
+                while x < size_x:
+                    if row_done[x]:
+                        x += 1
+                        continue
+                    code = row_codes[x]
+
+                    # Grow along x
+                    x2 = x + 1
+                    while x2 < size_x and not row_done[x2] and row_codes[x2] == code:
+                        x2 += 1
+
+                    # Extend along z, then y, while the next row or layer matches entirely
+                    z2 = z + 1
+                    while z2 < size_z and VoxelMerger.__matches(codes[x:x2, y, z2], done[x:x2, y, z2], code):
+                        z2 += 1
+                    y2 = y + 1
+                    while y2 < size_y and VoxelMerger.__matches(codes[x:x2, y2, z:z2], done[x:x2, y2, z:z2], code):
+                        y2 += 1
+
+                    done[x:x2, y:y2, z:z2] = True
+                    cuboids.append((code, (x, y, z), (x2 - 1, y2 - 1, z2 - 1)))
+                    x = x2
+        return cuboids
+
+
+    @staticmethod
+    def __matches(codes: numpy.ndarray, done: numpy.ndarray, code: int):
+        '''Returns true if every voxel in the given section has the given code and is not yet covered'''
+        return bool(numpy.all(codes == code)) and not done.any()
+
+
+    @staticmethod
+    def __to_code(block: Block):
+        '''Returns the code of a block, or EMPTY_CODE if the block is None'''
+
+        if block is None:
+            return EMPTY_CODE
+        return BLOCK_CODES[block.value]
+
+
+    @staticmethod
+    def __to_tuple(p: Any):
+        '''Returns the integer coordinates of a position given as a vector or tuple'''
+
+        if isinstance(p, Vector):
+            return (int(p.x), int(p.y), int(p.z))
+        return (int(p[0]), int(p[1]), int(p[2]))
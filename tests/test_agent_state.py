@@ -0,0 +1,50 @@
+from malmoext.agent import Agent
+from malmoext.agent_state import AgentState
+from malmoext.recording import ReplayHost
+from malmoext.scenario_builder import AgentBuilder
+from malmoext.types import Item, Vector
+import json
+import unittest
+
+
+def create_agent():
+    '''Returns an agent connected to a host that serves no observations'''
+
+    builder = AgentBuilder('agent')
+    builder.set_observable_distances(Vector(1, 1, 1))
+    return Agent(builder, False, ReplayHost())
+
+
+def create_observation(entities):
+    '''Returns the JSON text of an observation of an agent at the origin, with the given nearby entities'''
+
+    return json.dumps({
+        'XPos': 0.5, 'YPos': 4.0, 'ZPos': 0.5, 'Yaw': 0.0, 'Pitch': 0.0, 'TotalTime': 100,
+        'blockgrid': ['air'] * 27,
+        'nearby_entities': [{'name': 'agent', 'id': 'agent', 'x': 0.5, 'y': 4.0, 'z': 0.5}] + entities,
+        'inventory': [],
+        'currentItemIndex': 0
+    })
+
+
+class AgentStateTest(unittest.TestCase):
+    '''Tests for entity searches made through an AgentState'''
+
+    def test_nearby_entity_ignores_items_traded_during_tick(self):
+        agent = create_agent()
+        state = AgentState(agent, create_observation([
+            {'name': 'apple', 'id': 'near', 'x': 2.5, 'y': 4.0, 'z': 0.5, 'quantity': 1},
+            {'name': 'apple', 'id': 'far', 'x': 10.5, 'y': 4.0, 'z': 0.5, 'quantity': 1}]))
+
+        near = state.get_nearby_entity(Item.apple)
+        self.assertEqual(near.id, 'near')
+        self.assertIs(state.get_nearby_entity(Item.apple), near)
+
+        # Trading the closest apple away makes it ignored for the rest of the tick
+        agent._get_trade_zones().add(near.position)
+        self.assertEqual(state.get_nearby_entity(Item.apple).id, 'far')
+        self.assertEqual([entity.id for entity in state.get_closest_entities(2, Item.apple)], ['far'])
+
+
+if __name__ == '__main__':
+    unittest.main()
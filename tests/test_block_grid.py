@@ -0,0 +1,92 @@
+from malmoext.block_grid import BlockGrid, BLOCK_CODES, BLOCK_PALETTE
+from malmoext.types import Block, Vector
+import json
+import random
+import unittest
+
+
+def reference_codes(names):
+    '''Returns the block codes of the given names, looked up one at a time'''
+    return [BLOCK_CODES[name] for name in names]
+
+
+def grid_text(names, separator=','):
+    '''Returns the JSON text of a list of block names, without brackets'''
+    return separator.join('"' + name + '"' for name in names)
+
+
+class BlockGridTextTest(unittest.TestCase):
+    '''Tests for parsing the undecoded JSON text of a block grid'''
+
+    DISTANCES = Vector(1, 1, 1)
+    SIZE = 27
+
+    def parse_text(self, text):
+        return BlockGrid.parse(text, BlockGridTextTest.DISTANCES).get_codes().transpose(1, 2, 0).ravel().tolist()
+
+
+    def test_known_names(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            names = [rng.choice(BLOCK_PALETTE).value for _ in range(BlockGridTextTest.SIZE)]
+            self.assertEqual(self.parse_text(grid_text(names)), reference_codes(names))
+
+
+    def test_whitespace_between_names(self):
+        names = [Block.air.value, Block.stone.value, Block.acacia_door.value] * 9
+        self.assertEqual(self.parse_text(grid_text(names, ', ')), reference_codes(names))
+        self.assertEqual(self.parse_text(' ' + grid_text(names, ' ,\n') + '\t'), reference_codes(names))
+
+
+    def test_unknown_names(self):
+        for name in ['unknown_block', 'xyz', 'airr', 'stone_', 'acacia_door_']:
+            names = [Block.air.value] * (BlockGridTextTest.SIZE - 1) + [name]
+            with self.assertRaises(Exception):
+                self.parse_text(grid_text(names))
+
+
+    def test_names_colliding_with_known_names(self):
+        # Same first 4 bytes, last 4 bytes, length and byte sum as known names
+        for name in ['acac_aidoor', 'acaciad_oor', 'stainde_glass_pane', 'light_wieghted_pressure_plate']:
+            self.assertNotIn(name, BLOCK_CODES)
+            names = [Block.air.value] * (BlockGridTextTest.SIZE - 1) + [name]
+            with self.assertRaises(Exception):
+                self.parse_text(grid_text(names))
+
+
+    def test_malformed_separators(self):
+        names = [Block.air.value] * BlockGridTextTest.SIZE
+        for text in [grid_text(names, ',,'), grid_text(names, ' '), grid_text(names, ',x'),
+                grid_text(names) + ',', ',' + grid_text(names)]:
+            with self.assertRaises(Exception):
+                self.parse_text(text)
+
+
+    def test_corrupted_bytes(self):
+        # Changing any single byte must either be rejected, or decode exactly as the names it now spells
+        rng = random.Random(1)
+        names = [rng.choice(BLOCK_PALETTE).value for _ in range(BlockGridTextTest.SIZE)]
+        text = grid_text(names)
+        for _ in range(500):
+            idx = rng.randrange(len(text))
+            corrupted = text[:idx] + rng.choice('abcdefghijklmnopqrstuvwxyz_",') + text[idx + 1:]
+            try:
+                expected = reference_codes(json.loads('[' + corrupted + ']'))
+            except (ValueError, KeyError):
+                expected = None
+            try:
+                actual = self.parse_text(corrupted)
+            except Exception:
+                actual = None
+            self.assertEqual(actual, expected, corrupted)
+
+
+    def test_list_matches_text(self):
+        names = [Block.air.value, Block.grass.value, Block.acacia_door.value] * 9
+        from_list = BlockGrid.parse(names, BlockGridTextTest.DISTANCES).get_codes().tolist()
+        from_text = BlockGrid.parse(grid_text(names), BlockGridTextTest.DISTANCES).get_codes().tolist()
+        self.assertEqual(from_list, from_text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+from malmoext.command_buffer import CommandBuffer
+import unittest
+
+
+class CommandBufferTest(unittest.TestCase):
+    '''Tests for coalescing and suppressing the commands sent by a CommandBuffer'''
+
+    def setUp(self):
+        self.sent = []
+        self.buffer = CommandBuffer(self.sent.append)
+
+
+    def flush(self, *commands):
+        '''Adds the given commands and flushes them, returning the commands sent by the flush'''
+
+        del self.sent[:]
+        for command in commands:
+            self.buffer.add(command)
+        self.buffer.flush()
+        return list(self.sent)
+
+
+    def test_repeated_continuous_command_is_dropped(self):
+        self.assertEqual(self.flush('move 1'), ['move 1'])
+        self.assertEqual(self.flush('move 1'), [])
+        self.assertEqual(self.flush('move 1.0'), [])
+        self.assertEqual(self.flush('move 0'), ['move 0'])
+        self.assertEqual(self.buffer.get_sent_count(), 2)
+        self.assertEqual(self.buffer.get_suppressed_count(), 2)
+
+
+    def test_last_continuous_value_in_tick_wins(self):
+        self.assertEqual(self.flush('move 1', 'turn 0.5', 'move 0.5', 'move -1'), ['turn 0.5', 'move -1'])
+        self.assertEqual(self.buffer.get_suppressed_count(), 2)
+
+
+    def test_coalescing_back_to_sent_value_sends_nothing(self):
+        self.flush('move 1')
+        self.assertEqual(self.flush('move 0', 'move 1'), [])
+
+
+    def test_other_commands_are_sent_in_order(self):
+        commands = ['attack 1', 'hotbar.1 1', 'hotbar.1 0', 'attack 1', 'discardCurrentItem']
+        self.assertEqual(self.flush(*commands), commands)
+        self.assertEqual(self.flush('attack 1'), ['attack 1'])
+
+
+    def test_clear_forgets_sent_values(self):
+        self.flush('move 1', 'attack 1')
+        self.buffer.add('strafe 1')
+        self.buffer.clear()
+        self.assertEqual(self.flush('move 1'), ['move 1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
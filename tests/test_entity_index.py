@@ -0,0 +1,85 @@
+from malmoext.entity_index import EntityIndex
+from malmoext.types import Category, Entity, Item, Mob, Vector
+import random
+import unittest
+
+
+def random_entities(rng, count):
+    '''Returns entities of random types and positions. Agents get one of two names, and other entities are named
+    after their type.'''
+
+    entities = []
+    for i in range(count):
+        aType = rng.choice([Mob.cow, Mob.zombie, Mob.agent, Item.apple])
+        name = rng.choice(['alice', 'bob']) if aType == Mob.agent else aType.value
+        position = Vector(rng.uniform(-30, 30), rng.choice([4.0, 5.0]), float(rng.randint(-30, 30)))
+        entities.append(Entity(str(i), aType, name, position, 1))
+    return entities
+
+
+class EntityIndexTest(unittest.TestCase):
+    '''Tests for searching the entities of an EntityIndex, by scanning and by spatial hash'''
+
+    def setUp(self):
+        self.max_scan_size = EntityIndex.MAX_SCAN_SIZE
+        self.scans_before_hash = EntityIndex.SCANS_BEFORE_HASH
+
+    def tearDown(self):
+        EntityIndex.MAX_SCAN_SIZE = self.max_scan_size
+        EntityIndex.SCANS_BEFORE_HASH = self.scans_before_hash
+
+
+    def search(self, entities, searches):
+        '''Returns the results of the given searches, each a tuple of arguments to nearest and within_radius'''
+
+        index = EntityIndex(entities)
+        return [(index.nearest(position, k, aType, predicate, category),
+                index.within_radius(position, radius, aType, predicate, category))
+                for position, k, radius, aType, predicate, category in searches]
+
+
+    def test_scan_matches_spatial_hash(self):
+        rng = random.Random(0)
+        entities = random_entities(rng, 200)
+        searches = [(Vector(rng.uniform(-35, 35), 4.0, rng.uniform(-35, 35)), rng.choice([1, 3, 500]),
+                rng.choice([2.0, 10.0, 100.0]), rng.choice([None, Mob.cow, Mob.agent, 'alice', 'Zombie', Mob.pig]),
+                rng.choice([None, lambda entity: int(entity.id) % 3 != 0]),
+                rng.choice([None, Category.item, Category.hostile | Category.food, Category.liquid]))
+                for _ in range(300)]
+
+        EntityIndex.MAX_SCAN_SIZE = len(entities)
+        scanned = self.search(entities, searches)
+        EntityIndex.MAX_SCAN_SIZE = 0
+        EntityIndex.SCANS_BEFORE_HASH = 0
+        hashed = self.search(entities, searches)
+        self.assertEqual(scanned, hashed)
+
+
+    def test_equal_distances_keep_order(self):
+        entities = [Entity(str(i), Mob.cow, 'Cow', Vector(1.0 if i % 2 else -1.0, 4.0, 0.0), 1) for i in range(8)]
+        index = EntityIndex(entities)
+        self.assertEqual(index.nearest(Vector(0, 4, 0), 8), entities)
+        self.assertEqual(index.within_radius(Vector(0, 4, 0), 1.0), entities)
+
+
+    def test_types_shared_by_names(self):
+        rng = random.Random(1)
+        entities = random_entities(rng, 50)
+        index = EntityIndex(entities)
+        for aType in [Mob.cow, Mob.zombie, Mob.agent, Item.apple]:
+            self.assertEqual(index.get_by_type(aType), [entity for entity in entities if entity.type == aType])
+        self.assertEqual(index.get_by_name('bob'), [entity for entity in entities if entity.name == 'bob'])
+        self.assertEqual(list(index.get_types()), list(dict.fromkeys(entity.type for entity in entities)))
+
+
+    def test_names_with_different_types(self):
+        entities = [Entity('0', Mob.cow, 'Daisy', Vector(0, 4, 0), 1), Entity('1', Mob.pig, 'Daisy', Vector(1, 4, 0), 1),
+                Entity('2', Mob.cow, 'Cow', Vector(2, 4, 0), 1)]
+        index = EntityIndex(entities)
+        self.assertEqual(index.get_by_type(Mob.cow), [entities[0], entities[2]])
+        self.assertEqual(index.get_by_type(Mob.pig), [entities[1]])
+        self.assertEqual(index.get_by_name('Daisy'), entities[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
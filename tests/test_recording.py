@@ -0,0 +1,104 @@
+from malmoext import Scenario, SimulatedBackend
+from malmoext.recording import FrameKind, RecordingReader, RecordingWriter
+from malmoext.types import Inventory, Item, Vector
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+
+class GatherFood(Scenario):
+    '''An agent picks up food lying nearby and gives it to another agent'''
+
+    def build_scenario(self, builder):
+        builder.set_description('Gather Food')
+        builder.set_time_limit(5)
+        builder.add_agent('computer')
+        builder.agents['computer'].set_position(Vector(0, 4, 0))
+        builder.agents['computer'].add_inventory_item(Item.baked_potato, Inventory.HotBar._1, 1)
+        builder.add_agent('human')
+        builder.agents['human'].set_position(Vector(4, 4, 4))
+        builder.world.add_item(Item.baked_potato, Vector(-4, 6, -4))
+        builder.world.add_item(Item.apple, Vector(4, 6, -4))
+
+    def on_tick(self, agents):
+        computer = agents['computer']
+        if computer.state.has_inventory_item(Item.baked_potato):
+            computer.give_item(Item.baked_potato, 'human')
+        elif computer.state.has_nearby_entity(Item.baked_potato):
+            computer.look_at(Item.baked_potato)
+            computer.move_to(Item.baked_potato)
+        else:
+            computer.do_nothing()
+
+
+
+class RecordingTest(unittest.TestCase):
+    '''Tests for writing and reading recordings, and for replaying a recorded run'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'run.rec')
+
+
+    def write_frames(self):
+        '''Writes a recording of two agents over two ticks, returning the ticks expected to be read back'''
+
+        writer = RecordingWriter(self.path)
+        writer.add_agent(0, 'alice')
+        writer.add_agent(1, 'bob')
+        writer.start_tick(0)
+        writer.add_observation(0, '{"XPos": 0.5, "name": "café"}')
+        writer.add_observation(1, '{"XPos": 1.5}')
+        writer.add_command(0, 'move 1')
+        writer.start_tick(1)
+        writer.add_observation(1, '{"XPos": 2.5}')
+        writer.add_command(1, 'attack 1')
+        writer.add_command(0, 'move 0')
+        writer.close()
+        return [(0, [('alice', '{"XPos": 0.5, "name": "café"}'), ('bob', '{"XPos": 1.5}')], [('alice', 'move 1')]),
+                (1, [('bob', '{"XPos": 2.5}')], [('bob', 'attack 1'), ('alice', 'move 0')])]
+
+
+    def test_frames_round_trip(self):
+        expected = self.write_frames()
+        self.assertEqual(list(RecordingReader(self.path).ticks()), expected)
+
+        frames = list(RecordingReader(self.path))
+        self.assertEqual([frame[0] for frame in frames[:3]], [FrameKind.agent, FrameKind.agent, FrameKind.tick])
+        self.assertEqual(frames[-1], (FrameKind.command, 0, 1, 'move 0'))
+
+
+    def test_truncated_recording_is_read_up_to_last_complete_frame(self):
+        self.write_frames()
+        with open(self.path, 'rb') as fd:
+            data = fd.read()
+        with open(self.path, 'wb') as fd:
+            fd.write(data[:-3])
+        self.assertEqual(list(RecordingReader(self.path))[-1], (FrameKind.command, 1, 1, 'attack 1'))
+
+
+    def test_other_files_are_rejected(self):
+        with open(self.path, 'wb') as fd:
+            fd.write(b'not a recording')
+        with self.assertRaises(Exception):
+            list(RecordingReader(self.path))
+
+
+    def test_replay_matches_recorded_run(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            GatherFood().run(tick_rate=None, backend=SimulatedBackend(), record=self.path)
+            stats = GatherFood().replay(self.path)
+            incremental_stats = GatherFood().replay(self.path, incremental_state=True)
+
+        num_ticks = sum(1 for _ in RecordingReader(self.path).ticks())
+        self.assertGreater(num_ticks, 0)
+        self.assertEqual(stats.num_ticks, num_ticks)
+        self.assertEqual(stats.mismatched_ticks, 0)
+        self.assertEqual(incremental_stats.mismatched_ticks, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
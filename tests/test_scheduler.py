@@ -0,0 +1,157 @@
+from malmoext.scheduler import ObservationWaiter, WaitPolicy, TickClock, OverrunPolicy
+from unittest import mock
+import contextlib
+import io
+import time
+import unittest
+
+
+class FakeAgent:
+    '''Stands in for an Agent, receiving an observation once it has been polled a given number of times'''
+
+    def __init__(self, polls_until_observation: int = 0, has_state: bool = True, mission_active: bool = True):
+        self.state = object() if has_state else None
+        self.polls = 0
+        self.__polls_until_observation = polls_until_observation
+        self.__mission_active = mission_active
+
+    def _poll(self):
+        self.polls += 1
+
+    def _has_observation(self):
+        return self.__polls_until_observation is not None and self.polls >= self.__polls_until_observation
+
+    def is_mission_active(self):
+        return self.__mission_active
+
+
+
+class ObservationWaiterTest(unittest.TestCase):
+    '''Tests for the policies used by an ObservationWaiter to decide when to stop waiting'''
+
+    def wait(self, policy, agents, deadline=0.1):
+        return ObservationWaiter(policy, deadline, max_poll_interval=0.001).wait(agents)
+
+
+    def test_all_waits_for_every_agent(self):
+        fast, slow = FakeAgent(1), FakeAgent(5)
+        self.assertEqual(self.wait(WaitPolicy.all, [fast, slow]), [fast, slow])
+        self.assertEqual(slow.polls, 5)
+
+
+    def test_any_returns_first_ready_agents(self):
+        fast, slow = FakeAgent(2), FakeAgent(50)
+        self.assertEqual(self.wait(WaitPolicy.any, [fast, slow]), [fast])
+        self.assertEqual(fast.polls, 2)
+
+
+    def test_agents_without_state_are_always_waited_on(self):
+        fast, new = FakeAgent(1), FakeAgent(5, has_state=False)
+        self.assertEqual(self.wait(WaitPolicy.any, [fast, new]), [fast, new])
+        self.assertEqual(new.polls, 5)
+
+
+    def test_deadline_waits_until_deadline_passes(self):
+        ready, missing = FakeAgent(1), FakeAgent(None)
+        start = time.perf_counter()
+        self.assertEqual(self.wait(WaitPolicy.deadline, [ready, missing], 0.05), [ready])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+
+    def test_deadline_returns_early_when_every_agent_is_ready(self):
+        start = time.perf_counter()
+        agents = [FakeAgent(1), FakeAgent(2)]
+        self.assertEqual(self.wait(WaitPolicy.deadline, agents, 10.0), agents)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+    def test_ended_mission_returns_none(self):
+        self.assertIsNone(self.wait(WaitPolicy.all, [FakeAgent(None, mission_active=False), FakeAgent(None)]))
+
+
+
+class FakeTime:
+    '''Stands in for the time module, with a clock that only advances when slept on or told to'''
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+
+class TickClockTest(unittest.TestCase):
+    '''Tests for the pacing of a TickClock, and how it handles ticks that exceed their time budget'''
+
+    def setUp(self):
+        self.time = FakeTime()
+        patcher = mock.patch('malmoext.scheduler.time', self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def run_ticks(self, clock, work_times):
+        '''Runs one tick for each of the given amounts of work (in seconds), returning the start time of each tick'''
+
+        starts = []
+        for work in work_times:
+            clock.tick()
+            starts.append(self.time.now)
+            self.time.now += work
+            clock.wait()
+        return starts
+
+
+    def test_sleeps_for_remainder_of_budget(self):
+        clock = TickClock(10.0)
+        starts = self.run_ticks(clock, [0.03, 0.05, 0.0, 0.09])
+        self.assertEqual([round(start, 9) for start in starts], [0.0, 0.1, 0.2, 0.3])
+
+        stats = clock.get_stats()
+        self.assertEqual(stats.num_ticks, 4)
+        self.assertAlmostEqual(stats.achieved_rate, 10.0)
+        self.assertAlmostEqual(stats.jitter, 0.0)
+        self.assertEqual(stats.overruns, 0)
+
+
+    def test_skip_drops_missed_ticks(self):
+        clock = TickClock(10.0, OverrunPolicy.skip)
+        starts = self.run_ticks(clock, [0.25, 0.0, 0.0])
+        self.assertEqual([round(start, 9) for start in starts], [0.0, 0.3, 0.4])
+        self.assertEqual(clock.get_stats().overruns, 1)
+        self.assertEqual(clock.get_stats().skipped_ticks, 2)
+
+
+    def test_catch_up_runs_missed_ticks_back_to_back(self):
+        clock = TickClock(10.0, OverrunPolicy.catch_up)
+        starts = self.run_ticks(clock, [0.25, 0.0, 0.0, 0.0])
+        self.assertEqual([round(start, 9) for start in starts], [0.0, 0.25, 0.25, 0.3])
+        self.assertEqual(clock.get_stats().overruns, 2)
+        self.assertEqual(clock.get_stats().skipped_ticks, 0)
+
+
+    def test_warn_restarts_schedule(self):
+        clock = TickClock(10.0, OverrunPolicy.warn)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            starts = self.run_ticks(clock, [0.25, 0.0, 0.0])
+        self.assertEqual([round(start, 9) for start in starts], [0.0, 0.25, 0.35])
+        self.assertIn('exceeded its time budget', out.getvalue())
+        self.assertEqual(clock.get_stats().overruns, 1)
+
+
+    def test_unpaced_never_sleeps(self):
+        clock = TickClock(None)
+        self.run_ticks(clock, [0.01] * 5)
+        self.assertEqual(self.time.sleeps, [])
+        self.assertIsNone(clock.get_stats().target_rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
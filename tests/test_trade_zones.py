@@ -0,0 +1,54 @@
+from malmoext.trade_zones import TradeZones
+from malmoext.types import Vector
+import unittest
+
+
+class TradeZonesTest(unittest.TestCase):
+    '''Tests for checking positions against TradeZones, and for the expiry of zones'''
+
+    def test_zone_expires_after_lifetime(self):
+        zones = TradeZones(2.0, 3)
+        zones.add(Vector(0.5, 4.0, 0.5))
+        for _ in range(2):
+            zones.advance()
+            self.assertTrue(zones.contains(Vector(0.5, 4.0, 0.5)))
+        zones.advance()
+        self.assertFalse(zones.contains(Vector(0.5, 4.0, 0.5)))
+
+
+    def test_advance_to_discards_all_expired_zones(self):
+        zones = TradeZones(2.0, 5)
+        zones.add(Vector(0, 4, 0))
+        zones.advance_to(3)
+        zones.add(Vector(10, 4, 0))
+        zones.advance_to(5)
+        self.assertFalse(zones.contains(Vector(0, 4, 0)))
+        self.assertTrue(zones.contains(Vector(10, 4, 0)))
+        zones.advance_to(2)
+        self.assertEqual(zones.get_tick(), 5)
+        zones.advance_to(8)
+        self.assertFalse(zones.contains(Vector(10, 4, 0)))
+
+
+    def test_adding_again_renews_zone(self):
+        zones = TradeZones(2.0, 3)
+        zones.add(Vector(0, 4, 0))
+        zones.advance_to(2)
+        zones.add(Vector(0, 4, 0))
+        zones.advance_to(4)
+        self.assertTrue(zones.contains(Vector(0, 4, 0)))
+        zones.advance_to(5)
+        self.assertFalse(zones.contains(Vector(0, 4, 0)))
+
+
+    def test_contains_only_strictly_inside(self):
+        zones = TradeZones(2.0, 10)
+        zones.add(Vector(0.5, 4.0, 0.5))
+        self.assertTrue(zones.contains(Vector(1.9, 4.0, -0.5)))
+        self.assertTrue(zones.contains(Vector(0.5, 5.9, 0.5)))
+        self.assertFalse(zones.contains(Vector(2.5, 4.0, 0.5)))
+        self.assertFalse(zones.contains(Vector(-5.0, 4.0, -5.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()